@@ -6,13 +6,23 @@ sys.path.append('.')
 from flask import Flask
 
 from config import load_config
+from routes.attacker_routes import create_attacker_blueprint
 from routes.dashboard_routes import create_dashboard_blueprint
 from routes.live_routes import create_live_blueprint
+from routes.metrics_routes import create_metrics_blueprint
 from routes.playback_routes import create_playback_blueprint
+from routes.profile_routes import create_profile_blueprint
 from routes.proxy_routes import create_proxy_blueprint
 from routes.session_routes import create_session_blueprint
 from routes.sim_routes import create_sim_blueprint
+from routes.stream_routes import create_stream_blueprint
+from services import event_bus, instrumentation, timing
+from services.detection import DetectionEngine
+from services.metrics_db import get_metrics_db
 from services.playback_db import PlaybackDB
+from services.profiling import RequestProfiler
+from services.replay_cache import ReplayCache
+from services.response_cache import ResponseCache
 from services.sim_telemetry import SimTelemetry
 
 
@@ -23,17 +33,37 @@ def create_app() -> Flask:
 	playback_db = PlaybackDB(config)
 	playback_db.start()
 	sim = SimTelemetry(config)
+	profiler = RequestProfiler(config)
+	response_cache = ResponseCache(config.response_cache_size, config.response_cache_ttl)
+	replay_cache = ReplayCache(config.replay_cache_path, config.replay_cache_max_bytes)
+	detector = DetectionEngine(
+		event_bus.get_event_bus(),
+		store=lambda alerts: get_metrics_db(config).store_alerts(alerts),
+		seed_subnets=lambda limit: get_metrics_db(config).get_recent_ips(limit),
+		max_keys=config.detect_max_keys,
+	)
+	detector.ensure_started()
+	get_metrics_db(config).start_search_backfill()
 
 	app.config["APP_CONFIG"] = config
 	app.config["PLAYBACK_DB"] = playback_db
 	app.config["SIM_TELEMETRY"] = sim
+	app.config["RESPONSE_CACHE"] = response_cache
+	app.config["DETECTOR"] = detector
 
-	app.register_blueprint(create_dashboard_blueprint(config))
+	app.register_blueprint(create_dashboard_blueprint(config, response_cache))
 	app.register_blueprint(create_live_blueprint(config))
-	app.register_blueprint(create_playback_blueprint(config, playback_db))
-	app.register_blueprint(create_session_blueprint(config))
+	app.register_blueprint(create_playback_blueprint(config, playback_db, response_cache))
+	app.register_blueprint(create_session_blueprint(config, playback_db, response_cache, replay_cache))
 	app.register_blueprint(create_proxy_blueprint(config, playback_db))
 	app.register_blueprint(create_sim_blueprint(config, sim))
+	app.register_blueprint(create_stream_blueprint(config))
+	app.register_blueprint(create_attacker_blueprint(config, response_cache))
+	app.register_blueprint(create_metrics_blueprint(config))
+	app.register_blueprint(create_profile_blueprint(config, profiler))
+	instrumentation.init_app(app)
+	timing.init_app(app)
+	profiler.init_app(app)
 
 	return app
 
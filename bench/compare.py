@@ -0,0 +1,42 @@
+"""Compare two ``bench.run`` JSON reports scenario by scenario.
+
+Usage:
+    python -m bench.compare bench/results/base.json bench/results/head.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+
+def _load(path: Path) -> Dict[str, Dict[str, Any]]:
+	report = json.loads(path.read_text(encoding="utf-8"))
+	return {row["scenario"]: row for row in report.get("results", [])}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+	parser.add_argument("base")
+	parser.add_argument("head")
+	parser.add_argument("--metric", default="p50_ms", help="Result field to compare (default: p50_ms)")
+	args = parser.parse_args()
+
+	base = _load(Path(args.base))
+	head = _load(Path(args.head))
+	print(f"{'scenario':40} {'base':>12} {'head':>12} {'change':>9}")
+	for name in sorted(set(base) | set(head)):
+		b = base.get(name, {}).get(args.metric)
+		h = head.get(name, {}).get(args.metric)
+		if b is None or h is None:
+			change = "n/a"
+		elif b == 0:
+			change = "-"
+		else:
+			change = f"{(h - b) / b * 100:+.1f}%"
+		print(f"{name:40} {str(b):>12} {str(h):>12} {change:>9}")
+
+
+if __name__ == "__main__":
+	main()
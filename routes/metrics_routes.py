@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from flask import Blueprint, Response
+
+from config import Config
+from services import instrumentation
+
+
+def create_metrics_blueprint(config: Config) -> Blueprint:
+	bp = Blueprint("metrics", __name__)
+
+	@bp.route("/metrics")
+	def prometheus_metrics():
+		return Response(
+			instrumentation.render_text(),
+			mimetype="text/plain; version=0.0.4; charset=utf-8",
+		)
+
+	return bp
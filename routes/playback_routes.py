@@ -1,12 +1,24 @@
 from __future__ import annotations
 
-from flask import Blueprint, jsonify, render_template, request
+import json
+from typing import Any, Dict
+
+from flask import Blueprint, Response, jsonify, render_template, request
 
 from config import Config
+from routes.stream_routes import SSE_HEADERS
+from services import timing
+from services.live_stream import stream_replay
+from services.metrics_db import QueryError, decode_cursor, encode_cursor
 from services.playback_db import PlaybackDB
+from services.response_cache import ResponseCache, cached_json
+
+
+def _row_cursor(row: Dict[str, Any]) -> str:
+	return encode_cursor(row["ts"], row["id"])
 
 
-def create_playback_blueprint(config: Config, playback_db: PlaybackDB) -> Blueprint:
+def create_playback_blueprint(config: Config, playback_db: PlaybackDB, cache: ResponseCache) -> Blueprint:
 	bp = Blueprint("playback", __name__)
 
 	@bp.route("/replay-ssh")
@@ -16,19 +28,101 @@ def create_playback_blueprint(config: Config, playback_db: PlaybackDB) -> Bluepr
 	@bp.route("/api/replay/range")
 	def api_replay_range():
 		playback_db.ingest_from_ssh_log()
-		return jsonify(playback_db.get_range())
+		return cached_json(cache, "replay-range", playback_db.get_version(), playback_db.get_range)
 
 	@bp.route("/api/replay/query")
 	def api_replay_query():
 		playback_db.ingest_from_ssh_log()
 		start = request.args.get("start")
 		end = request.args.get("end")
+		cursor = request.args.get("cursor") or None
+		if request.args.get("format") == "ndjson":
+			try:
+				after = decode_cursor(cursor) if cursor else None
+			except QueryError as exc:
+				return jsonify({"error": str(exc)}), 400
+			lines = (
+				json.dumps({"ts": ts, "line": line}, separators=(",", ":")) + "\n"
+				for ts, line in playback_db.export_rows(start, end, after)
+			)
+			return Response(lines, mimetype="application/x-ndjson")
 		try:
 			limit = int(request.args.get("limit", "1000"))
 		except Exception:
 			limit = 1000
 		limit = max(1, min(limit, 5000))
-		rows = playback_db.query_rows(start, end, limit)
-		return jsonify({"rows": rows})
+		try:
+			result = playback_db.query_rows(start, end, limit, cursor)
+		except QueryError as exc:
+			return jsonify({"error": str(exc)}), 400
+		return timing.jsonify_timed(result)
+
+	@bp.route("/api/replay/stream")
+	def api_replay_stream():
+		playback_db.ingest_from_ssh_log()
+		start = request.args.get("start") or None
+		end = request.args.get("end") or None
+		try:
+			speed = float(request.args.get("speed", "1"))
+		except ValueError:
+			speed = 1.0
+		try:
+			max_gap = float(request.args["max_gap"]) if request.args.get("max_gap") else None
+		except ValueError:
+			max_gap = None
+		# Last-Event-ID is a row cursor from a previous frame (resume), or a
+		# bare timestamp to seek to; the query parameter serves manual reconnects.
+		last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+		after = None
+		if last_id:
+			try:
+				after = decode_cursor(last_id)
+			except QueryError:
+				start = last_id
+		rows = playback_db.iter_rows(start, end, after)
+		return Response(stream_replay(rows, _row_cursor, speed=min(speed, 1000.0), max_gap=max_gap), headers=SSE_HEADERS)
+
+	def _page_args():
+		try:
+			limit = int(request.args.get("limit", "100"))
+		except Exception:
+			limit = 100
+		try:
+			before_id = int(request.args["before_id"]) if request.args.get("before_id") else None
+		except ValueError:
+			before_id = None
+		return {"limit": max(1, min(limit, 1000)), "before_id": before_id}
+
+	@bp.route("/api/ssh/commands")
+	def api_ssh_commands():
+		playback_db.ingest_from_ssh_log()
+		filters = dict(
+			_page_args(),
+			session=request.args.get("session") or None,
+			ip=request.args.get("ip") or None,
+			prefix=request.args.get("prefix") or None,
+		)
+		key = "ssh-commands:" + ":".join(f"{k}={v}" for k, v in sorted(filters.items()))
+		return cached_json(cache, key, playback_db.get_version(), lambda: {"commands": playback_db.query_commands(**filters)})
+
+	@bp.route("/api/ssh/downloads")
+	def api_ssh_downloads():
+		playback_db.ingest_from_ssh_log()
+		filters = dict(
+			_page_args(),
+			session=request.args.get("session") or None,
+			ip=request.args.get("ip") or None,
+			shasum=request.args.get("shasum") or None,
+		)
+		key = "ssh-downloads:" + ":".join(f"{k}={v}" for k, v in sorted(filters.items()))
+		return cached_json(cache, key, playback_db.get_version(), lambda: {"downloads": playback_db.query_downloads(**filters)})
+
+	@bp.route("/api/ssh/sessions/<session_id>")
+	def api_ssh_session_detail(session_id: str):
+		playback_db.ingest_from_ssh_log()
+		detail = playback_db.get_session_detail(session_id)
+		if detail is None:
+			return jsonify({"error": "unknown session", "session": session_id}), 404
+		return timing.jsonify_timed(detail)
 
 	return bp
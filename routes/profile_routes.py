@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from flask import Blueprint, abort, jsonify, request, send_from_directory
+
+from config import Config
+from services.profiling import PROFILE_HEADER, RequestProfiler, safe_capture_name
+
+
+def create_profile_blueprint(config: Config, profiler: RequestProfiler) -> Blueprint:
+	bp = Blueprint("profiles", __name__)
+
+	def _require_access():
+		token = config.profile_token
+		if token and request.headers.get(PROFILE_HEADER) == token:
+			return
+		if profiler.address_allowed(request.remote_addr):
+			return
+		abort(403)
+
+	@bp.route("/api/profiles")
+	def api_profiles():
+		_require_access()
+		try:
+			limit = int(request.args.get("limit", "100"))
+		except Exception:
+			limit = 100
+		limit = max(1, min(limit, config.profile_keep))
+		return jsonify({"profiles": profiler.list_captures(limit), "dir": str(profiler.profile_dir)})
+
+	@bp.route("/api/profiles/<name>")
+	def api_profile_download(name: str):
+		_require_access()
+		safe_name = safe_capture_name(name)
+		if not safe_name:
+			abort(404)
+		return send_from_directory(profiler.profile_dir, safe_name, as_attachment=True)
+
+	return bp
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
-from flask import Blueprint, Response, jsonify, render_template
+from flask import Blueprint, Response, jsonify, render_template, request
 
 from config import Config
-from services.cowrie_sessions import list_cowrie_sessions, stream_playlog
+from services import cowrie_events, ttylog
+from services.replay_cache import ReplayCache, send_cached
+from services.cowrie_sessions import safe_session_id, session_ttylog, stream_playlog
+from services.metrics_db import QueryError
+from services.playback_db import PlaybackDB
+from services.response_cache import ResponseCache, cached_json, file_version
 
 
-def create_session_blueprint(config: Config) -> Blueprint:
+def create_session_blueprint(
+	config: Config, playback_db: PlaybackDB, cache: ResponseCache, replay_cache: ReplayCache
+) -> Blueprint:
 	bp = Blueprint("sessions", __name__)
 
 	@bp.route("/ssh-session-replay")
@@ -15,11 +22,72 @@ def create_session_blueprint(config: Config) -> Blueprint:
 
 	@bp.route("/api/ssh-sessions")
 	def api_ssh_sessions():
-		sessions = list_cowrie_sessions(config)
-		return jsonify({"sessions": sessions})
+		# Sessions come from the incrementally tailed log; tty flags are kept
+		# current by the playback writer thread, not checked per request.
+		playback_db.ingest_from_ssh_log()
+		try:
+			limit = int(request.args.get("limit", "1000"))
+		except Exception:
+			limit = 1000
+		limit = max(1, min(limit, cowrie_events.MAX_ROWS))
+		cursor = request.args.get("cursor") or None
+		tty = request.args.get("tty", "1")
+		filters = {
+			"ip": request.args.get("ip") or None,
+			"login": request.args.get("login") or None,
+			"has_tty": None if tty == "any" else tty in {"1", "true", "yes"},
+		}
+		key = f"ssh-sessions:{limit}:{cursor}:" + ":".join(f"{k}={v}" for k, v in sorted(filters.items()))
+		version = (playback_db.get_version(), playback_db.tty_generation)
+		try:
+			return cached_json(cache, key, version, lambda: playback_db.list_sessions(limit, cursor, **filters))
+		except QueryError as exc:
+			return jsonify({"error": str(exc)}), 400
+
+	def _float_arg(name: str, default: float) -> float:
+		try:
+			return float(request.args.get(name, default))
+		except ValueError:
+			return default
+
+	def _rendered(session_id: str, variant: str, mimetype: str, render, headers=None):
+		"""Serve a full (unpaced) rendering from the replay cache, filling it on a miss."""
+		version = file_version(config.cowrie_tty_path / session_id)
+		if not replay_cache.enabled or version is None:
+			return Response(render(), mimetype=mimetype, headers=headers)
+		key = replay_cache.key(session_id, version, variant)
+		path = replay_cache.lookup(key)
+		response = send_cached(path, mimetype, key) if path is not None else None
+		if response is not None:
+			response.headers.extend(headers or {})
+			return response
+		return Response(replay_cache.fill(key, render()), mimetype=mimetype, headers=headers)
 
 	@bp.route("/api/ssh-session-replay/<session_id>")
 	def api_ssh_session_replay(session_id: str):
-		return Response(stream_playlog(config, session_id), mimetype="text/plain")
+		start = max(0.0, _float_arg("start", 0.0))
+		speed = _float_arg("speed", 1.0)
+		if speed <= 0 and safe_session_id(session_id):
+			# Unpaced dumps are identical for every viewer; paced streams are not cacheable.
+			return _rendered(
+				session_id, f"text:{start}", "text/plain", lambda: stream_playlog(config, session_id, start, 0.0)
+			)
+		return Response(stream_playlog(config, session_id, start, speed), mimetype="text/plain")
+
+	@bp.route("/api/ssh-session-replay/<session_id>/asciicast")
+	def api_ssh_session_asciicast(session_id: str):
+		try:
+			log = session_ttylog(config, session_id)
+		except FileNotFoundError:
+			return jsonify({"error": "session file missing", "session": session_id}), 404
+		except ttylog.TtyLogError:
+			return jsonify({"error": "session file is not a ttylog", "session": session_id}), 422
+		start = max(0.0, _float_arg("start", 0.0))
+		include_input = request.args.get("input") in {"1", "true", "yes"}
+		return _rendered(
+			session_id, f"asciicast:{start}:{include_input}", "application/x-asciicast",
+			lambda: ttylog.asciicast(log, start, include_input=include_input),
+			{"X-Duration": f"{log.duration:.3f}"},
+		)
 
 	return bp
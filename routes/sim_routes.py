@@ -3,7 +3,7 @@ from __future__ import annotations
 from flask import Blueprint, jsonify
 
 from config import Config
-from services import log_reader, stats
+from services import log_reader, stats, timing
 from services.sim_telemetry import SimTelemetry
 
 
@@ -14,11 +14,31 @@ def create_sim_blueprint(config: Config, sim: SimTelemetry) -> Blueprint:
 		http_events = log_reader.collect_http_events(config)
 		ssh_events = log_reader.collect_ssh_events(config)
 		computed_stats = stats.format_stats_for_output(stats.compute_dashboard_stats(config, http_events, ssh_events))
-		return sim.payload(computed_stats)
+		with timing.stage("sim_tick"):
+			world = sim.payload(computed_stats)
+		# Prefer real attackers from ingest over the simulated list when there are any.
+		from services.metrics_db import get_metrics_db
+		db = get_metrics_db(config)
+		try:
+			real = db.get_top_attackers("24h", "events", 10)
+		except Exception:
+			real = []
+		if real:
+			world["top_attackers"] = real
+			world["top_attackers_source"] = "ingest"
+		try:
+			alerts = db.get_alerts(8)
+		except Exception:
+			alerts = []
+		if alerts:
+			# Oldest first, matching the simulated list the dashboard renders.
+			world["alerts"] = list(reversed(alerts))
+			world["alerts_source"] = "detection"
+		return world
 
 	@bp.route("/api/sim/telemetry")
 	def api_sim_telemetry():
-		return jsonify(_payload())
+		return timing.jsonify_timed(_payload())
 
 	@bp.route("/api/global-nodes")
 	def api_global_nodes():
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from flask import Blueprint, Response, request, stream_with_context
+
+from config import Config
+from services.event_bus import get_event_bus
+from services.live_stream import BacklogGap, MetricsPump, stream_events, stream_metrics
+
+
+SSE_HEADERS = {
+	"Cache-Control": "no-cache",
+	"Connection": "keep-alive",
+	"X-Accel-Buffering": "no",
+	"Content-Type": "text/event-stream",
+}
+
+
+def create_stream_blueprint(config: Config) -> Blueprint:
+	bp = Blueprint("stream", __name__)
+	bus = get_event_bus()
+
+	def _compute_metrics():
+		from services.metrics_db import get_metrics_db
+		return get_metrics_db(config).get_metrics()
+
+	pump = MetricsPump(bus, _compute_metrics)
+
+	@bp.route("/api/stream/events")
+	def api_stream_events():
+		source = request.args.get("source")
+		source = source.upper() if source else None
+		last_id = request.headers.get("Last-Event-ID") or request.args.get("since_id")
+		try:
+			since_id = int(last_id) if last_id else None
+		except ValueError:
+			since_id = None
+
+		def _backlog():
+			if since_id is None:
+				return []
+			from services.metrics_db import get_metrics_db
+			db = get_metrics_db(config)
+			# Same cases as the REST delta: a DB reset under the client, or
+			# more missed rows than one page; either way it must reload.
+			max_id = db.get_max_event_id()
+			if max_id < since_id:
+				raise BacklogGap("reset")
+			if max_id == since_id:
+				return []
+			limit = config.max_events
+			if source:
+				rows = db.get_recent_events_by_source(source, limit + 1, since_id=since_id)
+			else:
+				rows = db.get_events_page(limit=limit + 1, since_id=since_id)
+			if len(rows) > limit:
+				raise BacklogGap("truncated")
+			return list(reversed(rows))
+
+		return Response(stream_with_context(stream_events(bus, source, backlog=_backlog)), headers=SSE_HEADERS)
+
+	@bp.route("/api/stream/metrics")
+	def api_stream_metrics():
+		return Response(stream_with_context(stream_metrics(bus, pump)), headers=SSE_HEADERS)
+
+	return bp
@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import heapq
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import instrumentation, iputil
+from services.log_reader import _parse_time
+
+
+WINDOWS = {"1h": 3600, "24h": 86400, "7d": 7 * 86400, "all": None}
+# Rank key -> ip_profile column (all-time) / ip_hourly column (windowed).
+RANKINGS = {
+	"events": ("total", "total"),
+	"ssh": ("ssh_count", "ssh_count"),
+	"http": ("http_count", "http_count"),
+	"usernames": ("distinct_usernames", None),
+	"paths": ("distinct_paths", None),
+	"recent": ("last_seen", None),
+}
+HOURLY_RETENTION_HOURS = 24 * 8
+MAX_TOP = 200
+ROLLUP_PREFIXES = (8, 16, 24)
+# Late events can still land in a window's completed hours; bounds how long
+# a folded window is reused without them.
+WINDOW_TTL = 300.0
+
+
+class AttackerQueryError(ValueError):
+	"""Raised for unknown windows or rankings."""
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+	created = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ip_profile'").fetchone()
+	conn.execute("""
+		CREATE TABLE IF NOT EXISTS ip_profile (
+			ip TEXT PRIMARY KEY,
+			first_seen TEXT,
+			last_seen TEXT,
+			total INTEGER NOT NULL DEFAULT 0,
+			http_count INTEGER NOT NULL DEFAULT 0,
+			ssh_count INTEGER NOT NULL DEFAULT 0,
+			distinct_usernames INTEGER NOT NULL DEFAULT 0,
+			distinct_paths INTEGER NOT NULL DEFAULT 0,
+			last_event_id INTEGER,
+			last_event_type TEXT,
+			ip_packed,
+			country TEXT,
+			asn INTEGER,
+			as_org TEXT
+		)
+	""")
+	columns = {row[1] for row in conn.execute("PRAGMA table_info(ip_profile)")}
+	for column, kind in (("country", "TEXT"), ("asn", "INTEGER"), ("as_org", "TEXT")):
+		if column not in columns:
+			conn.execute(f"ALTER TABLE ip_profile ADD COLUMN {column} {kind}")
+	if "ip_packed" not in columns:
+		conn.execute("ALTER TABLE ip_profile ADD COLUMN ip_packed")
+		conn.create_function("pack_ip", 1, iputil.pack_ip, deterministic=True)
+		conn.execute("UPDATE ip_profile SET ip_packed = pack_ip(ip)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_ip_profile_packed ON ip_profile(ip_packed)")
+	for column, _ in RANKINGS.values():
+		conn.execute(f"CREATE INDEX IF NOT EXISTS idx_ip_profile_{column} ON ip_profile({column} DESC)")
+	conn.execute("""
+		CREATE TABLE IF NOT EXISTS ip_hourly (
+			hour INTEGER NOT NULL,
+			ip TEXT NOT NULL,
+			total INTEGER NOT NULL DEFAULT 0,
+			http_count INTEGER NOT NULL DEFAULT 0,
+			ssh_count INTEGER NOT NULL DEFAULT 0,
+			PRIMARY KEY (hour, ip)
+		) WITHOUT ROWID
+	""")
+	for table, column in (("ip_usernames", "username"), ("ip_paths", "path")):
+		conn.execute(f"""
+			CREATE TABLE IF NOT EXISTS {table} (
+				ip TEXT NOT NULL,
+				{column} TEXT NOT NULL,
+				count INTEGER NOT NULL DEFAULT 0,
+				PRIMARY KEY (ip, {column})
+			) WITHOUT ROWID
+		""")
+	timeline_created = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ip_timeline'").fetchone()
+	conn.execute("""
+		CREATE TABLE IF NOT EXISTS ip_timeline (
+			ip TEXT NOT NULL,
+			ts TEXT NOT NULL,
+			id INTEGER NOT NULL,
+			source TEXT,
+			event_type TEXT,
+			username TEXT,
+			path TEXT,
+			PRIMARY KEY (ip, ts, id)
+		) WITHOUT ROWID
+	""")
+	if created:
+		_rebuild(conn)
+	if timeline_created:
+		conn.execute("""
+			INSERT OR IGNORE INTO ip_timeline (ip, ts, id, source, event_type, username, path)
+			SELECT src_ip, ts, id, source, event_type, username, path FROM events
+			WHERE src_ip IS NOT NULL AND src_ip != 'unknown' AND ts IS NOT NULL
+		""")
+
+
+def _rebuild(conn: sqlite3.Connection) -> None:
+	"""One-time aggregation of rows ingested before the profile tables existed."""
+	conn.execute("""
+		INSERT INTO ip_profile (ip, first_seen, last_seen, total, http_count, ssh_count,
+			distinct_usernames, distinct_paths, last_event_id, ip_packed, country, asn, as_org)
+		SELECT src_ip, MIN(ts), MAX(ts), COUNT(*), SUM(source = 'HTTP'), SUM(source = 'SSH'),
+			COUNT(DISTINCT username), COUNT(DISTINCT path), MAX(id), MAX(ip_packed),
+			MAX(country), MAX(asn), MAX(json_extract(raw_json, '$.as_org'))
+		FROM events WHERE src_ip IS NOT NULL GROUP BY src_ip
+	""")
+	conn.execute("""
+		UPDATE ip_profile SET last_event_type = (SELECT event_type FROM events WHERE id = ip_profile.last_event_id)
+	""")
+	conn.execute("""
+		INSERT INTO ip_hourly (hour, ip, total, http_count, ssh_count)
+		SELECT CAST(strftime('%s', ts) AS INTEGER) / 3600 AS hour, src_ip, COUNT(*), SUM(source = 'HTTP'), SUM(source = 'SSH')
+		FROM events WHERE src_ip IS NOT NULL AND strftime('%s', ts) IS NOT NULL GROUP BY hour, src_ip
+	""")
+	conn.execute("""
+		INSERT INTO ip_usernames (ip, username, count)
+		SELECT src_ip, username, COUNT(*) FROM events
+		WHERE src_ip IS NOT NULL AND username IS NOT NULL GROUP BY src_ip, username
+	""")
+	conn.execute("""
+		INSERT INTO ip_paths (ip, path, count)
+		SELECT src_ip, path, COUNT(*) FROM events
+		WHERE src_ip IS NOT NULL AND path IS NOT NULL GROUP BY src_ip, path
+	""")
+
+
+class ProfileBatch:
+	"""Aggregates one ingest batch in memory, then upserts once per IP.
+
+	Shipper batches are dominated by a handful of IPs, so folding them first
+	keeps the write cost per batch proportional to distinct IPs, not rows.
+	"""
+
+	def __init__(self) -> None:
+		self.profiles: Dict[str, Dict[str, Any]] = {}
+		self.hourly: Dict[Tuple[int, str], List[int]] = {}
+		self.usernames: Dict[Tuple[str, str], int] = {}
+		self.paths: Dict[Tuple[str, str], int] = {}
+		self.timeline: List[Tuple[Any, ...]] = []
+
+	def add(self, event_id: int, event: Dict[str, Any], ts_str: Any) -> None:
+		ip = event.get("ip")
+		if not ip or ip == "unknown":
+			return
+		source = event.get("source")
+		ts = ts_str if isinstance(ts_str, str) else None
+		parsed = _parse_time(ts) if ts else None
+		hour = int((parsed.timestamp() if parsed else time.time()) // 3600)
+		is_http, is_ssh = int(source == "HTTP"), int(source == "SSH")
+
+		if ts:
+			self.timeline.append((ip, ts, event_id, source, event.get("event"), event.get("username"), event.get("path")))
+		profile = self.profiles.get(ip)
+		if profile is None:
+			profile = self.profiles[ip] = {
+				"first_seen": ts, "last_seen": ts, "total": 0, "http": 0, "ssh": 0,
+				"last_event_id": event_id, "last_event_type": event.get("event"),
+				"country": None, "asn": None, "as_org": None,
+			}
+		if event.get("country"):
+			profile["country"], profile["asn"], profile["as_org"] = event["country"], event.get("asn"), event.get("as_org")
+		if ts and (profile["first_seen"] is None or ts < profile["first_seen"]):
+			profile["first_seen"] = ts
+		if ts and (profile["last_seen"] is None or ts > profile["last_seen"]):
+			profile["last_seen"] = ts
+		profile["total"] += 1
+		profile["http"] += is_http
+		profile["ssh"] += is_ssh
+		if event_id >= profile["last_event_id"]:
+			profile["last_event_id"] = event_id
+			profile["last_event_type"] = event.get("event")
+
+		bucket = self.hourly.setdefault((hour, ip), [0, 0, 0])
+		bucket[0] += 1
+		bucket[1] += is_http
+		bucket[2] += is_ssh
+		if event.get("username"):
+			key = (ip, str(event["username"]))
+			self.usernames[key] = self.usernames.get(key, 0) + 1
+		if event.get("path"):
+			key = (ip, str(event["path"]))
+			self.paths[key] = self.paths.get(key, 0) + 1
+
+	def _flush_distinct(self, conn: sqlite3.Connection, table: str, column: str, counts: Dict[Tuple[str, str], int]) -> Dict[str, int]:
+		new_distinct: Dict[str, int] = {}
+		for (ip, value), count in counts.items():
+			cur = conn.execute(f"INSERT OR IGNORE INTO {table} (ip, {column}, count) VALUES (?, ?, 0)", (ip, value))
+			if cur.rowcount > 0:
+				new_distinct[ip] = new_distinct.get(ip, 0) + 1
+		conn.executemany(
+			f"UPDATE {table} SET count = count + ? WHERE ip = ? AND {column} = ?",
+			[(count, ip, value) for (ip, value), count in counts.items()],
+		)
+		return new_distinct
+
+	def flush(self, conn: sqlite3.Connection) -> None:
+		if not self.profiles:
+			return
+		new_usernames = self._flush_distinct(conn, "ip_usernames", "username", self.usernames)
+		new_paths = self._flush_distinct(conn, "ip_paths", "path", self.paths)
+		conn.executemany(
+			"""
+			INSERT INTO ip_profile (ip, first_seen, last_seen, total, http_count, ssh_count,
+				distinct_usernames, distinct_paths, last_event_id, last_event_type, ip_packed, country, asn, as_org)
+			VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+			ON CONFLICT(ip) DO UPDATE SET
+				first_seen = CASE WHEN first_seen IS NULL OR excluded.first_seen < first_seen
+					THEN excluded.first_seen ELSE first_seen END,
+				last_seen = CASE WHEN last_seen IS NULL OR excluded.last_seen > last_seen
+					THEN excluded.last_seen ELSE last_seen END,
+				total = total + excluded.total,
+				http_count = http_count + excluded.http_count,
+				ssh_count = ssh_count + excluded.ssh_count,
+				distinct_usernames = distinct_usernames + excluded.distinct_usernames,
+				distinct_paths = distinct_paths + excluded.distinct_paths,
+				last_event_type = CASE WHEN excluded.last_event_id > COALESCE(last_event_id, 0)
+					THEN excluded.last_event_type ELSE last_event_type END,
+				last_event_id = MAX(COALESCE(last_event_id, 0), excluded.last_event_id),
+				country = COALESCE(excluded.country, country),
+				asn = COALESCE(excluded.asn, asn),
+				as_org = COALESCE(excluded.as_org, as_org)
+			""",
+			[
+				(
+					ip, p["first_seen"], p["last_seen"], p["total"], p["http"], p["ssh"],
+					new_usernames.get(ip, 0), new_paths.get(ip, 0), p["last_event_id"], p["last_event_type"],
+					iputil.pack_ip(ip), p["country"], p["asn"], p["as_org"],
+				)
+				for ip, p in self.profiles.items()
+			],
+		)
+		conn.executemany(
+			"""
+			INSERT INTO ip_hourly (hour, ip, total, http_count, ssh_count) VALUES (?, ?, ?, ?, ?)
+			ON CONFLICT(hour, ip) DO UPDATE SET
+				total = total + excluded.total,
+				http_count = http_count + excluded.http_count,
+				ssh_count = ssh_count + excluded.ssh_count
+			""",
+			[(hour, ip, *counts) for (hour, ip), counts in self.hourly.items()],
+		)
+		conn.execute("DELETE FROM ip_hourly WHERE hour < ?", (int(time.time() // 3600) - HOURLY_RETENTION_HOURS,))
+		conn.executemany(
+			"INSERT OR IGNORE INTO ip_timeline (ip, ts, id, source, event_type, username, path) VALUES (?, ?, ?, ?, ?, ?, ?)",
+			self.timeline,
+		)
+
+
+def _asn_label(asn: Optional[int], org: Optional[str]) -> Optional[str]:
+	"""``"AS15169 Google"``, the form the dashboard shows for simulated attackers."""
+	parts = [f"AS{asn}" if asn is not None else "", org or ""]
+	return " ".join(p for p in parts if p) or None
+
+
+def _profile_row(row: sqlite3.Row) -> Dict[str, Any]:
+	return {
+		"ip": row["ip"],
+		"first_seen": row["first_seen"],
+		"last_seen": row["last_seen"],
+		"count": row["total"],
+		"http_count": row["http_count"],
+		"ssh_count": row["ssh_count"],
+		"distinct_usernames": row["distinct_usernames"],
+		"distinct_paths": row["distinct_paths"],
+		"last_event_id": row["last_event_id"],
+		"last_event_type": row["last_event_type"],
+		"country": row["country"],
+		"asn": _asn_label(row["asn"], row["as_org"]),
+		"asn_number": row["asn"],
+	}
+
+
+class _ClosedWindow:
+	"""Per-IP ``[total, http, ssh]`` over a window's completed hours.
+
+	Those hours do not change once the hour rolls over (late events aside),
+	so the fold and each ranking's top ``MAX_TOP`` are built once per hour
+	and shared by every request until then.
+	"""
+
+	def __init__(self, hour: int, totals: Dict[str, List[int]]):
+		self.hour = hour
+		self.built = time.monotonic()
+		self.totals = totals
+		self.top = [heapq.nlargest(MAX_TOP, totals.items(), key=lambda item, i=i: item[1][i]) for i in range(3)]
+
+	def fresh(self, hour: int) -> bool:
+		return self.hour == hour and time.monotonic() - self.built < WINDOW_TTL
+
+
+# (database file, window) -> _ClosedWindow
+_WINDOWS: Dict[Tuple[str, str], _ClosedWindow] = {}
+_WINDOWS_LOCK = threading.Lock()
+
+
+def _fold(cur: sqlite3.Cursor, sql: str, params: Tuple[Any, ...]) -> Dict[str, List[int]]:
+	totals: Dict[str, List[int]] = {}
+	for ip, total, http_count, ssh_count in cur.execute(sql, params):
+		entry = totals.setdefault(ip, [0, 0, 0])
+		entry[0] += total
+		entry[1] += http_count
+		entry[2] += ssh_count
+	return totals
+
+
+def _closed_window(cur: sqlite3.Cursor, window: str, hour: int) -> _ClosedWindow:
+	path = cur.execute("PRAGMA database_list").fetchone()[2]
+	key = (path, window)
+	with _WINDOWS_LOCK:
+		closed = _WINDOWS.get(key)
+		if closed is None or not closed.fresh(hour):
+			since_hour = hour - WINDOWS[window] // 3600
+			closed = _ClosedWindow(hour, _fold(
+				cur, "SELECT ip, total, http_count, ssh_count FROM ip_hourly WHERE hour >= ? AND hour < ?", (since_hour, hour)
+			))
+			if path:
+				_WINDOWS[key] = closed
+	return closed
+
+
+def top_attackers(conn: sqlite3.Connection, window: str = "all", by: str = "events", limit: int = 10) -> List[Dict[str, Any]]:
+	"""Top IPs for ``window`` ranked by ``by``.
+
+	All-time rankings walk an ``ip_profile`` index and stop after ``limit``
+	rows. Windowed rankings read only the current hour's buckets and merge
+	them into the cached fold of the completed hours: an IP outside that
+	fold's top ``MAX_TOP`` can only rank if it was active this hour.
+	"""
+	if window not in WINDOWS:
+		raise AttackerQueryError(f"unknown window: {window} (use {', '.join(WINDOWS)})")
+	if by not in RANKINGS:
+		raise AttackerQueryError(f"unknown ranking: {by} (use {', '.join(RANKINGS)})")
+	limit = max(1, min(limit, MAX_TOP))
+	profile_column, hourly_column = RANKINGS[by]
+	cur = conn.cursor()
+	cur.row_factory = sqlite3.Row
+	with instrumentation.DB_QUERY.time(("telemetry", "top_attackers")):
+		if WINDOWS[window] is None:
+			rows = cur.execute(
+				f"SELECT * FROM ip_profile ORDER BY {profile_column} DESC LIMIT ?", (limit,)
+			).fetchall()
+			return [_profile_row(r) for r in rows]
+		if hourly_column is None:
+			raise AttackerQueryError(f"ranking '{by}' is only available for window=all")
+		hour = int(time.time() // 3600)
+		index = {"total": 0, "http_count": 1, "ssh_count": 2}[hourly_column]
+		closed = _closed_window(conn.cursor(), window, hour)
+		candidates = {ip: list(counts) for ip, counts in closed.top[index]}
+		current = _fold(conn.cursor(), "SELECT ip, total, http_count, ssh_count FROM ip_hourly WHERE hour >= ?", (hour,))
+		for ip, counts in current.items():
+			base = candidates.get(ip) or closed.totals.get(ip) or [0, 0, 0]
+			candidates[ip] = [a + b for a, b in zip(base, counts)]
+		best = heapq.nlargest(limit, candidates.items(), key=lambda item: item[1][index])
+		if not best:
+			return []
+		placeholders = ",".join("?" for _ in best)
+		profiles = {
+			r["ip"]: _profile_row(r)
+			for r in cur.execute(f"SELECT * FROM ip_profile WHERE ip IN ({placeholders})", [ip for ip, _ in best])
+		}
+		result = []
+		for ip, (total, http_count, ssh_count) in best:
+			item = dict(profiles.get(ip) or {"ip": ip})
+			item.update({"count": total, "http_count": http_count, "ssh_count": ssh_count, "window": window})
+			result.append(item)
+		return result
+
+
+def cidr_rollup(conn: sqlite3.Connection, prefix: int = 24, within: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+	"""Per-network totals for IPv4 ``/prefix`` blocks, busiest first.
+
+	Works on ``ip_profile`` (one row per IP) and reads ``ip_packed`` through
+	its index; ``within`` narrows that to a range scan of one network.
+	"""
+	if prefix not in ROLLUP_PREFIXES:
+		raise AttackerQueryError(f"prefix must be one of {', '.join(map(str, ROLLUP_PREFIXES))}")
+	low, high = 0, iputil.V4_MAX
+	if within:
+		try:
+			low, high = iputil.cidr_range(within)
+		except ValueError:
+			raise AttackerQueryError(f"invalid cidr: {within}")
+		if not isinstance(low, int):
+			raise AttackerQueryError("cidr rollups cover IPv4 only")
+	limit = max(1, min(limit, MAX_TOP))
+	shift = 32 - prefix
+	with instrumentation.DB_QUERY.time(("telemetry", "cidr_rollup")):
+		rows = conn.execute(
+			f"""
+			SELECT ip_packed >> {shift} AS net, SUM(total), SUM(http_count), SUM(ssh_count), COUNT(*), MAX(last_seen)
+			FROM ip_profile WHERE ip_packed BETWEEN ? AND ?
+			GROUP BY net ORDER BY SUM(total) DESC LIMIT ?
+			""",
+			(low, high, limit),
+		).fetchall()
+	return [
+		{
+			"cidr": f"{iputil.unpack_ip(net << shift)}/{prefix}",
+			"count": total,
+			"http_count": http_count,
+			"ssh_count": ssh_count,
+			"ips": ips,
+			"last_seen": last_seen,
+		}
+		for net, total, http_count, ssh_count, ips, last_seen in rows
+	]
+
+
+def timeline(
+	conn: sqlite3.Connection,
+	ip: str,
+	limit: int = 100,
+	before: Optional[Tuple[str, int]] = None,
+	source: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+	"""One IP's HTTP and SSH events, newest first, from ``ip_timeline``.
+
+	The table is clustered on ``(ip, ts, id)``, so a page is a single range
+	read of that IP's rows; ``before`` is the ``(ts, id)`` keyset position.
+	"""
+	clauses = ["ip = ?"]
+	params: List[Any] = [ip]
+	if before is not None:
+		clauses.append("(ts, id) < (?, ?)")
+		params.extend(before)
+	if source:
+		clauses.append("source = ?")
+		params.append(source)
+	params.append(limit)
+	with instrumentation.DB_QUERY.time(("telemetry", "ip_timeline")):
+		rows = conn.execute(
+			f"""
+			SELECT id, ts, source, event_type, username, path FROM ip_timeline
+			WHERE {' AND '.join(clauses)} ORDER BY ts DESC, id DESC LIMIT ?
+			""",
+			params,
+		).fetchall()
+	return [
+		{"id": r[0], "timestamp": r[1], "source": r[2], "event": r[3], "username": r[4], "path": r[5]}
+		for r in rows
+	]
+
+
+def ip_profile(conn: sqlite3.Connection, ip: str, top_n: int = 10) -> Optional[Dict[str, Any]]:
+	cur = conn.cursor()
+	cur.row_factory = sqlite3.Row
+	with instrumentation.DB_QUERY.time(("telemetry", "ip_profile")):
+		row = cur.execute("SELECT * FROM ip_profile WHERE ip = ?", (ip,)).fetchone()
+		if row is None:
+			return None
+		profile = _profile_row(row)
+		profile["top_usernames"] = [
+			{"username": r[0], "count": r[1]}
+			for r in conn.execute(
+				"SELECT username, count FROM ip_usernames WHERE ip = ? ORDER BY count DESC LIMIT ?", (ip, top_n)
+			)
+		]
+		profile["top_paths"] = [
+			{"path": r[0], "count": r[1]}
+			for r in conn.execute("SELECT path, count FROM ip_paths WHERE ip = ? ORDER BY count DESC LIMIT ?", (ip, top_n))
+		]
+		since_hour = int((time.time() - WINDOWS["7d"]) // 3600)
+		profile["hourly"] = [
+			{"hour": r[0] * 3600, "count": r[1]}
+			for r in conn.execute(
+				"SELECT hour, total FROM ip_hourly WHERE hour >= ? AND ip = ? ORDER BY hour", (since_hour, ip)
+			)
+		]
+	return profile
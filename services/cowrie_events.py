@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services import instrumentation
+from services.log_reader import _parse_time
+
+
+LOGIN_EVENTS = {"cowrie.login.success": "success", "cowrie.login.failed": "failed"}
+COMMAND_EVENTS = {"cowrie.command.input"}
+DOWNLOAD_EVENTS = {"cowrie.session.file_download"}
+BACKFILL_BATCH = 5000
+MAX_ROWS = 1000
+# Upserted per event; absent values (None) never overwrite what is stored.
+SESSION_COLUMNS = (
+	"src_ip", "src_port", "dst_ip", "dst_port", "sensor", "started", "ended", "duration",
+	"client_version", "login", "username", "ttylog",
+)
+_SESSION_ADDED_COLUMNS = {
+	"login": "TEXT",
+	"username": "TEXT",
+	"ttylog": "TEXT",
+	"command_count": "INTEGER NOT NULL DEFAULT 0",
+	"has_tty": "INTEGER",
+}
+
+
+def ensure_schema(conn: sqlite3.Connection) -> bool:
+	"""Create or extend the side tables; True if stored lines need routing."""
+	created = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sessions'").fetchone()
+	conn.execute("""
+		CREATE TABLE IF NOT EXISTS sessions (
+			session TEXT PRIMARY KEY,
+			src_ip TEXT,
+			src_port INTEGER,
+			dst_ip TEXT,
+			dst_port INTEGER,
+			sensor TEXT,
+			started TEXT,
+			ended TEXT,
+			duration REAL,
+			client_version TEXT,
+			login TEXT,
+			username TEXT,
+			ttylog TEXT,
+			command_count INTEGER NOT NULL DEFAULT 0,
+			has_tty INTEGER
+		)
+	""")
+	columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+	missing = [name for name in _SESSION_ADDED_COLUMNS if name not in columns]
+	for name in missing:
+		conn.execute(f"ALTER TABLE sessions ADD COLUMN {name} {_SESSION_ADDED_COLUMNS[name]}")
+	# Listing pages walk (started, rowid) newest first; filters lead their own index.
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions(started)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_ip ON sessions(src_ip, started)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_tty ON sessions(has_tty, started)")
+	conn.execute("""
+		CREATE TABLE IF NOT EXISTS ssh_commands (
+			id INTEGER PRIMARY KEY,
+			session TEXT NOT NULL,
+			ts TEXT NOT NULL,
+			src_ip TEXT,
+			command TEXT NOT NULL
+		)
+	""")
+	# The same line can arrive from both the SSE feed and the log tail.
+	conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ssh_commands_session ON ssh_commands(session, ts, command)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_ssh_commands_ip ON ssh_commands(src_ip, id)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_ssh_commands_command ON ssh_commands(command)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_ssh_commands_ts ON ssh_commands(ts)")
+	conn.execute("""
+		CREATE TABLE IF NOT EXISTS ssh_downloads (
+			id INTEGER PRIMARY KEY,
+			session TEXT NOT NULL,
+			ts TEXT NOT NULL,
+			src_ip TEXT,
+			url TEXT,
+			outfile TEXT,
+			shasum TEXT
+		)
+	""")
+	conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ssh_downloads_session ON ssh_downloads(session, ts, url)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_ssh_downloads_ip ON ssh_downloads(src_ip, id)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_ssh_downloads_shasum ON ssh_downloads(shasum)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_ssh_downloads_ts ON ssh_downloads(ts)")
+	return created or bool(missing)
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+	"""Decode a Cowrie JSON line (log tail or ``data:``-prefixed SSE frame)."""
+	raw = line.strip()
+	if raw.startswith("data:"):
+		raw = raw[5:].strip()
+	if not raw.startswith("{"):
+		return None
+	try:
+		entry = json.loads(raw)
+	except Exception:
+		return None
+	return entry if isinstance(entry, dict) else None
+
+
+class SideTableBatch:
+	"""Routes the interesting Cowrie events of one write batch to typed rows.
+
+	Everything else stays only in ``ssh_lines``; the batch is flushed in the
+	caller's transaction so side tables never run ahead of the raw lines.
+	"""
+
+	def __init__(self) -> None:
+		self.sessions: List[Tuple[Any, ...]] = []
+		self.commands: List[Tuple[Any, ...]] = []
+		self.downloads: List[Tuple[Any, ...]] = []
+
+	def _session(self, session: str, **values: Any) -> None:
+		self.sessions.append((session, *(values.get(name) for name in SESSION_COLUMNS)))
+
+	def add(self, ts: str, entry: Dict[str, Any]) -> None:
+		event_id = entry.get("eventid")
+		session = entry.get("session")
+		if not session or not isinstance(event_id, str):
+			return
+		src_ip = entry.get("src_ip")
+		if event_id in COMMAND_EVENTS:
+			command = entry.get("input")
+			if command is not None:
+				self.commands.append((session, ts, src_ip, str(command)))
+		elif event_id in DOWNLOAD_EVENTS:
+			self.downloads.append((session, ts, src_ip, entry.get("url"), entry.get("outfile"), entry.get("shasum")))
+		elif event_id in LOGIN_EVENTS:
+			self._session(session, src_ip=src_ip, login=LOGIN_EVENTS[event_id], username=entry.get("username"))
+		elif event_id == "cowrie.session.connect":
+			self._session(
+				session, src_ip=src_ip, src_port=entry.get("src_port"), dst_ip=entry.get("dst_ip"),
+				dst_port=entry.get("dst_port"), sensor=entry.get("sensor"), started=ts,
+			)
+		elif event_id == "cowrie.session.closed":
+			duration = entry.get("duration")
+			try:
+				duration = float(duration) if duration is not None else None
+			except (TypeError, ValueError):
+				duration = None
+			self._session(session, src_ip=src_ip, ended=ts, duration=duration)
+		elif event_id == "cowrie.client.version":
+			self._session(session, src_ip=src_ip, client_version=entry.get("version"))
+		elif event_id == "cowrie.log.closed":
+			self._session(session, src_ip=src_ip, ttylog=entry.get("ttylog"))
+
+	def add_line(self, ts: str, line: str) -> None:
+		entry = parse_line(line)
+		if entry is None:
+			return
+		# Prefer Cowrie's own timestamp so SSE and log-tail copies of a line dedupe.
+		raw_ts = entry.get("timestamp") or entry.get("time")
+		parsed = _parse_time(raw_ts) if isinstance(raw_ts, str) else None
+		self.add(parsed.isoformat() if parsed else ts, entry)
+
+	def flush(self, conn: sqlite3.Connection) -> None:
+		if self.sessions:
+			merged = ", ".join(
+				f"{name} = COALESCE(excluded.{name}, {name})" for name in SESSION_COLUMNS if name not in ("login", "username")
+			)
+			# A successful login sticks; until then the latest attempted username is kept.
+			conn.executemany(
+				f"""
+				INSERT INTO sessions (session, {", ".join(SESSION_COLUMNS)})
+				VALUES ({", ".join("?" for _ in range(len(SESSION_COLUMNS) + 1))})
+				ON CONFLICT(session) DO UPDATE SET
+					{merged},
+					username = CASE WHEN login = 'success' THEN username ELSE COALESCE(excluded.username, username) END,
+					login = CASE WHEN login = 'success' THEN login ELSE COALESCE(excluded.login, login) END
+				""",
+				self.sessions,
+			)
+		if self.commands:
+			# Count only rows actually inserted, so a line seen twice is counted once.
+			counts: Dict[str, List[Any]] = {}
+			for row in self.commands:
+				if conn.execute("INSERT OR IGNORE INTO ssh_commands (session, ts, src_ip, command) VALUES (?, ?, ?, ?)", row).rowcount > 0:
+					counts.setdefault(row[0], [row[2], 0])[1] += 1
+			conn.executemany(
+				"""
+				INSERT INTO sessions (session, src_ip, command_count) VALUES (?, ?, ?)
+				ON CONFLICT(session) DO UPDATE SET command_count = command_count + excluded.command_count
+				""",
+				[(session, src_ip, count) for session, (src_ip, count) in counts.items()],
+			)
+		if self.downloads:
+			conn.executemany(
+				"INSERT OR IGNORE INTO ssh_downloads (session, ts, src_ip, url, outfile, shasum) VALUES (?, ?, ?, ?, ?, ?)",
+				self.downloads,
+			)
+		self.sessions, self.commands, self.downloads = [], [], []
+
+
+def backfill(conn: sqlite3.Connection, batch: int = BACKFILL_BATCH) -> int:
+	"""Route every stored ``ssh_lines`` row once, in id-ordered batches."""
+	routed = 0
+	last_id = 0
+	while True:
+		rows = conn.execute(
+			"SELECT id, ts, line FROM ssh_lines WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch)
+		).fetchall()
+		if not rows:
+			break
+		side = SideTableBatch()
+		for _, ts, line in rows:
+			side.add_line(ts, line)
+		side.flush(conn)
+		conn.commit()
+		last_id = rows[-1][0]
+		routed += len(rows)
+	# Exact even when the command rows were already routed by an earlier version.
+	conn.execute("UPDATE sessions SET command_count = (SELECT COUNT(*) FROM ssh_commands WHERE ssh_commands.session = sessions.session)")
+	conn.commit()
+	if routed:
+		logging.getLogger(__name__).info("Routed %d stored SSH lines into Cowrie side tables", routed)
+	return routed
+
+
+def refresh_tty(conn: sqlite3.Connection, tty_files: Set[str], only_unchecked: bool) -> int:
+	"""Set ``has_tty`` from a listing of the tty directory; returns rows changed.
+
+	``only_unchecked`` limits the pass to sessions never checked, for when the
+	directory is known not to have changed since the previous listing.
+	"""
+	where = "WHERE has_tty IS NULL" if only_unchecked else ""
+	updates = []
+	for session, has_tty in conn.execute(f"SELECT session, has_tty FROM sessions {where}"):
+		found = int(session in tty_files)
+		if found != has_tty:
+			updates.append((found, session))
+	conn.executemany("UPDATE sessions SET has_tty = ? WHERE session = ?", updates)
+	return len(updates)
+
+
+def list_sessions(
+	conn: sqlite3.Connection,
+	limit: int = 100,
+	before: Optional[Tuple[str, int]] = None,
+	ip: Optional[str] = None,
+	login: Optional[str] = None,
+	has_tty: Optional[bool] = None,
+) -> List[Dict[str, Any]]:
+	"""Sessions newest first, keyset-paginated on ``(started, rowid)``."""
+	clauses = ["started IS NOT NULL"]
+	params: List[Any] = []
+	if ip:
+		clauses.append("src_ip = ?")
+		params.append(ip)
+	if login:
+		clauses.append("login = ?")
+		params.append(login)
+	if has_tty is not None:
+		clauses.append("has_tty = ?")
+		params.append(int(has_tty))
+	if before is not None:
+		clauses.append("(started, rowid) < (?, ?)")
+		params.extend(before)
+	conn.row_factory = sqlite3.Row
+	with instrumentation.DB_QUERY.time(("playback", "list_sessions")):
+		rows = conn.execute(
+			f"""
+			SELECT rowid, session, src_ip, started, ended, duration, login, username, command_count,
+				has_tty, client_version
+			FROM sessions WHERE {' AND '.join(clauses)} ORDER BY started DESC, rowid DESC LIMIT ?
+			""",
+			[*params, max(1, min(limit, MAX_ROWS))],
+		).fetchall()
+	return [
+		{
+			"rowid": r["rowid"],
+			"timestamp": r["started"],
+			"session": r["session"],
+			"ip": r["src_ip"],
+			"ended": r["ended"],
+			"duration": r["duration"],
+			"login": r["login"],
+			"username": r["username"],
+			"command_count": r["command_count"],
+			"has_tty": None if r["has_tty"] is None else bool(r["has_tty"]),
+			"client_version": r["client_version"],
+		}
+		for r in rows
+	]
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+	return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _page(
+	conn: sqlite3.Connection,
+	table: str,
+	columns: str,
+	clauses: List[str],
+	params: List[Any],
+	limit: int,
+	before_id: Optional[int],
+) -> List[sqlite3.Row]:
+	if before_id is not None:
+		clauses.append("id < ?")
+		params.append(before_id)
+	where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+	conn.row_factory = sqlite3.Row
+	with instrumentation.DB_QUERY.time(("playback", table)):
+		return conn.execute(
+			f"SELECT {columns} FROM {table} {where} ORDER BY id DESC LIMIT ?",
+			[*params, max(1, min(limit, MAX_ROWS))],
+		).fetchall()
+
+
+def query_commands(
+	conn: sqlite3.Connection,
+	session: Optional[str] = None,
+	ip: Optional[str] = None,
+	prefix: Optional[str] = None,
+	limit: int = 100,
+	before_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+	"""Commands typed in honeypot shells, newest first; ``prefix`` uses the command index."""
+	clauses: List[str] = []
+	params: List[Any] = []
+	if session:
+		clauses.append("session = ?")
+		params.append(session)
+	if ip:
+		clauses.append("src_ip = ?")
+		params.append(ip)
+	if prefix:
+		clauses.append("command >= ? AND command < ?")
+		params.extend([prefix, _prefix_upper_bound(prefix)])
+	rows = _page(conn, "ssh_commands", "id, session, ts, src_ip, command", clauses, params, limit, before_id)
+	return [dict(r) for r in rows]
+
+
+def query_downloads(
+	conn: sqlite3.Connection,
+	session: Optional[str] = None,
+	ip: Optional[str] = None,
+	shasum: Optional[str] = None,
+	limit: int = 100,
+	before_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+	clauses: List[str] = []
+	params: List[Any] = []
+	for column, value in (("session", session), ("src_ip", ip), ("shasum", shasum.lower() if shasum else None)):
+		if value:
+			clauses.append(f"{column} = ?")
+			params.append(value)
+	rows = _page(conn, "ssh_downloads", "id, session, ts, src_ip, url, outfile, shasum", clauses, params, limit, before_id)
+	return [dict(r) for r in rows]
+
+
+def session_detail(conn: sqlite3.Connection, session: str) -> Optional[Dict[str, Any]]:
+	conn.row_factory = sqlite3.Row
+	with instrumentation.DB_QUERY.time(("playback", "session_detail")):
+		row = conn.execute("SELECT * FROM sessions WHERE session = ?", (session,)).fetchone()
+		if row is None:
+			return None
+		detail = dict(row)
+		detail["commands"] = [
+			dict(r) for r in conn.execute(
+				"SELECT id, ts, command FROM ssh_commands WHERE session = ? ORDER BY ts, id LIMIT ?", (session, MAX_ROWS)
+			)
+		]
+		detail["downloads"] = [
+			dict(r) for r in conn.execute(
+				"SELECT id, ts, url, outfile, shasum FROM ssh_downloads WHERE session = ? ORDER BY ts, id", (session,)
+			)
+		]
+	return detail
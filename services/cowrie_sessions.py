@@ -1,14 +1,15 @@
 from __future__ import annotations
 
 import json
-import subprocess
 from pathlib import Path
 from typing import Any, Dict, Generator, List, Optional
 
 from config import Config
+from services import timing, ttylog
 from services.log_reader import _parse_time
 
 
+@timing.timed("session_scan")
 def list_cowrie_sessions(config: Config) -> List[Dict[str, Any]]:
 	"""Return session summaries for recorded Cowrie connections."""
 	ssh_log_path = config.ssh_log_path
@@ -52,36 +53,22 @@ def safe_session_id(session_id: str) -> Optional[str]:
 	return session_id
 
 
-def stream_playlog(config: Config, session_id: str) -> Generator[str, None, None]:
+def session_ttylog(config: Config, session_id: str) -> ttylog.TtyLog:
+	"""Open a session's tty recording; raises ``FileNotFoundError``/``TtyLogError``."""
 	safe_id = safe_session_id(session_id)
 	if not safe_id:
-		yield "Invalid session id\n"
-		return
-	tty_path = config.cowrie_tty_path / safe_id
-	if not tty_path.exists():
-		yield "Session file missing on disk\n"
+		raise FileNotFoundError("Invalid session id")
+	return ttylog.open_ttylog(config.cowrie_tty_path / safe_id)
+
+
+def stream_playlog(config: Config, session_id: str, start: float = 0.0, speed: float = 1.0) -> Generator[str, None, None]:
+	"""Replay a session's terminal output in (scaled) real time."""
+	try:
+		log = session_ttylog(config, session_id)
+	except FileNotFoundError:
+		yield "Session file missing on disk\n" if safe_session_id(session_id) else "Invalid session id\n"
 		return
-	if not config.playlog_bin.exists():
-		yield "playlog binary not found\n"
+	except ttylog.TtyLogError:
+		yield "Session file is not a ttylog\n"
 		return
-	proc = None
-	try:
-		proc = subprocess.Popen(
-			[str(config.playlog_bin), str(tty_path)],
-			stdout=subprocess.PIPE,
-			stderr=subprocess.STDOUT,
-			text=True,
-			bufsize=1,
-		)
-		if not proc.stdout:
-			yield "Failed to start replay\n"
-			return
-		for line in proc.stdout:
-			yield line
-	finally:
-		if proc and proc.poll() is None:
-			proc.terminate()
-			try:
-				proc.wait(timeout=2)
-			except Exception:
-				proc.kill()
+	yield from ttylog.play_text(log, start, speed)
@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services import instrumentation
+from services.log_reader import _parse_time
+
+
+KINDS = ("username", "password", "pair")
+WINDOWS = {"1h": 1, "24h": 24, "all": None}
+SKETCH_WIDTH = 2048
+SKETCH_DEPTH = 4
+HEAVY_HITTERS = 256
+PERSIST_INTERVAL = 10.0
+PAIR_SEP = "\x00"
+
+CREDENTIALS_SEEN = instrumentation.counter(
+	"sentinel_credentials_total", "Credential attempts folded into the sketches.", ("kind",)
+)
+
+
+class CountMinSketch:
+	"""Fixed-size frequency sketch; estimates never undercount."""
+
+	def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, table: Optional[array] = None):
+		self.width = width
+		self.depth = depth
+		self.table = table if table is not None else array("I", bytes(4 * width * depth))
+
+	def _cells(self, key: str) -> Iterable[int]:
+		digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+		h1 = int.from_bytes(digest[:4], "little")
+		h2 = int.from_bytes(digest[4:], "little") | 1
+		for row in range(self.depth):
+			yield row * self.width + (h1 + row * h2) % self.width
+
+	def add(self, key: str, count: int = 1) -> int:
+		estimate = None
+		for cell in self._cells(key):
+			self.table[cell] += count
+			value = self.table[cell]
+			estimate = value if estimate is None or value < estimate else estimate
+		return estimate or 0
+
+	def estimate(self, key: str) -> int:
+		return min(self.table[cell] for cell in self._cells(key))
+
+	def merge(self, other: "CountMinSketch") -> None:
+		for i, value in enumerate(other.table):
+			self.table[i] += value
+
+	def to_bytes(self) -> bytes:
+		return self.table.tobytes()
+
+	@classmethod
+	def from_bytes(cls, data: bytes, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH) -> "CountMinSketch":
+		table = array("I")
+		table.frombytes(data)
+		if len(table) != width * depth:
+			return cls(width, depth)
+		return cls(width, depth, table)
+
+
+class SpaceSaving:
+	"""Space-saving heavy hitters: at most ``capacity`` counters.
+
+	A new key evicts the current minimum and inherits its count as error, so
+	every key with true frequency above N/capacity is guaranteed to be kept.
+	The minimum is found through a lazily cleaned heap, keeping updates at
+	O(log capacity).
+	"""
+
+	def __init__(self, capacity: int = HEAVY_HITTERS):
+		self.capacity = capacity
+		self.counts: Dict[str, List[int]] = {}
+		self._heap: List[Tuple[int, str]] = []
+
+	def add(self, key: str, count: int = 1) -> None:
+		entry = self.counts.get(key)
+		if entry is None:
+			if len(self.counts) >= self.capacity:
+				floor = self._evict_min()
+				entry = self.counts[key] = [floor, floor]
+			else:
+				entry = self.counts[key] = [0, 0]
+		entry[0] += count
+		heapq.heappush(self._heap, (entry[0], key))
+		if len(self._heap) > 4 * self.capacity + 64:
+			self._heap = [(c, k) for k, (c, _) in self.counts.items()]
+			heapq.heapify(self._heap)
+
+	def _evict_min(self) -> int:
+		while self._heap:
+			count, key = heapq.heappop(self._heap)
+			entry = self.counts.get(key)
+			if entry is not None and entry[0] == count:
+				del self.counts[key]
+				return count
+		# Heap drained by stale entries; fall back to a scan.
+		key = min(self.counts, key=lambda k: self.counts[k][0])
+		return self.counts.pop(key)[0]
+
+	def top(self, limit: int) -> List[Tuple[str, int, int]]:
+		best = heapq.nlargest(limit, self.counts.items(), key=lambda item: item[1][0])
+		return [(key, count, error) for key, (count, error) in best]
+
+	def to_json(self) -> str:
+		return json.dumps(self.counts, separators=(",", ":"))
+
+	@classmethod
+	def from_json(cls, data: str, capacity: int = HEAVY_HITTERS) -> "SpaceSaving":
+		summary = cls(capacity)
+		try:
+			for key, (count, error) in json.loads(data).items():
+				summary.counts[key] = [int(count), int(error)]
+		except Exception:
+			summary.counts = {}
+		summary._heap = [(c, k) for k, (c, _) in summary.counts.items()]
+		heapq.heapify(summary._heap)
+		return summary
+
+
+class _Summary:
+	def __init__(self) -> None:
+		self.sketch = CountMinSketch()
+		self.hitters = SpaceSaving()
+		self.total = 0
+
+	def add(self, key: str) -> None:
+		self.sketch.add(key)
+		self.hitters.add(key)
+		self.total += 1
+
+
+class CredentialTracker:
+	"""Bounded-memory credential spray statistics for one telemetry DB.
+
+	Usernames, passwords and username/password pairs each get an all-time
+	summary plus hourly summaries for the last day; windowed views merge the
+	hourly ones. State is written to ``credential_sketch`` at most every
+	``PERSIST_INTERVAL`` seconds from the ingest transaction, so a crash
+	loses at most that much.
+	"""
+
+	def __init__(self) -> None:
+		self.all_time: Dict[str, _Summary] = {kind: _Summary() for kind in KINDS}
+		self.hourly: "OrderedDict[int, Dict[str, _Summary]]" = OrderedDict()
+		self.loaded = False
+		self._dirty_hours: set = set()
+		self._dirty_all = False
+		self._last_persist = time.monotonic()
+		self._lock = threading.Lock()
+		self._load_lock = threading.Lock()
+
+	def _hour_summaries(self, hour: int) -> Optional[Dict[str, _Summary]]:
+		current = int(time.time() // 3600)
+		if hour <= current - WINDOWS["24h"]:
+			return None
+		summaries = self.hourly.get(hour)
+		if summaries is None:
+			summaries = self.hourly[hour] = {kind: _Summary() for kind in KINDS}
+			self.hourly = OrderedDict(sorted(self.hourly.items()))
+		while self.hourly and next(iter(self.hourly)) <= current - WINDOWS["24h"]:
+			self.hourly.popitem(last=False)
+		return summaries
+
+	def _add(self, username: Optional[str], password: Optional[str], hour: int) -> None:
+		keys = {
+			"username": username,
+			"password": password,
+			"pair": f"{username}{PAIR_SEP}{password}" if username is not None and password is not None else None,
+		}
+		hourly = self._hour_summaries(hour)
+		for kind, key in keys.items():
+			if key is None:
+				continue
+			self.all_time[kind].add(key)
+			if hourly is not None:
+				hourly[kind].add(key)
+			CREDENTIALS_SEEN.inc(1, (kind,))
+		self._dirty_all = True
+		if hourly is not None:
+			self._dirty_hours.add(hour)
+
+	def observe(self, events: Iterable[Tuple[Optional[str], Optional[str], Any]]) -> None:
+		"""Fold ``(username, password, timestamp)`` tuples into the summaries."""
+		with self._lock:
+			for username, password, ts in events:
+				if username is None and password is None:
+					continue
+				parsed = _parse_time(ts) if isinstance(ts, str) else None
+				hour = int((parsed.timestamp() if parsed else time.time()) // 3600)
+				self._add(
+					str(username) if username is not None else None,
+					str(password) if password is not None else None,
+					hour,
+				)
+
+	def load(self, conn: sqlite3.Connection) -> None:
+		"""Restore persisted state, or build it once from existing events."""
+		with self._load_lock:
+			if self.loaded:
+				return
+			rows = conn.execute("SELECT scope, kind, sketch, hitters, total FROM credential_sketch").fetchall()
+			with self._lock:
+				for scope, kind, sketch, hitters, total in rows:
+					if kind not in KINDS:
+						continue
+					summary = _Summary()
+					summary.sketch = CountMinSketch.from_bytes(sketch)
+					summary.hitters = SpaceSaving.from_json(hitters)
+					summary.total = total
+					if scope == "all":
+						self.all_time[kind] = summary
+					elif scope.startswith("h:"):
+						target = self._hour_summaries(int(scope[2:]))
+						if target is not None:
+							target[kind] = summary
+				self._dirty_hours.clear()
+				self._dirty_all = False
+			if not rows:
+				self.observe(
+					conn.execute("SELECT username, password, ts FROM events WHERE username IS NOT NULL OR password IS NOT NULL")
+				)
+				# The "all" rows are written even when empty, marking the build as done.
+				with self._lock:
+					self._dirty_all = True
+				self.persist(conn, force=True)
+			self.loaded = True
+
+	def persist(self, conn: sqlite3.Connection, force: bool = False) -> None:
+		with self._lock:
+			now = time.monotonic()
+			if not force and now - self._last_persist < PERSIST_INTERVAL:
+				return
+			if not self._dirty_all and not self._dirty_hours:
+				return
+			rows = []
+			if self._dirty_all:
+				rows.extend(("all", kind, s.sketch.to_bytes(), s.hitters.to_json(), s.total) for kind, s in self.all_time.items())
+			for hour in self._dirty_hours:
+				summaries = self.hourly.get(hour)
+				if summaries is None:
+					continue
+				rows.extend((f"h:{hour}", kind, s.sketch.to_bytes(), s.hitters.to_json(), s.total) for kind, s in summaries.items())
+			oldest = next(iter(self.hourly), None)
+			self._dirty_all = False
+			self._dirty_hours.clear()
+			self._last_persist = now
+		conn.executemany(
+			"INSERT OR REPLACE INTO credential_sketch (scope, kind, sketch, hitters, total) VALUES (?, ?, ?, ?, ?)",
+			rows,
+		)
+		if oldest is not None:
+			conn.execute(
+				"DELETE FROM credential_sketch WHERE scope LIKE 'h:%' AND CAST(substr(scope, 3) AS INTEGER) < ?",
+				(oldest,),
+			)
+
+	def _window_parts(self, kind: str, window: str) -> List[Tuple[CountMinSketch, Dict[str, List[int]], int, int]]:
+		"""Copies of ``window``'s ``(sketch, hitters, capacity, total)`` summaries; call under ``_lock``."""
+		if WINDOWS[window] is None:
+			summaries = [self.all_time[kind]]
+		else:
+			since = int(time.time() // 3600) - WINDOWS[window] + 1
+			summaries = [by_kind[kind] for hour, by_kind in self.hourly.items() if hour >= since]
+		return [
+			(
+				CountMinSketch(s.sketch.width, s.sketch.depth, array("I", s.sketch.table)),
+				{key: list(entry) for key, entry in s.hitters.counts.items()},
+				s.hitters.capacity,
+				s.total,
+			)
+			for s in summaries
+		]
+
+	@staticmethod
+	def _merge(parts: List[Tuple[CountMinSketch, Dict[str, List[int]], int, int]]) -> Tuple[SpaceSaving, CountMinSketch, int]:
+		"""Merge hourly summaries into one window summary.
+
+		A key missing from a full hour may still have occurred there up to
+		that hour's smallest count, so that floor is added to both its count
+		and its error; the sketch estimate then bounds the count from above.
+		"""
+		merged = SpaceSaving(capacity=HEAVY_HITTERS * max(1, len(parts)))
+		sketch = CountMinSketch()
+		total = 0
+		floors = []
+		for part_sketch, counts, capacity, part_total in parts:
+			sketch.merge(part_sketch)
+			total += part_total
+			floors.append(min(entry[0] for entry in counts.values()) if len(counts) >= capacity else 0)
+		floor_sum = sum(floors)
+		for (_, counts, _, _), floor in zip(parts, floors):
+			for key, (count, error) in counts.items():
+				entry = merged.counts.setdefault(key, [floor_sum, floor_sum])
+				entry[0] += count - floor
+				entry[1] += error - floor
+		return merged, sketch, total
+
+	def _window_summary(self, kind: str, window: str) -> Tuple[SpaceSaving, CountMinSketch, int]:
+		# Copy under the lock, merge outside it, so reads never stall observe().
+		with self._lock:
+			parts = self._window_parts(kind, window)
+		return self._merge(parts)
+
+	def top(self, kind: str = "pair", window: str = "all", limit: int = 20) -> Dict[str, Any]:
+		if kind not in KINDS:
+			raise ValueError(f"unknown kind: {kind} (use {', '.join(KINDS)})")
+		if window not in WINDOWS:
+			raise ValueError(f"unknown window: {window} (use {', '.join(WINDOWS)})")
+		hitters, sketch, total = self._window_summary(kind, window)
+		# Both structures overcount; the smaller of the two is the tighter
+		# bound, and count - error is what space-saving guarantees.
+		ranked = []
+		for key, count, error in hitters.top(limit * 4):
+			ranked.append((min(count, sketch.estimate(key)), max(0, count - error), key))
+		ranked.sort(key=lambda item: (-item[0], -item[1]))
+		items = []
+		for estimate, guaranteed, key in ranked[:limit]:
+			item: Dict[str, Any] = {"count": estimate, "guaranteed": guaranteed}
+			if kind == "pair":
+				username, _, password = key.partition(PAIR_SEP)
+				item.update({"username": username, "password": password})
+			else:
+				item[kind] = key
+			items.append(item)
+		return {"kind": kind, "window": window, "total": total, "top": items}
+
+	def estimate(self, kind: str, key: str, window: str = "all") -> int:
+		_, sketch, _ = self._window_summary(kind, window)
+		return sketch.estimate(key)
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+	conn.execute("""
+		CREATE TABLE IF NOT EXISTS credential_sketch (
+			scope TEXT NOT NULL,
+			kind TEXT NOT NULL,
+			sketch BLOB NOT NULL,
+			hitters TEXT NOT NULL,
+			total INTEGER NOT NULL DEFAULT 0,
+			PRIMARY KEY (scope, kind)
+		)
+	""")
+
+
+_TRACKERS: Dict[str, CredentialTracker] = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def get_tracker(db_path: Any) -> CredentialTracker:
+	key = str(db_path)
+	with _TRACKERS_LOCK:
+		tracker = _TRACKERS.get(key)
+		if tracker is None:
+			tracker = _TRACKERS[key] = CredentialTracker()
+		return tracker
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from services import instrumentation, iputil
+from services.event_bus import EventBus
+from services.log_reader import _parse_time
+
+
+ALERTS_RAISED = instrumentation.counter(
+	"sentinel_alerts_total", "Detection alerts raised.", ("rule", "severity")
+)
+DETECTION_KEYS = instrumentation.gauge(
+	"sentinel_detection_keys", "Keys tracked by the detection engine.", ("table",)
+)
+DETECTION_EVICTED = instrumentation.counter(
+	"sentinel_detection_evicted_total", "Idle or least-recently-used keys evicted.", ("table",)
+)
+
+SSH_FAILURE_EVENTS = {"cowrie.login.failed"}
+HTTP_LOGIN_EVENTS = {"fake_login"}
+
+
+@dataclass(frozen=True)
+class Rule:
+	name: str
+	title: str
+	window: float
+	buckets: int
+	threshold: int
+	critical: int
+
+
+SSH_BURST_IP = Rule("ssh_bruteforce", "Bruteforce wave detected", 60.0, 12, 20, 200)
+SSH_BURST_SUBNET = Rule("ssh_bruteforce_subnet", "Distributed SSH bruteforce", 300.0, 10, 60, 600)
+HTTP_STUFFING = Rule("http_credential_stuffing", "HTTP credential stuffing", 60.0, 12, 10, 100)
+NEW_SUBNET_TITLE = "New IP cluster"
+NEW_SUBNET_PER_MINUTE = 20
+# Older events (a first import, a shipper backlog) only mark their subnet as
+# known; announcing them as new would be stale news.
+NEW_SUBNET_MAX_AGE = 300.0
+
+
+class SlidingWindow:
+	"""Event count over the last ``buckets`` time buckets.
+
+	Advancing only clears the buckets that expired since the last update, so
+	an update costs O(1) amortised and at most ``buckets`` steps.
+	"""
+
+	__slots__ = ("counts", "newest", "total", "last_seen")
+
+	def __init__(self, buckets: int):
+		self.counts = [0] * buckets
+		self.newest = 0
+		self.total = 0
+		self.last_seen = 0.0
+
+	def _advance(self, bucket: int) -> None:
+		size = len(self.counts)
+		if bucket <= self.newest:
+			return
+		if bucket - self.newest >= size:
+			self.counts = [0] * size
+			self.total = 0
+		else:
+			for b in range(self.newest + 1, bucket + 1):
+				slot = b % size
+				self.total -= self.counts[slot]
+				self.counts[slot] = 0
+		self.newest = bucket
+
+	def add(self, bucket: int, now: float, count: int = 1) -> int:
+		self._advance(bucket)
+		if bucket > self.newest - len(self.counts):
+			self.counts[bucket % len(self.counts)] += count
+			self.total += count
+		self.last_seen = now
+		return self.total
+
+
+class WindowTable:
+	"""Per-key sliding windows with idle expiry and an LRU cap on key count."""
+
+	def __init__(self, name: str, rule: Rule, max_keys: int):
+		self.name = name
+		self.rule = rule
+		self.max_keys = max_keys
+		self.bucket_seconds = rule.window / rule.buckets
+		self.windows: "OrderedDict[str, SlidingWindow]" = OrderedDict()
+		DETECTION_KEYS.set_function(lambda: len(self.windows), (name,))
+
+	def add(self, key: str, at: float, now: float) -> int:
+		"""Count an event that happened at ``at``; ``now`` drives idle expiry."""
+		window = self.windows.get(key)
+		if window is None:
+			window = self.windows[key] = SlidingWindow(self.rule.buckets)
+		else:
+			self.windows.move_to_end(key)
+		total = window.add(int(at // self.bucket_seconds), now)
+		self._evict(now)
+		return total
+
+	def _evict(self, now: float) -> None:
+		evicted = 0
+		while self.windows:
+			key, oldest = next(iter(self.windows.items()))
+			idle = now - oldest.last_seen > self.rule.window
+			if not idle and len(self.windows) <= self.max_keys:
+				break
+			self.windows.popitem(last=False)
+			evicted += 1
+		if evicted:
+			DETECTION_EVICTED.inc(evicted, (self.name,))
+
+
+class LRUSet:
+	def __init__(self, max_keys: int):
+		self.max_keys = max_keys
+		self.items: "OrderedDict[str, float]" = OrderedDict()
+
+	def touch(self, key: str, now: float) -> bool:
+		"""Record ``key``; returns True if it was not already present."""
+		present = key in self.items
+		self.items[key] = now
+		self.items.move_to_end(key)
+		while len(self.items) > self.max_keys:
+			self.items.popitem(last=False)
+		return not present
+
+
+def subnet_of(ip: Any) -> Optional[str]:
+	return iputil.bucket_cidr(ip, 24)
+
+
+def event_time(event: Dict[str, Any], now: float) -> float:
+	"""When ``event`` happened, from its own timestamp; arrival time without one.
+
+	Clamped to ``now`` so a skewed clock cannot open buckets in the future.
+	"""
+	raw = event.get("timestamp")
+	parsed = raw if isinstance(raw, datetime.datetime) else _parse_time(raw) if isinstance(raw, str) else None
+	if parsed is None:
+		return now
+	if parsed.tzinfo is None:
+		parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+	return min(parsed.timestamp(), now)
+
+
+class DetectionEngine:
+	"""Sliding-window detection over committed events from the event bus.
+
+	Runs on one background thread; windows are keyed by IP and /24 and are
+	bounded by ``max_keys`` each, with idle keys expiring after their window.
+	Events are bucketed by their own timestamp, so a backlog committed in one
+	batch is not mistaken for a burst; events older than a rule's window are
+	not counted against it.
+	Alerts go through ``store`` (which persists them and returns them with
+	ids) and are republished on the ``alerts`` topic.
+	"""
+
+	def __init__(
+		self,
+		bus: EventBus,
+		store: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+		seed_subnets: Optional[Callable[[int], Iterable[str]]] = None,
+		max_keys: int = 100000,
+	):
+		self.bus = bus
+		self.store = store
+		self.seed_subnets = seed_subnets
+		self.max_keys = max_keys
+		self.ssh_ip = WindowTable("ssh_ip", SSH_BURST_IP, max_keys)
+		self.ssh_subnet = WindowTable("ssh_subnet", SSH_BURST_SUBNET, max_keys)
+		self.http_ip = WindowTable("http_ip", HTTP_STUFFING, max_keys)
+		self.subnets = LRUSet(max_keys)
+		self._cooldowns: "OrderedDict[str, float]" = OrderedDict()
+		self._new_subnet_budget = (0, 0)
+		self._thread: Optional[threading.Thread] = None
+		self._lock = threading.Lock()
+
+	def ensure_started(self) -> None:
+		with self._lock:
+			if self._thread and self._thread.is_alive():
+				return
+			self._thread = threading.Thread(target=self._run, daemon=True)
+			self._thread.start()
+
+	def _seed(self) -> None:
+		if self.seed_subnets is None:
+			return
+		try:
+			now = time.time()
+			for ip in self.seed_subnets(self.max_keys):
+				subnet = subnet_of(ip)
+				if subnet:
+					self.subnets.touch(subnet, now)
+		except Exception:
+			logging.getLogger(__name__).exception("Failed to seed known subnets")
+
+	def _run(self) -> None:
+		self._seed()
+		sub = self.bus.subscribe(["events"], maxsize=1000)
+		try:
+			while True:
+				item = sub.get(timeout=1.0)
+				if item is None:
+					continue
+				alerts = self.process(item[1], time.time())
+				dropped = sub.take_dropped()
+				if dropped:
+					logging.getLogger(__name__).warning("Detection fell behind; %d event batches dropped", dropped)
+				if alerts:
+					try:
+						stored = self.store(alerts)
+					except Exception:
+						logging.getLogger(__name__).exception("Failed to store alerts")
+						continue
+					self.bus.publish("alerts", stored)
+		finally:
+			sub.close()
+
+	def _cooling(self, key: str, now: float, window: float) -> bool:
+		"""True if ``key`` already alerted within its window; one alert per burst."""
+		until = self._cooldowns.get(key)
+		if until is not None and until > now:
+			return True
+		self._cooldowns[key] = now + window
+		self._cooldowns.move_to_end(key)
+		while len(self._cooldowns) > self.max_keys:
+			self._cooldowns.popitem(last=False)
+		return False
+
+	def _alert(
+		self, rule_name: str, title: str, severity: str, key: str, detail: str, count: int, event: Dict[str, Any], at: float
+	) -> Dict[str, Any]:
+		ALERTS_RAISED.inc(1, (rule_name, severity))
+		return {
+			"ts": datetime.datetime.fromtimestamp(at, datetime.timezone.utc).isoformat(),
+			"rule": rule_name,
+			"severity": severity,
+			"key": key,
+			"title": title,
+			"detail": detail,
+			"count": count,
+			"event_id": event.get("id"),
+		}
+
+	def _threshold(
+		self, table: WindowTable, key: str, at: float, now: float, event: Dict[str, Any], what: str
+	) -> Optional[Dict[str, Any]]:
+		rule = table.rule
+		if now - at > rule.window:
+			return None
+		count = table.add(key, at, now)
+		if count < rule.threshold or self._cooling(f"{rule.name}|{key}", at, rule.window):
+			return None
+		severity = "critical" if count >= rule.critical else "high"
+		detail = f"{count} {what} from {key} in {int(rule.window)}s"
+		return self._alert(rule.name, rule.title, severity, key, detail, count, event, at)
+
+	def process(self, events: Iterable[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+		alerts: List[Dict[str, Any]] = []
+		for event in events:
+			ip = event.get("ip")
+			if not ip or ip == "unknown":
+				continue
+			subnet = subnet_of(ip)
+			at = event_time(event, now)
+			kind = event.get("event") or event.get("event_type")
+			source = event.get("source")
+			candidates = []
+			if source == "SSH" and kind in SSH_FAILURE_EVENTS:
+				candidates.append(self._threshold(self.ssh_ip, ip, at, now, event, "SSH auth failures"))
+				if subnet:
+					candidates.append(self._threshold(self.ssh_subnet, subnet, at, now, event, "SSH auth failures"))
+			elif source == "HTTP" and (
+				kind in HTTP_LOGIN_EVENTS or (str(event.get("method") or "").upper() == "POST" and event.get("path") == "/")
+			):
+				candidates.append(self._threshold(self.http_ip, ip, at, now, event, "login POSTs"))
+			if subnet and self.subnets.touch(subnet, now) and now - at <= NEW_SUBNET_MAX_AGE:
+				candidates.append(self._new_subnet(subnet, source, at, event))
+			alerts.extend(a for a in candidates if a is not None)
+		return alerts
+
+	def _new_subnet(self, subnet: str, source: Any, at: float, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		# A scan wave can surface thousands of subnets at once; cap the noise.
+		minute, used = self._new_subnet_budget
+		current = int(at // 60)
+		if current > minute:
+			minute, used = current, 0
+		if used >= NEW_SUBNET_PER_MINUTE:
+			self._new_subnet_budget = (minute, used)
+			return None
+		self._new_subnet_budget = (minute, used + 1)
+		return self._alert("new_subnet", NEW_SUBNET_TITLE, "low", subnet, f"Unseen {subnet} hitting {source or 'honeypot'}", 1, event, at)
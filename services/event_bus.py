@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Deque, Iterable, List, Optional, Set, Tuple
+
+from services import instrumentation
+
+
+DEFAULT_BUFFER = 1000
+
+BUS_DROPPED = instrumentation.counter(
+	"sentinel_bus_dropped_total", "Bus messages dropped because a subscriber buffer was full.", ("topic",)
+)
+BUS_SUBSCRIBERS = instrumentation.gauge("sentinel_bus_subscribers", "Active event bus subscriptions.")
+
+
+class Subscription:
+	"""Bounded per-subscriber buffer; the oldest message is dropped on overflow."""
+
+	def __init__(self, bus: "EventBus", topics: Iterable[str], maxsize: int = DEFAULT_BUFFER):
+		self.bus = bus
+		self.topics: Set[str] = set(topics)
+		self.buffer: Deque[Tuple[str, Any]] = deque(maxlen=maxsize)
+		self.dropped = 0
+		self._cond = threading.Condition()
+
+	def _push(self, topic: str, payload: Any) -> None:
+		with self._cond:
+			if len(self.buffer) == self.buffer.maxlen:
+				self.dropped += 1
+				BUS_DROPPED.inc(1, (topic,))
+			self.buffer.append((topic, payload))
+			self._cond.notify()
+
+	def get(self, timeout: Optional[float] = None) -> Optional[Tuple[str, Any]]:
+		"""Return the next ``(topic, payload)`` or ``None`` after ``timeout``."""
+		with self._cond:
+			if not self.buffer:
+				self._cond.wait(timeout)
+			if not self.buffer:
+				return None
+			return self.buffer.popleft()
+
+	def take_dropped(self) -> int:
+		with self._cond:
+			dropped, self.dropped = self.dropped, 0
+		return dropped
+
+	def close(self) -> None:
+		self.bus.unsubscribe(self)
+
+	def __enter__(self) -> "Subscription":
+		return self
+
+	def __exit__(self, *exc: Any) -> None:
+		self.close()
+
+
+class EventBus:
+	"""In-process pub/sub used to push committed events to SSE clients."""
+
+	def __init__(self) -> None:
+		self._subs: List[Subscription] = []
+		self._lock = threading.Lock()
+
+	def subscribe(self, topics: Iterable[str], maxsize: int = DEFAULT_BUFFER) -> Subscription:
+		sub = Subscription(self, topics, maxsize)
+		with self._lock:
+			self._subs.append(sub)
+		BUS_SUBSCRIBERS.inc()
+		return sub
+
+	def unsubscribe(self, sub: Subscription) -> None:
+		with self._lock:
+			if sub not in self._subs:
+				return
+			self._subs.remove(sub)
+		BUS_SUBSCRIBERS.dec()
+
+	def has_subscribers(self, topic: str) -> bool:
+		with self._lock:
+			return any(topic in sub.topics for sub in self._subs)
+
+	def publish(self, topic: str, payload: Any) -> int:
+		with self._lock:
+			targets = [sub for sub in self._subs if topic in sub.topics]
+		for sub in targets:
+			sub._push(topic, payload)
+		return len(targets)
+
+
+_BUS = EventBus()
+
+
+def get_event_bus() -> EventBus:
+	return _BUS
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import csv
+import functools
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import iputil
+
+
+# Header: magic, row count, source csv size and mtime_ns (rebuild marker).
+_MAGIC = b"SGEOIP1\0"
+_HEADER = struct.Struct("=8sIqq")
+_RELOAD_CHECK_SECONDS = 30.0
+
+Geo = Tuple[Optional[str], Optional[int], Optional[str]]
+
+
+def _parse_bound(value: str) -> Optional[int]:
+	value = value.strip()
+	if value.isdigit():
+		return int(value)
+	return iputil.ipv4_to_int(value)
+
+
+def _parse_asn(value: str) -> Optional[int]:
+	value = value.strip().upper()
+	if value.startswith("AS"):
+		value = value[2:]
+	return int(value) if value.isdigit() else None
+
+
+def _read_ranges(csv_path: Path) -> Tuple[List[Tuple[int, int, int]], List[Geo]]:
+	"""Parse ``start,end,country,asn,org`` or ``cidr,country,asn,org`` rows.
+
+	Bounds may be dotted quads or integers; ``#`` lines and a header row are
+	skipped. Only IPv4 ranges are indexed (IPv6 rows are ignored).
+	"""
+	ranges: List[Tuple[int, int, int]] = []
+	labels: List[Geo] = []
+	label_ids: Dict[Geo, int] = {}
+	with csv_path.open(newline="", encoding="utf-8") as handle:
+		for row in csv.reader(handle):
+			if not row or row[0].lstrip().startswith("#"):
+				continue
+			if "/" in row[0]:
+				try:
+					low, high = iputil.cidr_range(row[0])
+				except ValueError:
+					continue
+				rest = row[1:]
+			else:
+				low, high = _parse_bound(row[0]), _parse_bound(row[1]) if len(row) > 1 else None
+				rest = row[2:]
+			if not isinstance(low, int) or not isinstance(high, int) or low > high or high > iputil.V4_MAX:
+				continue
+			rest = [value.strip() for value in rest] + [""] * 3
+			label = (rest[0].upper() or None, _parse_asn(rest[1]), rest[2] or None)
+			if label not in label_ids:
+				label_ids[label] = len(labels)
+				labels.append(label)
+			ranges.append((low, high, label_ids[label]))
+	ranges.sort()
+	return ranges, labels
+
+
+def compile_index(csv_path: Path, index_path: Path) -> None:
+	"""Write the sorted range arrays and label table for ``csv_path``.
+
+	The file is written next to its final name and renamed into place, so
+	processes that already mapped the previous index keep a valid view.
+	"""
+	ranges, labels = _read_ranges(csv_path)
+	stat = csv_path.stat()
+	tmp = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+	with tmp.open("wb") as handle:
+		handle.write(_HEADER.pack(_MAGIC, len(ranges), stat.st_size, stat.st_mtime_ns))
+		for column in range(3):
+			handle.write(array("I", (r[column] for r in ranges)).tobytes())
+		handle.write(json.dumps(labels, separators=(",", ":")).encode())
+	os.replace(tmp, index_path)
+	logging.getLogger(__name__).info("Compiled GeoIP index: %d ranges, %d labels", len(ranges), len(labels))
+
+
+class GeoIndex:
+	"""Read-only view of a compiled range index.
+
+	The arrays are slices of one ``mmap`` (shared between worker processes
+	through the page cache) and are searched with ``bisect``; lookups per IP
+	string go through an LRU cache, so repeat IPs cost one dict probe.
+	"""
+
+	def __init__(self, index_path: Path, cache_size: int = 65536):
+		with index_path.open("rb") as handle:
+			self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, count, self.source_size, self.source_mtime_ns = _HEADER.unpack_from(self._map)
+		if magic != _MAGIC:
+			raise ValueError(f"not a GeoIP index: {index_path}")
+		view = memoryview(self._map)
+		offset = _HEADER.size
+		self.starts, self.ends, self.label_ids = (
+			view[offset + i * 4 * count: offset + (i + 1) * 4 * count].cast("I") for i in range(3)
+		)
+		self.labels: List[Geo] = [tuple(label) for label in json.loads(bytes(view[offset + 12 * count:]))]
+		self.lookup = functools.lru_cache(maxsize=cache_size)(self._lookup)
+
+	def __len__(self) -> int:
+		return len(self.starts)
+
+	def _lookup(self, ip: Any) -> Optional[Geo]:
+		value = iputil.pack_ip(ip)
+		if not isinstance(value, int):
+			return None
+		pos = bisect_right(self.starts, value) - 1
+		if pos < 0 or value > self.ends[pos]:
+			return None
+		return self.labels[self.label_ids[pos]]
+
+	def stats(self) -> Dict[str, Any]:
+		info = self.lookup.cache_info()
+		return {"ranges": len(self), "labels": len(self.labels), "cache_hits": info.hits, "cache_misses": info.misses, "cache_size": info.currsize}
+
+
+# csv path -> (source version, index, monotonic time of last stat)
+_INDEXES: Dict[str, Tuple[Any, Optional[GeoIndex], float]] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _load(csv_path: Path, cache_size: int) -> Optional[GeoIndex]:
+	stat = csv_path.stat()
+	index_path = csv_path.with_name(f"{csv_path.name}.idx")
+	try:
+		index = GeoIndex(index_path, cache_size)
+		if (index.source_size, index.source_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+			return index
+	except (OSError, ValueError, struct.error):
+		pass
+	compile_index(csv_path, index_path)
+	return GeoIndex(index_path, cache_size)
+
+
+def get_geoip(csv_path: Optional[Path], cache_size: int = 65536) -> Optional[GeoIndex]:
+	"""Shared index for ``csv_path``, recompiled when the CSV changes.
+
+	Returns None when no range file is configured or it cannot be read.
+	"""
+	if csv_path is None:
+		return None
+	key = str(csv_path)
+	now = time.monotonic()
+	entry = _INDEXES.get(key)
+	if entry is not None and now - entry[2] < _RELOAD_CHECK_SECONDS:
+		return entry[1]
+	with _INDEXES_LOCK:
+		entry = _INDEXES.get(key)
+		if entry is not None and now - entry[2] < _RELOAD_CHECK_SECONDS:
+			return entry[1]
+		try:
+			stat = csv_path.stat()
+			version = (stat.st_size, stat.st_mtime_ns)
+		except OSError:
+			version = None
+		index = entry[1] if entry is not None and entry[0] == version else None
+		if index is None and version is not None:
+			try:
+				index = _load(csv_path, cache_size)
+			except (OSError, ValueError) as exc:
+				logging.getLogger(__name__).warning("GeoIP enrichment disabled: %s", exc)
+		_INDEXES[key] = (version, index, now)
+		return index
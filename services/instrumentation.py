@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+	0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+LAG_BUCKETS: Tuple[float, ...] = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 86400.0)
+
+
+class _Shard:
+	"""Per-thread metric storage; only the owning thread writes to it."""
+
+	__slots__ = ("thread", "values")
+
+	def __init__(self, thread: threading.Thread):
+		self.thread = thread
+		self.values: Dict[Tuple[str, LabelValues], Any] = {}
+
+
+class Registry:
+	"""Holds metric definitions and per-thread shards, merged on scrape.
+
+	Hot-path updates only touch the calling thread's shard, so they never take a
+	lock. Shards of finished threads are folded into ``_retired`` on scrape so
+	counters stay monotonic without the shard list growing per request thread.
+	"""
+
+	def __init__(self) -> None:
+		self._metrics: Dict[str, "_Metric"] = {}
+		self._shards: List[_Shard] = []
+		self._retired: Dict[Tuple[str, LabelValues], Any] = {}
+		self._lock = threading.Lock()
+		self._local = threading.local()
+
+	def shard(self) -> Dict[Tuple[str, LabelValues], Any]:
+		shard = getattr(self._local, "shard", None)
+		if shard is None:
+			shard = _Shard(threading.current_thread())
+			self._local.shard = shard
+			with self._lock:
+				self._shards.append(shard)
+		return shard.values
+
+	def register(self, metric: "_Metric") -> "_Metric":
+		with self._lock:
+			existing = self._metrics.get(metric.name)
+			if existing is not None:
+				return existing
+			self._metrics[metric.name] = metric
+		return metric
+
+	def _merged(self) -> Tuple[Dict[Tuple[str, LabelValues], Any], List["_Metric"]]:
+		with self._lock:
+			live: List[_Shard] = []
+			for shard in self._shards:
+				if shard.thread.is_alive():
+					live.append(shard)
+				else:
+					_merge_into(self._retired, shard.values)
+			self._shards = live
+			merged: Dict[Tuple[str, LabelValues], Any] = {}
+			_merge_into(merged, self._retired)
+			for shard in live:
+				_merge_into(merged, dict(shard.values))
+			metrics = list(self._metrics.values())
+		return merged, metrics
+
+	def render(self) -> str:
+		"""Render every metric in the Prometheus text exposition format."""
+		merged, metrics = self._merged()
+		out: List[str] = []
+		for metric in sorted(metrics, key=lambda m: m.name):
+			out.append(f"# HELP {metric.name} {metric.help}")
+			out.append(f"# TYPE {metric.name} {metric.kind}")
+			out.extend(metric.render(merged))
+		return "\n".join(out) + "\n"
+
+
+def _merge_into(target: Dict[Tuple[str, LabelValues], Any], source: Dict[Tuple[str, LabelValues], Any]) -> None:
+	for key, value in list(source.items()):
+		if isinstance(value, list):
+			current = target.get(key)
+			if current is None:
+				target[key] = list(value)
+			else:
+				for i, v in enumerate(value):
+					current[i] += v
+		else:
+			target[key] = target.get(key, 0) + value
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+	pairs = list(zip(names, values))
+	if extra:
+		pairs.append(extra)
+	if not pairs:
+		return ""
+	body = ",".join(
+		'{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+		for k, v in pairs
+	)
+	return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	if float(value).is_integer():
+		return str(int(value))
+	return repr(float(value))
+
+
+class _Metric:
+	kind = "untyped"
+
+	def __init__(self, registry: Registry, name: str, help: str, labelnames: Sequence[str] = ()):
+		self.registry = registry
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labelnames)
+
+	def _key(self, labels: Sequence[Any]) -> Tuple[str, LabelValues]:
+		if len(labels) != len(self.labelnames):
+			raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+		return (self.name, tuple(str(v) for v in labels))
+
+	def _series(self, merged: Dict[Tuple[str, LabelValues], Any]) -> List[Tuple[LabelValues, Any]]:
+		return sorted((k[1], v) for k, v in merged.items() if k[0] == self.name)
+
+	def render(self, merged: Dict[Tuple[str, LabelValues], Any]) -> List[str]:
+		return [
+			f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+			for labels, value in self._series(merged)
+		]
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def inc(self, amount: float = 1.0, labels: Sequence[Any] = ()) -> None:
+		shard = self.registry.shard()
+		key = self._key(labels)
+		shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+	"""Gauge supporting per-thread inc/dec, absolute set and scrape-time callbacks."""
+
+	kind = "gauge"
+
+	def __init__(self, registry: Registry, name: str, help: str, labelnames: Sequence[str] = ()):
+		super().__init__(registry, name, help, labelnames)
+		self._set_values: Dict[LabelValues, float] = {}
+		self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+	def inc(self, amount: float = 1.0, labels: Sequence[Any] = ()) -> None:
+		shard = self.registry.shard()
+		key = self._key(labels)
+		shard[key] = shard.get(key, 0) + amount
+
+	def dec(self, amount: float = 1.0, labels: Sequence[Any] = ()) -> None:
+		self.inc(-amount, labels)
+
+	def set(self, value: float, labels: Sequence[Any] = ()) -> None:
+		self._set_values[self._key(labels)[1]] = value
+
+	def set_function(self, fn: Callable[[], float], labels: Sequence[Any] = ()) -> None:
+		self._functions[self._key(labels)[1]] = fn
+
+	def render(self, merged: Dict[Tuple[str, LabelValues], Any]) -> List[str]:
+		values: Dict[LabelValues, float] = {labels: value for labels, value in self._series(merged)}
+		for labels, value in list(self._set_values.items()):
+			values[labels] = values.get(labels, 0) + value
+		for labels, fn in list(self._functions.items()):
+			try:
+				values[labels] = values.get(labels, 0) + float(fn())
+			except Exception:
+				continue
+		return [
+			f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+			for labels, value in sorted(values.items())
+		]
+
+
+class Histogram(_Metric):
+	"""Fixed-bucket histogram; each shard entry is [bucket counts..., +Inf, sum]."""
+
+	kind = "histogram"
+
+	def __init__(
+		self,
+		registry: Registry,
+		name: str,
+		help: str,
+		labelnames: Sequence[str] = (),
+		buckets: Sequence[float] = DEFAULT_BUCKETS,
+	):
+		super().__init__(registry, name, help, labelnames)
+		self.buckets = tuple(sorted(buckets))
+
+	def observe(self, value: float, labels: Sequence[Any] = ()) -> None:
+		shard = self.registry.shard()
+		key = self._key(labels)
+		slots = shard.get(key)
+		if slots is None:
+			slots = [0] * (len(self.buckets) + 2)
+			shard[key] = slots
+		slots[bisect_left(self.buckets, value)] += 1
+		slots[-1] += value
+
+	@contextmanager
+	def time(self, labels: Sequence[Any] = ()) -> Iterator[None]:
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - start, labels)
+
+	def render(self, merged: Dict[Tuple[str, LabelValues], Any]) -> List[str]:
+		lines: List[str] = []
+		for labels, slots in self._series(merged):
+			cumulative = 0
+			for bound, count in zip(self.buckets + (float("inf"),), slots[:-1]):
+				cumulative += count
+				le = ("le", _format_value(bound))
+				lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+			suffix = _format_labels(self.labelnames, labels)
+			lines.append(f"{self.name}_sum{suffix} {_format_value(slots[-1])}")
+			lines.append(f"{self.name}_count{suffix} {cumulative}")
+		return lines
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+	return REGISTRY.register(Counter(REGISTRY, name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+	return REGISTRY.register(Gauge(REGISTRY, name, help, labelnames))
+
+
+def histogram(
+	name: str,
+	help: str,
+	labelnames: Sequence[str] = (),
+	buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+	return REGISTRY.register(Histogram(REGISTRY, name, help, labelnames, buckets))
+
+
+def render_text() -> str:
+	return REGISTRY.render()
+
+
+# Hot-path metrics shared across services. Defined here so every module that
+# records a series refers to the same definition.
+EVENTS_INGESTED = counter(
+	"sentinel_events_ingested_total", "Events inserted into the metrics DB.", ("source",)
+)
+EVENTS_DUPLICATE = counter(
+	"sentinel_events_duplicate_total", "Events ignored by the metrics DB as duplicates."
+)
+INGEST_LAG = histogram(
+	"sentinel_ingest_lag_seconds",
+	"Delay between an event's own timestamp and its insertion.",
+	("source",),
+	LAG_BUCKETS,
+)
+SQLITE_COMMIT = histogram(
+	"sentinel_sqlite_commit_seconds", "Time spent in SQLite commits.", ("db",)
+)
+DB_QUERY = histogram(
+	"sentinel_db_query_seconds", "Time spent in read queries.", ("db", "query")
+)
+PLAYBACK_QUEUE_DEPTH = gauge(
+	"sentinel_playback_queue_depth", "Lines waiting in the playback writer queue."
+)
+PLAYBACK_LINES_WRITTEN = counter(
+	"sentinel_playback_lines_written_total", "SSH lines persisted to the playback DB.", ("path",)
+)
+PLAYBACK_LINES_DROPPED = counter(
+	"sentinel_playback_lines_dropped_total", "SSH lines dropped because the playback queue was full."
+)
+SSE_CLIENTS = gauge("sentinel_sse_clients", "Connected server-sent-event clients.", ("stream",))
+SSE_MESSAGES = counter("sentinel_sse_messages_total", "Messages sent to SSE clients.", ("stream",))
+HTTP_REQUESTS = counter(
+	"sentinel_http_requests_total", "HTTP requests handled.", ("blueprint", "endpoint", "status")
+)
+HTTP_LATENCY = histogram(
+	"sentinel_http_request_seconds", "Request handler latency.", ("blueprint", "endpoint")
+)
+SHIPPER_EVENTS = counter(
+	"sentinel_shipper_events_total", "Events handled by log shippers.", ("outcome",)
+)
+SHIPPER_POST = histogram("sentinel_shipper_post_seconds", "Shipper POST /api/ingest latency.")
+
+
+def init_app(app: Any) -> None:
+	"""Record per-endpoint latency for every blueprint registered on ``app``."""
+	from flask import g, request
+
+	@app.before_request
+	def _start_timer():
+		g._instrumentation_start = time.perf_counter()
+
+	@app.after_request
+	def _record_latency(response):
+		start = g.pop("_instrumentation_start", None)
+		if start is not None:
+			labels = (request.blueprint or "app", request.endpoint or "unmatched")
+			HTTP_LATENCY.observe(time.perf_counter() - start, labels)
+			HTTP_REQUESTS.inc(1, labels + (str(response.status_code),))
+		return response
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import ipaddress
+from typing import Any, Optional, Tuple, Union
+
+
+Packed = Union[int, bytes]
+V4_MAX = 0xFFFFFFFF
+
+
+def ipv4_to_int(text: str) -> Optional[int]:
+	"""Dotted-quad to int without ``ipaddress``; ``None`` if not plain IPv4."""
+	parts = text.split(".")
+	if len(parts) != 4:
+		return None
+	value = 0
+	for part in parts:
+		if not part.isdigit() or len(part) > 3:
+			return None
+		octet = int(part)
+		if octet > 255:
+			return None
+		value = (value << 8) | octet
+	return value
+
+
+def pack_ip(ip: Any) -> Optional[Packed]:
+	"""Sortable storage form: INTEGER for IPv4, 16-byte BLOB for IPv6.
+
+	SQLite orders integers before blobs, so one indexed column serves range
+	scans for both families. Anything unparsable (e.g. ``"unknown"``) is None.
+	"""
+	if ip is None:
+		return None
+	text = str(ip).strip()
+	value = ipv4_to_int(text)
+	if value is not None:
+		return value
+	try:
+		addr = ipaddress.ip_address(text)
+	except ValueError:
+		return None
+	if addr.version == 4:
+		return int(addr)
+	mapped = addr.ipv4_mapped
+	if mapped is not None:
+		return int(mapped)
+	return addr.packed
+
+
+def unpack_ip(value: Optional[Packed]) -> Optional[str]:
+	if value is None:
+		return None
+	if isinstance(value, int):
+		return str(ipaddress.IPv4Address(value))
+	return str(ipaddress.IPv6Address(bytes(value)))
+
+
+def cidr_range(cidr: str) -> Tuple[Packed, Packed]:
+	"""Inclusive packed bounds of a network, for ``BETWEEN`` range scans."""
+	network = ipaddress.ip_network(cidr.strip(), strict=False)
+	if network.version == 4:
+		return int(network.network_address), int(network.broadcast_address)
+	return network.network_address.packed, network.broadcast_address.packed
+
+
+def v4_bucket(value: int, prefix: int) -> int:
+	return value >> (32 - prefix) << (32 - prefix)
+
+
+def bucket_cidr(ip: Any, prefix: int = 24) -> Optional[str]:
+	"""``"a.b.c.d"`` -> ``"a.b.c.0/24"`` (or /16, /8, ...) on the hot path.
+
+	IPv6 addresses are bucketed to /48 regardless of ``prefix``.
+	"""
+	text = str(ip)
+	value = ipv4_to_int(text)
+	if value is not None:
+		base = v4_bucket(value, prefix)
+		return f"{base >> 24}.{(base >> 16) & 255}.{(base >> 8) & 255}.{base & 255}/{prefix}"
+	try:
+		addr = ipaddress.ip_address(text)
+	except ValueError:
+		return None
+	if addr.version == 4:
+		return bucket_cidr(str(addr), prefix)
+	return str(ipaddress.ip_network(f"{addr}/48", strict=False))
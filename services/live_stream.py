@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional
+
+from services import instrumentation
+from services.event_bus import EventBus
+
+
+HEARTBEAT_SECONDS = 15.0
+METRICS_MIN_INTERVAL = 1.0
+
+
+class BacklogGap(Exception):
+	"""Raised by a ``backlog`` callable that cannot return every missed row."""
+
+
+def sse_frame(data: Any, event: Optional[str] = None, event_id: Optional[Any] = None) -> str:
+	lines = []
+	if event_id is not None:
+		lines.append(f"id: {event_id}")
+	if event:
+		lines.append(f"event: {event}")
+	lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+	return "\n".join(lines) + "\n\n"
+
+
+def metrics_delta(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+	"""Return only the fields of ``current`` that differ from ``previous``."""
+	if not previous:
+		return dict(current)
+	return {k: v for k, v in current.items() if previous.get(k) != v}
+
+
+class MetricsPump:
+	"""Recomputes dashboard metrics once per burst of committed events.
+
+	A single background thread listens for ``events`` on the bus, coalesces
+	bursts to at most one ``get_metrics`` per second, and publishes only the
+	changed fields on the ``metrics`` topic. Every SSE client shares that one
+	computation instead of re-running the aggregate queries per poll.
+	"""
+
+	def __init__(self, bus: EventBus, compute: Callable[[], Dict[str, Any]]):
+		self.bus = bus
+		self.compute = compute
+		self.latest: Optional[Dict[str, Any]] = None
+		self._lock = threading.Lock()
+		self._thread: Optional[threading.Thread] = None
+
+	def snapshot(self) -> Dict[str, Any]:
+		with self._lock:
+			if self.latest is None:
+				self.latest = self.compute()
+			return dict(self.latest)
+
+	def ensure_started(self) -> None:
+		with self._lock:
+			if self._thread and self._thread.is_alive():
+				return
+			self._thread = threading.Thread(target=self._run, daemon=True)
+			self._thread.start()
+
+	def _refresh(self) -> None:
+		try:
+			current = self.compute()
+		except Exception:
+			logging.getLogger(__name__).exception("Metrics refresh failed")
+			return
+		with self._lock:
+			delta = metrics_delta(self.latest, current)
+			self.latest = current
+		if delta:
+			self.bus.publish("metrics", delta)
+
+	def _run(self) -> None:
+		sub = self.bus.subscribe(["events"], maxsize=64)
+		last_refresh = 0.0
+		pending = False
+		try:
+			while True:
+				item = sub.get(timeout=METRICS_MIN_INTERVAL)
+				while item is not None:
+					pending = True
+					item = sub.get(timeout=0)
+				now = time.monotonic()
+				if pending and now - last_refresh >= METRICS_MIN_INTERVAL:
+					self._refresh()
+					last_refresh = now
+					pending = False
+		finally:
+			sub.close()
+
+
+def stream_events(
+	bus: EventBus,
+	source: Optional[str] = None,
+	maxsize: int = 1000,
+	backlog: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+) -> Generator[str, None, None]:
+	"""SSE stream of newly committed events, optionally filtered by source.
+
+	``backlog`` returns rows the client missed (e.g. since its Last-Event-ID);
+	it is called after subscribing so nothing committed in between is lost.
+	If it raises ``BacklogGap`` the client gets a ``resync`` instead of a
+	partial backlog, and refetches a full page.
+	"""
+	sub = bus.subscribe(["events"], maxsize=maxsize)
+	instrumentation.SSE_CLIENTS.inc(1, ("events",))
+	last_send = time.time()
+	sent_id = 0
+	try:
+		yield sse_frame({"heartbeat": HEARTBEAT_SECONDS}, event="hello")
+		try:
+			missed = backlog() if backlog else []
+		except BacklogGap as gap:
+			missed = []
+			yield sse_frame({"reason": str(gap)}, event="resync")
+		if missed:
+			sent_id = max(e.get("id") or 0 for e in missed)
+			yield sse_frame(missed, event="events", event_id=sent_id)
+		while True:
+			item = sub.get(timeout=1.0)
+			now = time.time()
+			dropped = sub.take_dropped()
+			if dropped:
+				# The client fell behind; tell it to refetch a full page.
+				yield sse_frame({"dropped": dropped}, event="resync")
+				last_send = now
+			if item is not None:
+				events = item[1]
+				if source:
+					events = [e for e in events if e.get("source") == source]
+				if sent_id:
+					events = [e for e in events if (e.get("id") or 0) > sent_id]
+				if events:
+					max_id = max(e.get("id") or 0 for e in events)
+					yield sse_frame(events, event="events", event_id=max_id)
+					instrumentation.SSE_MESSAGES.inc(1, ("events",))
+					last_send = now
+			if now - last_send >= HEARTBEAT_SECONDS:
+				yield ": keepalive\n\n"
+				last_send = time.time()
+	finally:
+		instrumentation.SSE_CLIENTS.dec(1, ("events",))
+		sub.close()
+
+
+def stream_metrics(bus: EventBus, pump: MetricsPump, maxsize: int = 100) -> Generator[str, None, None]:
+	"""SSE stream of a full metrics snapshot followed by changed fields only."""
+	sub = bus.subscribe(["metrics"], maxsize=maxsize)
+	pump.ensure_started()
+	instrumentation.SSE_CLIENTS.inc(1, ("metrics",))
+	last_send = time.time()
+	try:
+		yield sse_frame(pump.snapshot(), event="snapshot")
+		while True:
+			item = sub.get(timeout=1.0)
+			now = time.time()
+			if sub.take_dropped():
+				yield sse_frame(pump.snapshot(), event="snapshot")
+				last_send = now
+			if item is not None:
+				yield sse_frame(item[1], event="delta")
+				instrumentation.SSE_MESSAGES.inc(1, ("metrics",))
+				last_send = now
+			if now - last_send >= HEARTBEAT_SECONDS:
+				yield ": keepalive\n\n"
+				last_send = time.time()
+	finally:
+		instrumentation.SSE_CLIENTS.dec(1, ("metrics",))
+		sub.close()
+
+
+REPLAY_FRAME_ROWS = 200
+
+
+def _replay_seconds(ts: Any) -> Optional[float]:
+	from services.log_reader import _parse_time
+
+	parsed = _parse_time(ts) if isinstance(ts, str) else None
+	return parsed.timestamp() if parsed else None
+
+
+def stream_replay(
+	rows: Iterable[Dict[str, Any]],
+	cursor: Callable[[Dict[str, Any]], str],
+	speed: float = 1.0,
+	max_gap: Optional[float] = None,
+) -> Generator[str, None, None]:
+	"""SSE replay of stored rows in their original timing, scaled by ``speed``.
+
+	Rows due at the same moment are batched into one ``lines`` frame whose id
+	is ``cursor(last row)``, so a client that reconnects with Last-Event-ID
+	resumes right after it. Gaps are divided by ``speed`` (``speed <= 0``
+	sends as fast as the client reads) and optionally capped at ``max_gap``
+	seconds; long waits are slept in heartbeat-sized steps so a departed
+	client is noticed. ``rows`` is consumed lazily, one frame at a time.
+	"""
+	instrumentation.SSE_CLIENTS.inc(1, ("replay",))
+	pending: List[Dict[str, Any]] = []
+	due: Optional[float] = None
+	previous: Optional[float] = None
+	sent = 0
+
+	def _frame() -> str:
+		nonlocal pending, sent
+		frame = sse_frame(pending, event="lines", event_id=cursor(pending[-1]))
+		instrumentation.SSE_MESSAGES.inc(1, ("replay",))
+		sent += len(pending)
+		pending = []
+		return frame
+
+	try:
+		yield sse_frame({"speed": speed, "heartbeat": HEARTBEAT_SECONDS}, event="hello")
+		for row in rows:
+			at = _replay_seconds(row.get("ts"))
+			if speed > 0 and at is not None:
+				gap = max(0.0, at - previous) if previous is not None else 0.0
+				if max_gap is not None:
+					gap = min(gap, max_gap)
+				due = (due if due is not None else time.monotonic()) + gap / speed
+				previous = at
+				wait = due - time.monotonic()
+				if wait > 0.001 and pending:
+					yield _frame()
+				while wait > 0.001:
+					time.sleep(min(wait, HEARTBEAT_SECONDS))
+					wait = due - time.monotonic()
+					if wait > 0.001:
+						yield ": keepalive\n\n"
+			pending.append(row)
+			if len(pending) >= REPLAY_FRAME_ROWS:
+				yield _frame()
+		if pending:
+			yield _frame()
+		yield sse_frame({"rows": sent}, event="end")
+	finally:
+		instrumentation.SSE_CLIENTS.dec(1, ("replay",))
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import datetime
+import heapq
+import itertools
 import json
 from collections import deque
 from pathlib import Path
-from typing import Any, Deque, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 
 from config import Config
+from services import timing
 
 
 UTC = datetime.timezone.utc
@@ -157,30 +160,38 @@ def normalize_ssh_events(raw_events: List[Dict[str, Any]]) -> List[Dict[str, Any
 	return normalized
 
 
+def _event_sort_key(event: Dict[str, Any]) -> datetime.datetime:
+	return event.get("timestamp") or datetime.datetime.min.replace(tzinfo=UTC)
+
+
+@timing.timed("parse_http")
 def collect_http_events(config: Config) -> List[Dict[str, Any]]:
 	http_raw = _load_json_lines(config.http_log_path, config.max_events * 2)
 	http_events = normalize_http_events(http_raw)
-	http_events.sort(
-		key=lambda e: e.get("timestamp") or datetime.datetime.min.replace(tzinfo=UTC),
-		reverse=True,
-	)
+	http_events.sort(key=_event_sort_key, reverse=True)
 	return http_events[: config.max_events]
 
 
+@timing.timed("parse_ssh")
 def collect_ssh_events(config: Config) -> List[Dict[str, Any]]:
 	ssh_raw = _load_json_lines(config.ssh_log_path, config.max_events * 2)
 	ssh_events = normalize_ssh_events(ssh_raw)
-	ssh_events.sort(
-		key=lambda e: e.get("timestamp") or datetime.datetime.min.replace(tzinfo=UTC),
-		reverse=True,
-	)
+	ssh_events.sort(key=_event_sort_key, reverse=True)
 	return ssh_events[: config.max_events]
 
 
+def merge_events(*streams: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+	"""Lazily merge streams that are each already newest-first.
+
+	A heap holds one head per stream, so taking ``n`` events costs
+	O(n log k) and never materialises or re-sorts the inputs.
+	"""
+	return heapq.merge(*streams, key=_event_sort_key, reverse=True)
+
+
 def combine_events(http_events: List[Dict[str, Any]], ssh_events: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
-	combined = http_events + ssh_events
-	combined.sort(key=lambda e: e.get("timestamp") or datetime.datetime.min.replace(tzinfo=UTC), reverse=True)
-	return combined[:limit]
+	"""Newest ``limit`` events across both sources (inputs as from ``collect_*_events``)."""
+	return list(itertools.islice(merge_events(http_events, ssh_events), limit))
 
 
 def serialize_event(event: Dict[str, Any]) -> Dict[str, Any]:
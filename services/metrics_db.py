@@ -1,17 +1,206 @@
 
 from __future__ import annotations
 
+import base64
 import hashlib
+import ipaddress
 import json
+import re
 import sqlite3
+import threading
+import time
 from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
 import logging
 
 from config import Config
-from services import log_reader
+from services import attackers, credentials, event_bus, geoip, instrumentation, iputil, log_reader, timing
+
+
+# Each filter leads with its own column so the planner can seek, then walks
+# (ts, id) in index order for the keyset page without a sort.
+EVENT_INDEXES = {
+    "idx_events_ts": "events(ts, id)",
+    "idx_events_source_ts": "events(source, ts, id)",
+    "idx_events_type_ts": "events(event_type, ts, id)",
+    "idx_events_ip_ts": "events(src_ip, ts, id)",
+    "idx_events_ip_packed_ts": "events(ip_packed, ts, id)",
+    "idx_events_user_ts": "events(username, ts, id)",
+    "idx_events_country_ts": "events(country, ts, id)",
+    "idx_events_asn_ts": "events(asn, ts, id)",
+    "idx_events_path_ts": "events(path, ts, id)",
+}
+# Superseded by the (…, ts, id) variants above; dropped on startup.
+RETIRED_EVENT_INDEXES = ("idx_events_ip_packed", "idx_events_path")
+
+QUERY_FILTERS = ("source", "event_type", "ip", "username", "country", "asn", "path", "path_prefix", "start", "end")
+
+SEARCH_COLUMNS = ("path", "query", "user_agent", "username", "password")
+SEARCH_BACKFILL_BATCH = 5000
+SEARCH_BACKFILL_THREAD_BATCH = 1000
+SEARCH_BACKFILL_PAUSE = 0.05
+MAX_SEARCH_OFFSET = 10000
+
+# db path -> whether FTS5 is available; schema setup runs once per process.
+_SCHEMA_READY: Dict[str, bool] = {}
+_SCHEMA_LOCK = threading.Lock()
+# db path -> background thread indexing rows that predate events_fts.
+_SEARCH_BACKFILLS: Dict[str, threading.Thread] = {}
+
+
+# Output field -> typed column. Projections limited to these never read raw_json.
+EVENT_COLUMNS = {
+    "timestamp": "ts",
+    "source": "source",
+    "ip": "src_ip",
+    "event": "event_type",
+    "event_type": "event_type",
+    "username": "username",
+    "password": "password",
+    "path": "path",
+    "country": "country",
+    "asn": "asn",
+}
+
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
+MAX_FIELDS = 32
+
+
+class QueryError(ValueError):
+    """Raised for filters that cannot be turned into a query."""
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """Parse a ``fields=a,b,c`` projection; ``None`` means the full payload."""
+    if not value:
+        return None
+    fields: List[str] = []
+    for name in value.split(","):
+        name = name.strip()
+        if not name or name == "id" or name in fields:
+            continue
+        if not _FIELD_NAME.match(name):
+            raise QueryError(f"invalid field: {name}")
+        fields.append(name)
+    if len(fields) > MAX_FIELDS:
+        raise QueryError(f"at most {MAX_FIELDS} fields")
+    return fields
+
+
+def project_event(event: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return event
+    projected = {name: event.get(name) for name in fields}
+    if "id" in event:
+        projected["id"] = event["id"]
+    return projected
+
+
+def _projection_sql(fields: Optional[Sequence[str]]) -> str:
+    """Select list after ``id, ts``: raw_json, or only the requested values.
+
+    Typed columns are read directly; other top-level fields are pulled out
+    with ``json_extract`` so the full payload is never decoded in Python.
+    """
+    if fields is None:
+        return "raw_json"
+    parts = []
+    for name in fields:
+        column = EVENT_COLUMNS.get(name)
+        if column:
+            parts.append(column)
+        else:
+            parts.append(f"json_extract(raw_json, '$.{name}'), json_type(raw_json, '$.{name}')")
+    return ", ".join(parts) or "NULL"
+
+
+def encode_cursor(ts: str, row_id: int) -> str:
+    raw = json.dumps([ts, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, row_id = json.loads(raw)
+        if not isinstance(ts, str) or not isinstance(row_id, int):
+            raise ValueError
+        return ts, row_id
+    except Exception:
+        raise QueryError("invalid cursor")
+
+
+def _asn_filter(value: str) -> int:
+    text = value.strip().upper()
+    if text.startswith("AS"):
+        text = text[2:]
+    if not text.isdigit():
+        raise QueryError(f"invalid asn: {value}")
+    return int(text)
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _ip_filter(value: str) -> Tuple[List[str], List[Any]]:
+    """Translate an IP or CIDR into index-friendly clauses.
+
+    Single addresses match the text column. Networks become a range test on
+    the packed ``ip_packed`` column, exact for both IPv4 and IPv6; the unary
+    ``+`` keeps the planner off ``idx_events_ip_packed_ts`` (a range there
+    would need a sort of every match) so it walks ``(ts, id)`` and filters.
+    """
+    try:
+        network = ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        raise QueryError(f"invalid ip/cidr: {value}")
+    if network.num_addresses == 1:
+        return ["src_ip = ?"], [str(network.network_address)]
+    low, high = iputil.cidr_range(str(network))
+    return ["+ip_packed BETWEEN ? AND ?"], [low, high]
+
+
+_SEARCH_TERM = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+
+
+def build_match_query(text: str) -> str:
+    """Turn user input into a safe FTS5 MATCH expression.
+
+    Terms are ANDed; ``"two words"`` is a phrase, a trailing ``*`` is a prefix
+    query and ``username:root`` restricts a term to one column. Everything is
+    quoted so punctuation such as ``/wp-login.php`` never reaches the parser.
+    """
+    parts: List[str] = []
+    for match in _SEARCH_TERM.finditer(text or ""):
+        column, phrase, word = match.groups()
+        term = phrase if phrase is not None else word
+        if column and column not in SEARCH_COLUMNS:
+            term = match.group(0)
+            column = None
+        prefix = term.endswith("*") and phrase is None
+        term = term.rstrip("*") if prefix else term
+        if not term.strip():
+            continue
+        quoted = '"' + term.replace('"', '""') + '"' + ("*" if prefix else "")
+        parts.append(f"{column}:{quoted}" if column else quoted)
+    if not parts:
+        raise QueryError("empty search")
+    return " AND ".join(parts)
+
+
+def _search_values(event: Dict[str, Any]) -> Tuple[Any, ...]:
+    raw = event.get("raw") if isinstance(event.get("raw"), dict) else {}
+    headers = raw.get("headers") if isinstance(raw.get("headers"), dict) else {}
+    return (
+        event.get("path") or raw.get("path"),
+        event.get("query") or raw.get("query_string"),
+        event.get("user_agent") or headers.get("User-Agent"),
+        event.get("username"),
+        event.get("password"),
+    )
 
 
 def to_json_safe(obj: Any) -> Any:
@@ -27,13 +216,21 @@ def to_json_safe(obj: Any) -> Any:
 
 
 class MetricsDB:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, geoip_path: Optional[Path] = None, geoip_cache_size: int = 65536):
         self.db_path = db_path
+        self.geoip_path = geoip_path
+        self.geoip_cache_size = geoip_cache_size
         logger = logging.getLogger(__name__)
         logger.info("DEBUG: Using DB path: %s", self.db_path)
-        self._init_db()
+        key = str(db_path)
+        if key not in _SCHEMA_READY or not Path(db_path).exists():
+            # Threads racing on a fresh file would otherwise collide on the WAL switch.
+            with _SCHEMA_LOCK:
+                if key not in _SCHEMA_READY or not Path(db_path).exists():
+                    _SCHEMA_READY[key] = self._init_db()
+        self.search_enabled = _SCHEMA_READY[key]
 
-    def _init_db(self):
+    def _init_db(self) -> bool:
         with sqlite3.connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS events (
@@ -46,16 +243,101 @@ class MetricsDB:
                     password TEXT,
                     path TEXT,
                     fingerprint TEXT UNIQUE,
-                    raw_json TEXT
+                    raw_json TEXT,
+                    ip_packed,
+                    country TEXT,
+                    asn INTEGER
                 )
             """)
+            self._migrate_packed_ips(conn)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+            for column, kind in (("country", "TEXT"), ("asn", "INTEGER")):
+                # Rows from before enrichment stay NULL; only new ingest is annotated.
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE events ADD COLUMN {column} {kind}")
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS file_offsets (
                     file_path TEXT PRIMARY KEY,
                     offset INTEGER DEFAULT 0
                 )
             """)
+            for name in RETIRED_EVENT_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+            for name, target in EVENT_INDEXES.items():
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_state (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER
+                )
+            """)
+            search_enabled = self._init_search(conn)
+            attackers.ensure_schema(conn)
+            credentials.ensure_schema(conn)
+            # Restore (or build once) the credential summaries at startup, not
+            # inside the first ingest transaction.
+            credentials.get_tracker(self.db_path).load(conn)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS alerts (
+                    id INTEGER PRIMARY KEY,
+                    ts TEXT NOT NULL,
+                    rule TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    key TEXT,
+                    title TEXT,
+                    detail TEXT,
+                    count INTEGER,
+                    event_id INTEGER
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_rule_id ON alerts(rule, id)")
+            conn.commit()
+            # Readers must not hold off the ingest writer while a query runs.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA optimize")
+        return search_enabled
+
+    def _migrate_packed_ips(self, conn: sqlite3.Connection, batch: int = 20000) -> None:
+        """Add and backfill ``ip_packed`` on databases created before it existed."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+        if "ip_packed" in columns:
+            return
+        logger = logging.getLogger(__name__)
+        conn.execute("ALTER TABLE events ADD COLUMN ip_packed")
+        conn.create_function("pack_ip", 1, iputil.pack_ip, deterministic=True)
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        for start in range(0, max_id + 1, batch):
+            conn.execute(
+                "UPDATE events SET ip_packed = pack_ip(src_ip) WHERE id BETWEEN ? AND ? AND src_ip IS NOT NULL",
+                (start, start + batch - 1),
+            )
+            # Commit per batch so the migration never holds the write lock for long.
             conn.commit()
+        logger.info("Backfilled ip_packed for events up to id %d", max_id)
+
+    def _init_search(self, conn: sqlite3.Connection) -> bool:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'events_fts'").fetchone()
+        if exists:
+            return True
+        try:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE events_fts USING fts5(
+                    {", ".join(SEARCH_COLUMNS)},
+                    tokenize = 'unicode61',
+                    prefix = '2 3'
+                )
+            """)
+        except sqlite3.OperationalError as exc:
+            logging.getLogger(__name__).warning("Full-text search disabled: %s", exc)
+            return False
+        # Rows up to here predate the index and are backfilled in batches;
+        # anything newer is indexed by ingest_events.
+        ceiling = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        conn.executemany(
+            "INSERT OR REPLACE INTO search_state (key, value) VALUES (?, ?)",
+            [("backfill_next", 1), ("backfill_ceiling", ceiling)],
+        )
+        return True
 
     def _get_fingerprint(self, event: Dict[str, Any]) -> str:
         # Deterministic fingerprint to dedup
@@ -63,19 +345,32 @@ class MetricsDB:
         key = f"{event.get('source')}|{ts_str}|{event.get('ip')}|{event.get('event')}|{event.get('username')}|{event.get('path')}"
         return hashlib.sha256(key.encode()).hexdigest()
 
+    @timing.timed("db_ingest")
     def ingest_events(self, events: List[Dict[str, Any]]):
         logger = logging.getLogger(__name__)
         with sqlite3.connect(self.db_path) as conn:
             initial_count = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
             inserted = 0
+            committed: List[Dict[str, Any]] = []
+            profiles = attackers.ProfileBatch()
+            tracker = credentials.get_tracker(self.db_path)
+            tracker.load(conn)
+            attempts: List[Tuple[Any, Any, Any]] = []
+            now = datetime.now(timezone.utc)
+            geo = geoip.get_geoip(self.geoip_path, self.geoip_cache_size)
             for event in events:
                 fingerprint = self._get_fingerprint(event)
+                if geo is not None and "country" not in event:
+                    found = geo.lookup(event.get('ip'))
+                    if found is not None:
+                        event = dict(event, country=found[0], asn=found[1], as_org=found[2])
                 try:
                     ts_str = to_json_safe(event.get('timestamp'))
-                    raw_json = json.dumps(to_json_safe(event), ensure_ascii=False)
-                    conn.execute("""
-                        INSERT OR IGNORE INTO events (source, ts, src_ip, event_type, username, password, path, fingerprint, raw_json)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    payload = to_json_safe(event)
+                    raw_json = json.dumps(payload, ensure_ascii=False)
+                    cur = conn.execute("""
+                        INSERT OR IGNORE INTO events (source, ts, src_ip, event_type, username, password, path, fingerprint, raw_json, ip_packed, country, asn)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """, (
                         event.get('source'),
                         ts_str,
@@ -85,18 +380,61 @@ class MetricsDB:
                         event.get('password'),
                         event.get('path'),
                         fingerprint,
-                        raw_json
+                        raw_json,
+                        iputil.pack_ip(event.get('ip')),
+                        event.get('country'),
+                        event.get('asn') if isinstance(event.get('asn'), int) else None,
                     ))
                     inserted += 1
+                    if cur.rowcount > 0:
+                        self._observe_ingest(event, ts_str, now)
+                        profiles.add(cur.lastrowid, event, ts_str)
+                        if event.get('username') is not None or event.get('password') is not None:
+                            attempts.append((event.get('username'), event.get('password'), ts_str))
+                        if self.search_enabled:
+                            conn.execute(
+                                f"INSERT INTO events_fts (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                                (cur.lastrowid, *_search_values(event)),
+                            )
+                        if isinstance(payload, dict):
+                            committed.append(dict(payload, id=cur.lastrowid))
                 except Exception as e:
                     logger.warning("Failed to insert event: %s", str(e))
-            conn.commit()
+            conn.execute("SAVEPOINT ip_profiles")
+            try:
+                profiles.flush(conn)
+                conn.execute("RELEASE ip_profiles")
+            except Exception as e:
+                # Keep the events even if the derived aggregates cannot be written.
+                conn.execute("ROLLBACK TO ip_profiles")
+                logger.warning("Failed to update ip profiles: %s", str(e))
+            tracker.observe(attempts)
+            tracker.persist(conn)
+            with instrumentation.SQLITE_COMMIT.time(("telemetry",)):
+                conn.commit()
             final_count = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
             ignored_duplicates = inserted - (final_count - initial_count)
+            instrumentation.EVENTS_DUPLICATE.inc(ignored_duplicates)
             logger.info("DEBUG: Ingested %d events, inserted_rows=%d, ignored_duplicates=%d, total_DB_rows=%d", len(events), final_count - initial_count, ignored_duplicates, final_count)
+        if committed:
+            event_bus.get_event_bus().publish("events", committed)
+
+    def _observe_ingest(self, event: Dict[str, Any], ts_str: Any, now: datetime):
+        source = event.get('source') or "unknown"
+        instrumentation.EVENTS_INGESTED.inc(1, (source,))
+        if not isinstance(ts_str, str):
+            return
+        try:
+            ts = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
+        except ValueError:
+            return
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        instrumentation.INGEST_LAG.observe(max(0.0, (now - ts).total_seconds()), (source,))
 
+    @timing.timed("metrics")
     def get_metrics(self) -> Dict[str, Any]:
-        with sqlite3.connect(self.db_path) as conn:
+        with instrumentation.DB_QUERY.time(("telemetry", "metrics")), sqlite3.connect(self.db_path) as conn:
             # Total events
             total_events = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
             # HTTP attempts
@@ -182,43 +520,376 @@ class MetricsDB:
     def get_recent_events(self, limit: int = 500) -> List[Dict[str, Any]]:
         return self.get_events_page(limit=limit)
 
-    def get_recent_events_by_source(self, source: str, limit: int = 500) -> List[Dict[str, Any]]:
-        sql = "SELECT id, raw_json FROM events WHERE source = ? ORDER BY id DESC LIMIT ?"
+    @timing.timed("db_events")
+    def get_recent_events_by_source(
+        self,
+        source: str,
+        limit: int = 500,
+        since_id: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        sql = f"SELECT id, ts, {_projection_sql(fields)} FROM events WHERE source = ?"
+        params: List[Any] = [source]
+        if since_id is not None:
+            # Rowid range scan: cost scales with new rows, not table size.
+            sql += " AND id > ?"
+            params.append(since_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with instrumentation.DB_QUERY.time(("telemetry", "recent_by_source")), sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(sql, params).fetchall()
+            return self._rows_to_events(rows, fields)
+
+    @timing.timed("db_events")
+    def get_events_page(
+        self,
+        limit: int = 500,
+        before_id: Optional[int] = None,
+        since_id: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        sql = f"SELECT id, ts, {_projection_sql(fields)} FROM events"
+        clauses: List[str] = []
+        params: List[Any] = []
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if since_id is not None:
+            clauses.append("id > ?")
+            params.append(since_id)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with instrumentation.DB_QUERY.time(("telemetry", "events_page")), sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(sql, params).fetchall()
+            return self._rows_to_events(rows, fields)
+
+    @timing.timed("db_query")
+    def query_events(
+        self,
+        filters: Dict[str, Any],
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        budget_ms: float = 250.0,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """Filtered page of events, newest first, keyset-paginated on ``(ts, id)``.
+
+        The query runs on a read-only connection and is interrupted once
+        ``budget_ms`` is spent; rows read so far are returned with
+        ``partial`` set and a cursor to continue from. If the budget runs out
+        before a single row matched there is nothing to resume from, and
+        ``QueryError`` asks for a narrower query instead.
+        """
+        clauses = ["ts IS NOT NULL"]
+        params: List[Any] = []
+        for column in ("source", "event_type", "username"):
+            if filters.get(column):
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        if filters.get("country"):
+            clauses.append("country = ?")
+            params.append(filters["country"].strip().upper())
+        if filters.get("asn"):
+            clauses.append("asn = ?")
+            params.append(_asn_filter(filters["asn"]))
+        if filters.get("ip"):
+            ip_clauses, ip_params = _ip_filter(filters["ip"])
+            clauses.extend(ip_clauses)
+            params.extend(ip_params)
+        if filters.get("path"):
+            clauses.append("path = ?")
+            params.append(filters["path"])
+        if filters.get("path_prefix"):
+            # Filtered while walking (ts, id), like CIDR ranges in _ip_filter.
+            prefix = filters["path_prefix"]
+            clauses.append("+path >= ? AND +path < ?")
+            params.extend([prefix, _prefix_upper_bound(prefix)])
+        if filters.get("start"):
+            clauses.append("ts >= ?")
+            params.append(filters["start"])
+        if filters.get("end"):
+            clauses.append("ts <= ?")
+            params.append(filters["end"])
+        if cursor:
+            ts, row_id = decode_cursor(cursor)
+            clauses.append("(ts, id) < (?, ?)")
+            params.extend([ts, row_id])
+        sql = f"SELECT id, ts, {_projection_sql(fields)} FROM events WHERE {' AND '.join(clauses)} ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        rows: List[Any] = []
+        partial = False
+        conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            conn.set_progress_handler(lambda: 1 if time.perf_counter() > deadline else 0, 1000)
+            with instrumentation.DB_QUERY.time(("telemetry", "query_events")):
+                try:
+                    for row in conn.execute(sql, params):
+                        rows.append(row)
+                except sqlite3.OperationalError as exc:
+                    if "interrupted" not in str(exc):
+                        raise
+                    partial = True
+        finally:
+            conn.close()
+        if partial and not rows:
+            raise QueryError("query exceeded its time budget before matching a row; narrow the query")
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more or partial:
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        events = self._rows_to_events(rows, fields)
+        return {"events": events, "next_cursor": next_cursor, "partial": partial}
+
+    def backfill_search_index(self, batch: int = SEARCH_BACKFILL_BATCH) -> int:
+        """Index one batch of pre-existing rows; returns how many remain."""
+        if not self.search_enabled:
+            return 0
         with sqlite3.connect(self.db_path) as conn:
-            rows = conn.execute(sql, (source, limit)).fetchall()
-            events = []
-            for row in rows:
+            state = dict(conn.execute("SELECT key, value FROM search_state").fetchall())
+            next_id, ceiling = state.get("backfill_next", 1), state.get("backfill_ceiling", 0)
+            if next_id > ceiling:
+                return 0
+            upper = min(ceiling, next_id + batch - 1)
+            rows = conn.execute(
+                "SELECT id, raw_json FROM events WHERE id BETWEEN ? AND ?", (next_id, upper)
+            ).fetchall()
+            values = []
+            for row_id, raw_json in rows:
                 try:
-                    payload = json.loads(row[1])
-                    if isinstance(payload, dict):
-                        payload["id"] = row[0]
-                        events.append(payload)
+                    payload = json.loads(raw_json)
                 except Exception:
-                    pass
-            return events
+                    continue
+                if isinstance(payload, dict):
+                    values.append((row_id, *_search_values(payload)))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO events_fts (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                values,
+            )
+            conn.execute("UPDATE search_state SET value = ? WHERE key = 'backfill_next'", (upper + 1,))
+            conn.commit()
+            return max(0, ceiling - upper)
+
+    def search_backfill_remaining(self) -> int:
+        """Rows that predate the search index and are not indexed yet (read-only)."""
+        if not self.search_enabled:
+            return 0
+        with sqlite3.connect(self.db_path) as conn:
+            state = dict(conn.execute("SELECT key, value FROM search_state").fetchall())
+        return max(0, state.get("backfill_ceiling", 0) - state.get("backfill_next", 1) + 1)
+
+    def start_search_backfill(self) -> None:
+        """Index pre-existing rows on a background thread, a batch at a time.
+
+        Runs once per database per process; the short pause between batches
+        leaves the write lock to ingest.
+        """
+        if not self.search_enabled or not self.search_backfill_remaining():
+            return
+        key = str(self.db_path)
+        with _SCHEMA_LOCK:
+            thread = _SEARCH_BACKFILLS.get(key)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._run_search_backfill, daemon=True)
+            _SEARCH_BACKFILLS[key] = thread
+            thread.start()
+
+    def _run_search_backfill(self) -> None:
+        logger = logging.getLogger(__name__)
+        started = time.perf_counter()
+        try:
+            while self.backfill_search_index(SEARCH_BACKFILL_THREAD_BATCH):
+                time.sleep(SEARCH_BACKFILL_PAUSE)
+        except Exception:
+            logger.exception("Search index backfill failed")
+            return
+        logger.info("Search index backfill finished in %.1fs", time.perf_counter() - started)
+
+    @timing.timed("db_search")
+    def search_events(
+        self,
+        text: str,
+        limit: int = 50,
+        offset: int = 0,
+        before_id: Optional[int] = None,
+        sort: str = "rank",
+        fields: Optional[Sequence[str]] = None,
+        budget_ms: float = 250.0,
+    ) -> Dict[str, Any]:
+        """Full-text search over paths, query strings, user agents and credentials.
+
+        ``sort=rank`` orders by bm25 and pages with ``offset``; ``sort=recent``
+        orders newest first and pages with ``before_id``.
+        """
+        if not self.search_enabled:
+            raise QueryError("full-text search is not available in this SQLite build")
+        match = build_match_query(text)
+        clauses = ["events_fts MATCH ?"]
+        params: List[Any] = [match]
+        if sort == "recent":
+            if before_id is not None:
+                clauses.append("rowid < ?")
+                params.append(before_id)
+            order = "rowid DESC"
+            offset = 0
+        else:
+            order = "rank"
+        offset = max(0, min(offset, MAX_SEARCH_OFFSET))
+        sql = (
+            f"WITH hits AS (SELECT rowid AS hit_id, rank AS score FROM events_fts WHERE {' AND '.join(clauses)}"
+            f" ORDER BY {order} LIMIT ? OFFSET ?)"
+            f" SELECT events.id, events.ts, {_projection_sql(fields)}, hits.score"
+            f" FROM hits JOIN events ON events.id = hits.hit_id"
+            f" ORDER BY {'hits.score, events.id DESC' if order == 'rank' else 'events.id DESC'}"
+        )
+        params.extend([limit + 1, offset])
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            conn.set_progress_handler(lambda: 1 if time.perf_counter() > deadline else 0, 1000)
+            with instrumentation.DB_QUERY.time(("telemetry", "search_events")):
+                try:
+                    rows = conn.execute(sql, params).fetchall()
+                except sqlite3.OperationalError as exc:
+                    if "interrupted" in str(exc):
+                        raise QueryError("search exceeded its time budget; narrow the query")
+                    if "fts5" in str(exc):
+                        raise QueryError(f"invalid search: {exc}")
+                    raise
+        finally:
+            conn.close()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        scores = {row[0]: round(-row[-1], 4) for row in rows}
+        events = self._rows_to_events([row[:-1] for row in rows], fields)
+        for event in events:
+            event["score"] = scores.get(event["id"])
+        result: Dict[str, Any] = {"events": events, "match": match, "sort": "recent" if order != "rank" else "rank"}
+        if has_more:
+            if order == "rank":
+                result["next_offset"] = offset + limit
+            else:
+                result["next_before_id"] = rows[-1][0]
+        return result
+
+    @timing.timed("db_attackers")
+    def get_top_attackers(self, window: str = "all", by: str = "events", limit: int = 10) -> List[Dict[str, Any]]:
+        with sqlite3.connect(self.db_path) as conn:
+            return attackers.top_attackers(conn, window, by, limit)
+
+    @timing.timed("db_attackers")
+    def get_cidr_rollup(self, prefix: int = 24, within: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        with sqlite3.connect(self.db_path) as conn:
+            return attackers.cidr_rollup(conn, prefix, within, limit)
+
+    @timing.timed("db_attackers")
+    def get_ip_profile(self, ip: str) -> Optional[Dict[str, Any]]:
+        with sqlite3.connect(self.db_path) as conn:
+            profile = attackers.ip_profile(conn, ip)
+            if profile and profile.get("last_event_id"):
+                row = conn.execute("SELECT id, ts, raw_json FROM events WHERE id = ?", (profile["last_event_id"],)).fetchone()
+                events = self._rows_to_events([row]) if row else []
+                profile["last_event"] = events[0] if events else None
+            return profile
+
+    @timing.timed("db_attackers")
+    def get_ip_timeline(
+        self, ip: str, limit: int = 100, cursor: Optional[str] = None, source: Optional[str] = None
+    ) -> Dict[str, Any]:
+        before = decode_cursor(cursor) if cursor else None
+        with sqlite3.connect(self.db_path) as conn:
+            events = attackers.timeline(conn, ip, limit + 1, before, source)
+        next_cursor = None
+        if len(events) > limit:
+            events = events[:limit]
+            next_cursor = encode_cursor(events[-1]["timestamp"], events[-1]["id"])
+        return {"ip": ip, "events": events, "next_cursor": next_cursor}
 
-    def get_events_page(self, limit: int = 500, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        sql = "SELECT id, raw_json FROM events"
+    @timing.timed("db_credentials")
+    def get_top_credentials(self, kind: str = "pair", window: str = "all", limit: int = 20) -> Dict[str, Any]:
+        tracker = credentials.get_tracker(self.db_path)
+        if not tracker.loaded:
+            with sqlite3.connect(self.db_path) as conn:
+                tracker.load(conn)
+        return tracker.top(kind, window, limit)
+
+    def store_alerts(self, alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Persist detection alerts and return them with their row ids."""
+        stored = []
+        with sqlite3.connect(self.db_path) as conn:
+            for alert in alerts:
+                cur = conn.execute(
+                    "INSERT INTO alerts (ts, rule, severity, key, title, detail, count, event_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (alert["ts"], alert["rule"], alert["severity"], alert.get("key"), alert.get("title"),
+                     alert.get("detail"), alert.get("count"), alert.get("event_id")),
+                )
+                stored.append(dict(alert, id=cur.lastrowid))
+            conn.commit()
+        return stored
+
+    @timing.timed("db_alerts")
+    def get_alerts(self, limit: int = 50, since_id: Optional[int] = None, rule: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT id, ts, rule, severity, key, title, detail, count, event_id FROM alerts"
+        clauses: List[str] = []
         params: List[Any] = []
-        if before_id is not None:
-            sql += " WHERE id < ?"
-            params.append(before_id)
+        if since_id is not None:
+            clauses.append("id > ?")
+            params.append(since_id)
+        if rule:
+            clauses.append("rule = ?")
+            params.append(rule)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
         sql += " ORDER BY id DESC LIMIT ?"
         params.append(limit)
         with sqlite3.connect(self.db_path) as conn:
-            rows = conn.execute(sql, params).fetchall()
-            events = []
-            for row in rows:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def get_recent_ips(self, limit: int) -> List[str]:
+        with sqlite3.connect(self.db_path) as conn:
+            return [row[0] for row in conn.execute("SELECT ip FROM ip_profile ORDER BY last_seen DESC LIMIT ?", (limit,))]
+
+    def get_max_event_id(self) -> int:
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0
+
+    def _rows_to_events(self, rows: List[Any], fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Decode ``(id, ts, <projection>)`` rows built by ``_projection_sql``."""
+        events = []
+        for row in rows:
+            if fields is None:
                 try:
-                    payload = json.loads(row[1])
+                    payload = json.loads(row[2])
                     if isinstance(payload, dict):
                         payload["id"] = row[0]
                         events.append(payload)
                 except Exception:
                     pass
-            return events
+                continue
+            event: Dict[str, Any] = {"id": row[0]}
+            pos = 2
+            for name in fields:
+                if name in EVENT_COLUMNS:
+                    event[name] = row[pos]
+                    pos += 1
+                    continue
+                value, kind = row[pos], row[pos + 1]
+                pos += 2
+                if kind in ("object", "array"):
+                    value = json.loads(value)
+                elif kind in ("true", "false"):
+                    value = kind == "true"
+                event[name] = value
+            events.append(event)
+        return events
 
 
 def get_metrics_db(config: Config) -> MetricsDB:
     db_path = config.playback_db_path.parent / "telemetry.db"
-    return MetricsDB(db_path)
+    return MetricsDB(db_path, config.geoip_db_path, config.geoip_cache_size)
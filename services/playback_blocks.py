@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import datetime
+import logging
+import re
+import sqlite3
+import time
+import zlib
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# A block never spans more than one BLOCK_SECONDS bucket; readers rely on
+# that to bound how far before a range start they look for blocks.
+BLOCK_SECONDS = 60
+BLOCK_LINES = 256
+COMPACT_CHUNK = 4096
+DICT_SIZE = 32 * 1024
+TRAIN_SAMPLE = 5000
+TRAIN_MIN_LINES = 500
+# "key": value pairs with short scalar values; what repeats across Cowrie lines.
+_FRAGMENT = re.compile(r'"[A-Za-z_.]{1,32}"\s*:\s*(?:"[^"\\]{0,48}"|-?[\d.]+|true|false|null)?')
+
+Row = Tuple[int, str, str]
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+	conn.execute("""
+		CREATE TABLE IF NOT EXISTS ssh_blocks (
+			id INTEGER PRIMARY KEY,
+			min_ts TEXT NOT NULL,
+			max_ts TEXT NOT NULL,
+			min_id INTEGER NOT NULL,
+			max_id INTEGER NOT NULL,
+			lines INTEGER NOT NULL,
+			raw_bytes INTEGER NOT NULL,
+			dict_id INTEGER,
+			data BLOB NOT NULL
+		)
+	""")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_ssh_blocks_ts ON ssh_blocks(min_ts, max_ts)")
+	conn.execute("CREATE TABLE IF NOT EXISTS ssh_dicts (id INTEGER PRIMARY KEY, created TEXT, data BLOB NOT NULL)")
+
+
+def train_dictionary(lines: Iterable[str], size: int = DICT_SIZE) -> bytes:
+	"""Preset zlib dictionary from the fragments that repeat across ``lines``.
+
+	Fragments are ranked by the bytes they would save and the best ones are
+	placed last, where zlib reaches them with the shortest distances.
+	"""
+	counts: Counter = Counter()
+	for line in lines:
+		counts.update(set(_FRAGMENT.findall(line)))
+	ranked = sorted(((count - 1) * len(frag), frag) for frag, count in counts.items() if count > 1)
+	chosen: List[bytes] = []
+	used = 0
+	for _, frag in reversed(ranked):
+		data = frag.encode("utf-8")
+		if used + len(data) > size:
+			continue
+		chosen.append(data)
+		used += len(data)
+	return b"".join(reversed(chosen))
+
+
+def encode_block(rows: List[Row], zdict: Optional[bytes]) -> Tuple[bytes, int]:
+	"""Compress ``(id, ts, line)`` rows; returns the blob and its raw size.
+
+	Layout before compression: ids (int64), line byte lengths (uint32), the
+	timestamps newline-joined, then the lines back to back.
+	"""
+	lines = [line.encode("utf-8") for _, _, line in rows]
+	raw = b"".join((
+		array("q", (row[0] for row in rows)).tobytes(),
+		array("I", (len(line) for line in lines)).tobytes(),
+		"".join(row[1] + "\n" for row in rows).encode("utf-8"),
+		*lines,
+	))
+	compressor = zlib.compressobj(6, zdict=zdict) if zdict else zlib.compressobj(6)
+	return compressor.compress(raw) + compressor.flush(), len(raw)
+
+
+def decode_block(data: bytes, count: int, zdict: Optional[bytes]) -> List[Row]:
+	decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+	raw = decompressor.decompress(data) + decompressor.flush()
+	ids = array("q")
+	ids.frombytes(raw[:8 * count])
+	lengths = array("I")
+	lengths.frombytes(raw[8 * count:12 * count])
+	*stamps, body = raw[12 * count:].split(b"\n", count)
+	rows: List[Row] = []
+	pos = 0
+	for row_id, ts, length in zip(ids, stamps, lengths):
+		rows.append((row_id, ts.decode("utf-8"), body[pos:pos + length].decode("utf-8")))
+		pos += length
+	return rows
+
+
+def _seconds(ts: str) -> Optional[float]:
+	# Naive values are UTC here, matching how stored ``ts`` strings compare.
+	try:
+		parsed = datetime.datetime.fromisoformat(ts[:-1] + "+00:00" if ts.endswith("Z") else ts)
+	except ValueError:
+		return None
+	if parsed.tzinfo is None:
+		parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+	return parsed.timestamp()
+
+
+def _bucket(ts: str) -> Any:
+	seconds = _seconds(ts)
+	return int(seconds // BLOCK_SECONDS) if seconds is not None else ts
+
+
+def _iso(seconds: float) -> str:
+	return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat()
+
+
+class _Dicts:
+	"""Dictionaries by id, loaded once per reader or compaction pass."""
+
+	def __init__(self, conn: sqlite3.Connection):
+		self.conn = conn
+		self.loaded: Dict[int, bytes] = {}
+
+	def get(self, dict_id: Optional[int]) -> Optional[bytes]:
+		if dict_id is None:
+			return None
+		if dict_id not in self.loaded:
+			row = self.conn.execute("SELECT data FROM ssh_dicts WHERE id = ?", (dict_id,)).fetchone()
+			self.loaded[dict_id] = row[0] if row else b""
+		return self.loaded[dict_id] or None
+
+	def latest(self) -> Tuple[Optional[int], Optional[bytes]]:
+		row = self.conn.execute("SELECT id, data FROM ssh_dicts ORDER BY id DESC LIMIT 1").fetchone()
+		if row is None:
+			return None, None
+		self.loaded[row[0]] = row[1]
+		return row[0], row[1]
+
+
+def _groups(rows: List[Row]) -> List[List[Row]]:
+	groups: List[List[Row]] = []
+	current: List[Row] = []
+	current_bucket = None
+	for row in rows:
+		bucket = _bucket(row[1])
+		if current and (bucket != current_bucket or len(current) >= BLOCK_LINES):
+			groups.append(current)
+			current = []
+		current.append(row)
+		current_bucket = bucket
+	if current:
+		groups.append(current)
+	return groups
+
+
+def _insert_block(conn: sqlite3.Connection, rows: List[Row], dict_id: Optional[int], zdict: Optional[bytes]) -> None:
+	data, raw_bytes = encode_block(rows, zdict)
+	ids = [row[0] for row in rows]
+	conn.execute(
+		"INSERT INTO ssh_blocks (min_ts, max_ts, min_id, max_id, lines, raw_bytes, dict_id, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+		(rows[0][1], rows[-1][1], min(ids), max(ids), len(rows), raw_bytes, dict_id, data),
+	)
+
+
+def compact(conn: sqlite3.Connection, max_chunks: Optional[int] = None) -> Tuple[int, int]:
+	"""Move ``ssh_lines`` rows older than the newest bucket into blocks.
+
+	Rows are read in ``(ts, id)`` order ``COMPACT_CHUNK`` at a time and cut
+	into blocks at bucket boundaries or ``BLOCK_LINES``; each chunk's blocks
+	are inserted and its rows deleted in one commit. The newest bucket stays
+	as plain rows so live appends never rewrite a block. ``max_chunks``
+	bounds one call (the writer thread steps a chunk at a time until nothing
+	is packed); ``None`` runs to completion. Returns
+	``(blocks written, lines packed)``.
+	"""
+	newest = conn.execute("SELECT MAX(ts) FROM ssh_lines").fetchone()[0]
+	seconds = _seconds(newest) if newest else None
+	if seconds is None:
+		return 0, 0
+	horizon = _iso((seconds // BLOCK_SECONDS) * BLOCK_SECONDS)
+	dicts = _Dicts(conn)
+	dict_id, zdict = dicts.latest()
+	if dict_id is None:
+		sample = [r[0] for r in conn.execute("SELECT line FROM ssh_lines WHERE ts < ? ORDER BY ts LIMIT ?", (horizon, TRAIN_SAMPLE))]
+		if len(sample) >= TRAIN_MIN_LINES:
+			zdict = train_dictionary(sample)
+			dict_id = conn.execute(
+				"INSERT INTO ssh_dicts (created, data) VALUES (?, ?)", (_iso(time.time()), zdict)
+			).lastrowid
+			conn.commit()
+	blocks = packed = chunks = 0
+	while max_chunks is None or chunks < max_chunks:
+		chunks += 1
+		rows = conn.execute(
+			"SELECT id, ts, line FROM ssh_lines WHERE ts < ? ORDER BY ts, id LIMIT ?", (horizon, COMPACT_CHUNK)
+		).fetchall()
+		if not rows:
+			break
+		groups = _groups(rows)
+		if len(rows) == COMPACT_CHUNK and len(groups) > 1 and len(groups[-1]) < BLOCK_LINES:
+			groups.pop()  # may continue in the next chunk
+		for group in groups:
+			_insert_block(conn, group, dict_id, zdict)
+			conn.executemany("DELETE FROM ssh_lines WHERE id = ?", ((row[0],) for row in group))
+			blocks += 1
+			packed += len(group)
+		conn.commit()
+	if blocks and max_chunks is None:
+		logging.getLogger(__name__).info("Packed %d SSH lines into %d compressed blocks", packed, blocks)
+	return blocks, packed
+
+
+def read_chunk(
+	conn: sqlite3.Connection,
+	hot_sql: str,
+	hot_params: List[Any],
+	start: Optional[str],
+	end: Optional[str],
+	after: Optional[Tuple[str, int]],
+	limit: int,
+) -> List[Row]:
+	"""The first ``limit`` rows past ``after`` from plain rows and blocks.
+
+	``hot_sql`` selects ``id, ts, line`` from ``ssh_lines`` for the same range
+	(ordered, without LIMIT). Blocks are visited in ``min_ts`` order and only
+	decompressed while they can still hold one of the ``limit`` smallest
+	``(ts, id)`` keys, so a page costs one or two blocks, not the range.
+	"""
+	rows = [(ts, row_id, line) for row_id, ts, line in conn.execute(hot_sql + " LIMIT ?", [*hot_params, limit])]
+	lower = after[0] if after is not None else start
+	clauses: List[str] = []
+	params: List[Any] = []
+	if lower:
+		clauses.append("max_ts >= ?")
+		params.append(lower)
+		seconds = _seconds(lower)
+		if seconds is not None:
+			clauses.append("min_ts >= ?")
+			params.append(_iso(seconds - BLOCK_SECONDS))
+	if end:
+		clauses.append("min_ts <= ?")
+		params.append(end)
+	where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+	dicts = _Dicts(conn)
+	for min_ts, count, dict_id, data in conn.execute(
+		f"SELECT min_ts, lines, dict_id, data FROM ssh_blocks {where} ORDER BY min_ts, id", params
+	):
+		if len(rows) >= limit and min_ts > rows[-1][0]:
+			break
+		for row_id, ts, line in decode_block(data, count, dicts.get(dict_id)):
+			if (start and ts < start) or (end and ts > end) or (after is not None and (ts, row_id) <= after):
+				continue
+			rows.append((ts, row_id, line))
+		rows.sort()
+		del rows[limit:]
+	return [(row_id, ts, line) for ts, row_id, line in rows]
+
+
+def stats(conn: sqlite3.Connection) -> Tuple[Optional[str], Optional[str], int, Optional[int], Optional[int]]:
+	"""``(min ts, max ts, lines, min id, max id)`` over all blocks."""
+	row = conn.execute("SELECT MIN(min_ts), MAX(max_ts), COALESCE(SUM(lines), 0), MIN(min_id), MAX(max_id) FROM ssh_blocks").fetchone()
+	return row[0], row[1], row[2], row[3], row[4]
+
+
+def trim(conn: sqlite3.Connection, cutoff: str) -> int:
+	"""Drop block rows older than ``cutoff``; returns how many lines went.
+
+	Whole blocks are deleted; the few straddling the cutoff are re-encoded
+	with their remaining rows. The caller commits.
+	"""
+	removed = conn.execute("SELECT COALESCE(SUM(lines), 0) FROM ssh_blocks WHERE max_ts < ?", (cutoff,)).fetchone()[0]
+	conn.execute("DELETE FROM ssh_blocks WHERE max_ts < ?", (cutoff,))
+	dicts = _Dicts(conn)
+	straddling = conn.execute(
+		"SELECT id, lines, dict_id, data FROM ssh_blocks WHERE min_ts < ?", (cutoff,)
+	).fetchall()
+	for block_id, count, dict_id, data in straddling:
+		zdict = dicts.get(dict_id)
+		kept = [row for row in decode_block(data, count, zdict) if row[1] >= cutoff]
+		conn.execute("DELETE FROM ssh_blocks WHERE id = ?", (block_id,))
+		if kept:
+			_insert_block(conn, kept, dict_id, zdict)
+		removed += count - len(kept)
+	return removed
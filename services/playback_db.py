@@ -3,14 +3,22 @@ from __future__ import annotations
 import datetime
 import json
 import logging
+import os
 import queue
 import sqlite3
 import threading
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
 from config import Config
+from services import cowrie_events, instrumentation, playback_blocks, timing
+from services.playback_retention import RetentionPass
+from services.response_cache import file_version
+
+
+RETENTION_STEP_SECONDS = 0.02
+RETENTION_MAX_BACKLOG = 100
 
 
 class PlaybackDB:
@@ -21,12 +29,23 @@ class PlaybackDB:
 		self.queue: "queue.Queue[Tuple[str, str]]" = queue.Queue(maxsize=5000)
 		self._writer_thread: Optional[threading.Thread] = None
 		self._last_cleanup_ts = 0.0
+		self._last_log_version: Optional[Tuple[int, int]] = None
+		self._tty_dir_version: Optional[Tuple[int, int]] = None
+		self._tty_files: Set[str] = set()
+		self._last_tty_refresh = 0.0
+		self._last_compact = 0.0
+		self._retention: Optional[RetentionPass] = None
+		# [blocks, lines] packed so far by the compaction pass in progress.
+		self._compaction: Optional[List[int]] = None
+		# Bumped when has_tty flags change; part of the /api/ssh-sessions cache version.
+		self.tty_generation = 0
 
 	def ensure_db(self) -> None:
 		self.config.playback_db_path.parent.mkdir(parents=True, exist_ok=True)
 		conn = sqlite3.connect(self.config.playback_db_path)
 		try:
 			cur = conn.cursor()
+			self._ensure_auto_vacuum(conn)
 			cur.execute(
 				"""
 				CREATE TABLE IF NOT EXISTS ssh_lines (
@@ -37,6 +56,7 @@ class PlaybackDB:
 				"""
 			)
 			cur.execute("CREATE INDEX IF NOT EXISTS idx_ssh_lines_ts ON ssh_lines(ts)")
+			playback_blocks.ensure_schema(conn)
 			cur.execute(
 				"""
 				CREATE TABLE IF NOT EXISTS log_offsets (
@@ -45,8 +65,12 @@ class PlaybackDB:
 				)
 				"""
 			)
+			if cowrie_events.ensure_schema(conn):
+				conn.commit()
+				cowrie_events.backfill(conn)
 			conn.commit()
 		except Exception:
+			logging.getLogger(__name__).exception("Failed to initialise playback DB")
 			try:
 				conn.rollback()
 			except Exception:
@@ -54,23 +78,63 @@ class PlaybackDB:
 		finally:
 			conn.close()
 
-	def cleanup_old_rows(self, conn: Optional[sqlite3.Connection] = None) -> None:
+	def _ensure_auto_vacuum(self, conn: sqlite3.Connection) -> None:
+		"""Switch to ``auto_vacuum=INCREMENTAL`` so retention can shrink the file.
+
+		A new database only needs the pragma before its first table. An
+		existing one needs a full ``VACUUM`` rebuild, which blocks for as long
+		as it takes to rewrite the file, so it only runs when the operator
+		opts in with ``PLAYBACK_VACUUM_CONVERT`` (and retention is enabled;
+		otherwise nothing is ever freed).
+		"""
+		if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+			return
+		conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+		if not conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+			return
 		if self.config.playback_retention_days <= 0:
 			return
+		logger = logging.getLogger(__name__)
+		if not self.config.playback_vacuum_convert:
+			logger.warning(
+				"Playback DB is not in incremental auto_vacuum mode; retention frees pages for reuse but the file "
+				"will not shrink. Set PLAYBACK_VACUUM_CONVERT=true for a one-time VACUUM at the next start."
+			)
+			return
+		started = time.perf_counter()
+		try:
+			conn.execute("VACUUM")
+		except sqlite3.Error:
+			logger.exception("Failed to convert playback DB to incremental auto_vacuum")
+			return
+		logger.info("Converted playback DB to incremental auto_vacuum in %.1fs", time.perf_counter() - started)
+
+	def _retention_cutoff(self) -> str:
 		cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=self.config.playback_retention_days)
-		cutoff_ts = cutoff.replace(tzinfo=datetime.timezone.utc).isoformat()
+		return cutoff.replace(tzinfo=datetime.timezone.utc).isoformat()
+
+	def cleanup_old_rows(self, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict[str, Any]]:
+		"""Run a whole retention pass now; returns its summary.
+
+		Used at startup, before the writer runs. The writer itself steps a
+		``RetentionPass`` between queue flushes instead.
+		"""
+		if self.config.playback_retention_days <= 0:
+			return None
 		owned = False
 		if conn is None:
 			conn = sqlite3.connect(self.config.playback_db_path)
 			owned = True
+		retention = RetentionPass(self._retention_cutoff())
 		try:
-			conn.execute("DELETE FROM ssh_lines WHERE ts < ?", (cutoff_ts,))
-			conn.commit()
+			return retention.run(conn)
 		except Exception:
+			logging.getLogger(__name__).exception("Playback retention failed")
 			try:
 				conn.rollback()
 			except Exception:
 				pass
+			return retention.summary()
 		finally:
 			if owned:
 				conn.close()
@@ -85,10 +149,19 @@ class PlaybackDB:
 			(file_path, offset),
 		)
 
+	@timing.timed("playback_ingest")
 	def ingest_from_ssh_log(self, max_lines: int = 0) -> int:
 		ssh_path = self.config.ssh_log_path
 		if not ssh_path.exists() or not ssh_path.is_file():
 			return 0
+		try:
+			stat = ssh_path.stat()
+			log_version: Optional[Tuple[int, int]] = (stat.st_size, stat.st_mtime_ns)
+		except OSError:
+			log_version = None
+		if log_version is not None and log_version == self._last_log_version:
+			# Unchanged since the last tail; skip reopening the DB per poll.
+			return 0
 		inserted = 0
 		with sqlite3.connect(self.config.playback_db_path) as conn:
 			offset = self._get_offset(conn, str(ssh_path))
@@ -103,11 +176,13 @@ class PlaybackDB:
 			if max_lines > 0 and len(lines) > max_lines:
 				lines = lines[-max_lines:]
 			rows: List[Tuple[str, str]] = []
+			side = cowrie_events.SideTableBatch()
 			for line in lines:
 				raw = line.strip()
 				if not raw:
 					continue
 				ts = None
+				entry = None
 				try:
 					entry = json.loads(raw)
 					raw_ts = entry.get("timestamp") or entry.get("time")
@@ -121,11 +196,16 @@ class PlaybackDB:
 				if not ts:
 					ts = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
 				rows.append((ts, raw))
+				if isinstance(entry, dict):
+					side.add(ts, entry)
 			if rows:
 				try:
 					conn.executemany("INSERT INTO ssh_lines (ts, line) VALUES (?, ?)", rows)
-					conn.commit()
+					side.flush(conn)
+					with instrumentation.SQLITE_COMMIT.time(("playback",)):
+						conn.commit()
 					inserted = len(rows)
+					instrumentation.PLAYBACK_LINES_WRITTEN.inc(inserted, ("log_tail",))
 				except Exception:
 					try:
 						conn.rollback()
@@ -133,6 +213,7 @@ class PlaybackDB:
 						pass
 			self._update_offset(conn, str(ssh_path), new_offset)
 			conn.commit()
+		self._last_log_version = log_version
 		if inserted:
 			logging.getLogger(__name__).info("Ingested %d SSH log lines into playback DB", inserted)
 		return inserted
@@ -145,7 +226,9 @@ class PlaybackDB:
 		self._last_cleanup_ts = last_flush
 		while True:
 			try:
-				item = self.queue.get(timeout=1.0)
+				# Poll faster while a retention or compaction pass is stepping.
+				stepping = self._retention is not None or self._compaction is not None
+				item = self.queue.get(timeout=RETENTION_STEP_SECONDS if stepping else 1.0)
 			except queue.Empty:
 				item = None
 
@@ -156,7 +239,13 @@ class PlaybackDB:
 			if buffer and (len(buffer) >= 50 or now - last_flush >= 1.0):
 				try:
 					conn.executemany("INSERT INTO ssh_lines (ts, line) VALUES (?, ?)", buffer)
-					conn.commit()
+					side = cowrie_events.SideTableBatch()
+					for ts, line in buffer:
+						side.add_line(ts, line)
+					side.flush(conn)
+					with instrumentation.SQLITE_COMMIT.time(("playback",)):
+						conn.commit()
+					instrumentation.PLAYBACK_LINES_WRITTEN.inc(len(buffer), ("sse",))
 				except Exception:
 					try:
 						conn.rollback()
@@ -165,19 +254,65 @@ class PlaybackDB:
 				buffer.clear()
 				last_flush = now
 
-			if self.config.playback_retention_days > 0 and now - self._last_cleanup_ts >= 3600:
+			if now - self._last_tty_refresh >= 10:
 				try:
-					self.cleanup_old_rows(conn)
+					self.refresh_tty_index()
 				except Exception:
-					pass
+					logging.getLogger(__name__).exception("Failed to refresh tty flags")
+				self._last_tty_refresh = now
+
+			if self.config.playback_compress and self._compaction is None and now - self._last_compact >= playback_blocks.BLOCK_SECONDS:
+				self._compaction = [0, 0]
+				self._last_compact = now
+
+			# Compaction steps a chunk at a time under the same backlog limit as retention.
+			if self._compaction is not None and self.queue.qsize() < RETENTION_MAX_BACKLOG:
+				try:
+					blocks, lines = playback_blocks.compact(conn, max_chunks=1)
+				except Exception:
+					logging.getLogger(__name__).exception("Failed to compact playback lines")
+					try:
+						conn.rollback()
+					except Exception:
+						pass
+					blocks = lines = 0
+				self._compaction[0] += blocks
+				self._compaction[1] += lines
+				if not lines:
+					if self._compaction[0]:
+						logging.getLogger(__name__).info(
+							"Packed %d SSH lines into %d compressed blocks", self._compaction[1], self._compaction[0]
+						)
+					self._compaction = None
+
+			if self.config.playback_retention_days > 0 and self._retention is None and now - self._last_cleanup_ts >= 3600:
+				self._retention = RetentionPass(self._retention_cutoff())
 				self._last_cleanup_ts = now
 
+			# One bounded batch per pass through the loop, and only while the
+			# queue is short, so live lines never wait behind a long delete.
+			if self._retention is not None and self.queue.qsize() < RETENTION_MAX_BACKLOG:
+				try:
+					if not self._retention.step(conn):
+						self._retention = None
+				except Exception:
+					logging.getLogger(__name__).exception("Playback retention step failed")
+					try:
+						conn.rollback()
+					except Exception:
+						pass
+					self._retention = None
+
 	def start(self) -> None:
 		if self._writer_thread and self._writer_thread.is_alive():
 			return
 		self.ensure_db()
+		instrumentation.PLAYBACK_QUEUE_DEPTH.set_function(self.queue.qsize)
 		self.cleanup_old_rows()
 		self.ingest_from_ssh_log()
+		self.compact()
+		self.refresh_tty_index()
+		self._last_compact = time.time()
 		self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
 		self._writer_thread.start()
 
@@ -186,22 +321,42 @@ class PlaybackDB:
 		try:
 			self.queue.put_nowait((ts, line))
 		except queue.Full:
-			pass
+			instrumentation.PLAYBACK_LINES_DROPPED.inc()
 
 	def get_db_connection(self) -> sqlite3.Connection:
 		conn = sqlite3.connect(self.config.playback_db_path)
 		conn.row_factory = sqlite3.Row
 		return conn
 
+	def get_version(self) -> Tuple[Optional[int], Optional[int]]:
+		"""``(min id, max id)`` over plain and packed lines; changes on every
+		insert or cleanup, but not when compaction moves rows into blocks."""
+		conn = sqlite3.connect(self.config.playback_db_path)
+		try:
+			row = conn.execute(
+				"SELECT (SELECT MIN(id) FROM ssh_lines), (SELECT MAX(id) FROM ssh_lines),"
+				" (SELECT MIN(min_id) FROM ssh_blocks), (SELECT MAX(max_id) FROM ssh_blocks)"
+			).fetchone()
+			lows = [v for v in (row[0], row[2]) if v is not None]
+			highs = [v for v in (row[1], row[3]) if v is not None]
+			return (min(lows) if lows else None, max(highs) if highs else None)
+		finally:
+			conn.close()
+
+	@timing.timed("playback_range")
 	def get_range(self) -> Dict[str, Any]:
 		conn = self.get_db_connection()
 		try:
 			row = conn.execute("SELECT MIN(ts) as min_ts, MAX(ts) as max_ts, COUNT(*) as cnt FROM ssh_lines").fetchone()
-			return {"min_ts": row[0], "max_ts": row[1], "count": row[2]}
+			block_min, block_max, block_lines, _, _ = playback_blocks.stats(conn)
+			lows = [v for v in (row[0], block_min) if v is not None]
+			highs = [v for v in (row[1], block_max) if v is not None]
+			return {"min_ts": min(lows) if lows else None, "max_ts": max(highs) if highs else None, "count": row[2] + block_lines}
 		finally:
 			conn.close()
 
-	def query_rows(self, start: Optional[str], end: Optional[str], limit: int) -> List[Dict[str, Any]]:
+	@staticmethod
+	def _range_where(start: Optional[str], end: Optional[str], after: Optional[Tuple[str, int]]) -> Tuple[str, List[Any]]:
 		clauses: List[str] = []
 		params: List[Any] = []
 		if start:
@@ -210,12 +365,159 @@ class PlaybackDB:
 		if end:
 			clauses.append("ts <= ?")
 			params.append(end)
-		where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
-		sql = f"SELECT ts, line FROM ssh_lines {where} ORDER BY ts ASC LIMIT ?"
-		params.append(limit)
+		if after is not None:
+			clauses.append("(ts, id) > (?, ?)")
+			params.extend(after)
+		return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+	def _read(
+		self, conn: sqlite3.Connection, start: Optional[str], end: Optional[str], after: Optional[Tuple[str, int]], limit: int
+	) -> List[Tuple[int, str, str]]:
+		"""Next ``limit`` ``(id, ts, line)`` rows past ``after``, merged from
+		``ssh_lines`` and whichever compressed blocks can contribute."""
+		where, params = self._range_where(start, end, after)
+		hot_sql = f"SELECT id, ts, line FROM ssh_lines {where} ORDER BY ts, id"
+		return playback_blocks.read_chunk(conn, hot_sql, params, start, end, after, limit)
+
+	@timing.timed("playback_query")
+	def query_rows(self, start: Optional[str], end: Optional[str], limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+		"""One page of rows in ``(ts, id)`` order; ``next_cursor`` continues it."""
+		from services.metrics_db import decode_cursor, encode_cursor
+
+		after = decode_cursor(cursor) if cursor else None
+		conn = sqlite3.connect(self.config.playback_db_path)
+		try:
+			with instrumentation.DB_QUERY.time(("playback", "query_rows")):
+				rows = self._read(conn, start, end, after, limit + 1)
+		finally:
+			conn.close()
+		next_cursor = None
+		if len(rows) > limit:
+			rows = rows[:limit]
+			next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+		return {"rows": [{"ts": r[1], "line": r[2]} for r in rows], "next_cursor": next_cursor}
+
+	def export_rows(
+		self, start: Optional[str], end: Optional[str], after: Optional[Tuple[str, int]] = None, batch_size: int = 500
+	) -> Iterator[Tuple[str, str]]:
+		"""``(ts, line)`` for the whole range, ``batch_size`` rows at a time.
+
+		Used for NDJSON exports: every batch is read inside one transaction,
+		so the export sees a single WAL snapshot even while compaction moves
+		rows into blocks, and at most one batch (plus a block) is held.
+		"""
+		conn = sqlite3.connect(self.config.playback_db_path)
+		try:
+			conn.execute("BEGIN")
+			position = after
+			while True:
+				rows = self._read(conn, start, end, position, batch_size)
+				for _, ts, line in rows:
+					yield ts, line
+				if len(rows) < batch_size:
+					return
+				position = (rows[-1][1], rows[-1][0])
+		finally:
+			conn.close()
+
+	def iter_rows(
+		self,
+		start: Optional[str],
+		end: Optional[str],
+		after: Optional[Tuple[str, int]] = None,
+		chunk_size: int = 500,
+	) -> Iterator[Dict[str, Any]]:
+		"""All rows in ``[start, end]`` in ``(ts, id)`` order, ``chunk_size`` at a time.
+
+		Each chunk is a separate keyset read (``idx_ssh_lines_ts`` plus the
+		overlapping blocks) on a short-lived connection, so no read transaction
+		stays open between chunks and memory does not grow with the window.
+		``after`` resumes strictly past a previously yielded ``(ts, id)``.
+		"""
+		position = after
+		while True:
+			conn = sqlite3.connect(self.config.playback_db_path)
+			try:
+				with instrumentation.DB_QUERY.time(("playback", "iter_rows")):
+					rows = self._read(conn, start, end, position, chunk_size)
+			finally:
+				conn.close()
+			for row_id, ts, line in rows:
+				yield {"id": row_id, "ts": ts, "line": line}
+			if len(rows) < chunk_size:
+				return
+			position = (rows[-1][1], rows[-1][0])
+
+	@timing.timed("playback_compact")
+	def compact(self) -> Dict[str, int]:
+		"""Pack settled ``ssh_lines`` rows into compressed blocks."""
+		if not self.config.playback_compress:
+			return {"blocks": 0, "lines": 0}
+		with sqlite3.connect(self.config.playback_db_path) as conn:
+			blocks, lines = playback_blocks.compact(conn)
+		return {"blocks": blocks, "lines": lines}
+
+	def refresh_tty_index(self) -> int:
+		"""Mark which sessions have a tty recording, from one directory listing.
+
+		The directory is only re-listed when its mtime changes; otherwise just
+		sessions added since the last pass are checked against the cached names.
+		"""
+		tty_dir = self.config.cowrie_tty_path
+		version = file_version(tty_dir)
+		rescan = version != self._tty_dir_version
+		if rescan:
+			try:
+				with os.scandir(tty_dir) as entries:
+					self._tty_files = {entry.name for entry in entries}
+			except OSError:
+				self._tty_files = set()
+			self._tty_dir_version = version
+		with sqlite3.connect(self.config.playback_db_path) as conn:
+			changed = cowrie_events.refresh_tty(conn, self._tty_files, only_unchecked=not rescan)
+			conn.commit()
+		if changed:
+			self.tty_generation += 1
+		return changed
+
+	@timing.timed("session_list")
+	def list_sessions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> Dict[str, Any]:
+		from services.metrics_db import decode_cursor, encode_cursor
+
+		before = decode_cursor(cursor) if cursor else None
+		conn = self.get_db_connection()
+		try:
+			sessions = cowrie_events.list_sessions(conn, limit + 1, before, **filters)
+		finally:
+			conn.close()
+		next_cursor = None
+		if len(sessions) > limit:
+			sessions = sessions[:limit]
+			next_cursor = encode_cursor(sessions[-1]["timestamp"], sessions[-1]["rowid"])
+		for session in sessions:
+			del session["rowid"]
+		return {"sessions": sessions, "next_cursor": next_cursor}
+
+	@timing.timed("playback_query")
+	def query_commands(self, **filters: Any) -> List[Dict[str, Any]]:
+		conn = self.get_db_connection()
+		try:
+			return cowrie_events.query_commands(conn, **filters)
+		finally:
+			conn.close()
+
+	@timing.timed("playback_query")
+	def query_downloads(self, **filters: Any) -> List[Dict[str, Any]]:
+		conn = self.get_db_connection()
+		try:
+			return cowrie_events.query_downloads(conn, **filters)
+		finally:
+			conn.close()
+
+	@timing.timed("playback_query")
+	def get_session_detail(self, session: str) -> Optional[Dict[str, Any]]:
 		conn = self.get_db_connection()
 		try:
-			rows = conn.execute(sql, params).fetchall()
-			return [{"ts": r[0], "line": r[1]} for r in rows]
+			return cowrie_events.session_detail(conn, session)
 		finally:
 			conn.close()
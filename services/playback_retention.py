@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import instrumentation, playback_blocks
+
+
+RETENTION_ROWS = instrumentation.counter(
+	"sentinel_playback_retention_rows_total", "Rows removed by playback retention.", ("table",)
+)
+RETENTION_SECONDS = instrumentation.counter(
+	"sentinel_playback_retention_seconds_total", "Time spent in retention batches and incremental vacuum."
+)
+VACUUM_PAGES = instrumentation.counter(
+	"sentinel_playback_vacuum_pages_total", "Free pages returned to the filesystem by incremental vacuum."
+)
+
+# (table, expired condition, rowids per batch); blocks hold up to 256 lines each.
+TARGETS: Tuple[Tuple[str, str, int], ...] = (
+	("ssh_lines", "ts < ?", 2000),
+	("ssh_blocks", "max_ts < ?", 16),
+	("ssh_commands", "ts < ?", 2000),
+	("ssh_downloads", "ts < ?", 2000),
+	("sessions", "COALESCE(ended, started) < ?", 2000),
+)
+VACUUM_PAGES_PER_STEP = 256
+
+
+class RetentionPass:
+	"""One retention sweep, done a bounded batch per ``step``.
+
+	Each table is walked by rowid range between the lowest and highest
+	expired rowid (found once through the ts index), one short committed
+	``DELETE`` per step; then blocks straddling the cutoff are re-encoded,
+	and finally freed pages go back to the filesystem through
+	``incremental_vacuum``, ``VACUUM_PAGES_PER_STEP`` at a time. The caller
+	decides how often to step, so the writer thread can keep draining its
+	queue in between.
+	"""
+
+	def __init__(self, cutoff: str):
+		self.cutoff = cutoff
+		self.removed: Dict[str, int] = {}
+		self.reclaimed_pages = 0
+		self.seconds = 0.0
+		self.done = False
+		self._targets: List[Tuple[str, str, int]] = list(TARGETS)
+		self._range: Optional[Tuple[int, int]] = None
+		self._trimmed = False
+
+	def step(self, conn: sqlite3.Connection) -> bool:
+		"""Do one batch; returns False once the pass has finished."""
+		if self.done:
+			return False
+		started = time.perf_counter()
+		try:
+			self._step(conn)
+			conn.commit()
+		finally:
+			elapsed = time.perf_counter() - started
+			self.seconds += elapsed
+			RETENTION_SECONDS.inc(elapsed)
+		if self.done:
+			self._report()
+		return not self.done
+
+	def run(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+		while self.step(conn):
+			pass
+		return self.summary()
+
+	def _step(self, conn: sqlite3.Connection) -> None:
+		if self._targets:
+			table, condition, span = self._targets[0]
+			if self._range is None:
+				low, high = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table} WHERE {condition}", (self.cutoff,)).fetchone()
+				if low is None:
+					self._targets.pop(0)
+					return
+				self._range = (low, high)
+			low, high = self._range
+			deleted = conn.execute(
+				f"DELETE FROM {table} WHERE rowid >= ? AND rowid < ? AND {condition}", (low, low + span, self.cutoff)
+			).rowcount
+			if deleted:
+				self.removed[table] = self.removed.get(table, 0) + deleted
+				RETENTION_ROWS.inc(deleted, (table,))
+			if low + span > high:
+				self._targets.pop(0)
+				self._range = None
+			else:
+				self._range = (low + span, high)
+			return
+		if not self._trimmed:
+			lines = playback_blocks.trim(conn, self.cutoff)
+			if lines:
+				self.removed["trimmed_block_lines"] = lines
+			self._trimmed = True
+			return
+		free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+		if not free or conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+			self._finish(conn)
+			return
+		# executescript steps the pragma to completion; execute() frees one page.
+		conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP});")
+		reclaimed = free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+		self.reclaimed_pages += reclaimed
+		VACUUM_PAGES.inc(reclaimed)
+		if reclaimed <= 0:
+			self._finish(conn)
+
+	def _finish(self, conn: sqlite3.Connection) -> None:
+		if self.reclaimed_pages:
+			# Under WAL the file is only truncated once the vacuum is checkpointed.
+			conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+		self.done = True
+
+	def summary(self) -> Dict[str, Any]:
+		return {
+			"cutoff": self.cutoff,
+			"removed": dict(self.removed),
+			"reclaimed_pages": self.reclaimed_pages,
+			"seconds": round(self.seconds, 3),
+			"done": self.done,
+		}
+
+	def _report(self) -> None:
+		if self.removed or self.reclaimed_pages:
+			logging.getLogger(__name__).info(
+				"Playback retention before %s: removed %s, reclaimed %d pages in %.3fs",
+				self.cutoff, self.removed, self.reclaimed_pages, self.seconds,
+			)
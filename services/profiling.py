@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import cProfile
+import datetime
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import Config
+
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_QUERY_FLAG = "_profile"
+MODES = ("cprofile", "sampler")
+# Streamed responses (SSE, paced replays) can stay open for hours; a capture
+# is written and stopped once it has run this long.
+PROFILE_MAX_SECONDS = 30.0
+STREAM_MIMETYPES = {"text/event-stream"}
+
+
+def get_profile_dir(config: Config) -> Path:
+	return config.playback_db_path.parent / "profiles"
+
+
+def safe_capture_name(name: str) -> Optional[str]:
+	if not name or "/" in name or "\\" in name or ".." in name:
+		return None
+	if not name.endswith((".pstats", ".collapsed")):
+		return None
+	return name
+
+
+class StackSampler:
+	"""Samples one thread's Python stack on a timer and counts collapsed stacks.
+
+	Output is the ``frame;frame;frame count`` format understood by flamegraph
+	tools, so it can be rendered without the overhead of deterministic tracing.
+	``disable`` pauses the timer (e.g. between streamed chunks) until the
+	next ``enable``.
+	"""
+
+	def __init__(self, thread_id: int, interval: float = 0.005):
+		self.thread_id = thread_id
+		self.interval = interval
+		self.stacks: Counter = Counter()
+		self._stop = threading.Event()
+		self._active = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+
+	def _run(self) -> None:
+		while True:
+			self._active.wait()
+			if self._stop.wait(self.interval):
+				return
+			if not self._active.is_set():
+				continue
+			frame = sys._current_frames().get(self.thread_id)
+			if frame is None:
+				continue
+			names: List[str] = []
+			while frame is not None:
+				code = frame.f_code
+				names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+				frame = frame.f_back
+			self.stacks[";".join(reversed(names))] += 1
+
+	def enable(self) -> None:
+		if self._stop.is_set():
+			return
+		self._active.set()
+		if self._thread is None:
+			self._thread = threading.Thread(target=self._run, daemon=True)
+			self._thread.start()
+
+	def disable(self) -> None:
+		self._active.clear()
+
+	def stop(self) -> None:
+		self._stop.set()
+		self._active.set()  # wake a paused timer so it can exit
+		if self._thread is not None:
+			self._thread.join(timeout=1)
+
+	def dump(self, path: Path) -> None:
+		self.stop()
+		with path.open("w", encoding="utf-8") as handle:
+			for stack, count in self.stacks.most_common():
+				handle.write(f"{stack} {count}\n")
+
+
+class _Capture:
+	def __init__(self, mode: str, endpoint: str, path: str, sampled: bool = False):
+		self.mode = mode
+		self.endpoint = endpoint
+		self.path = path
+		# Picked by PROFILE_SAMPLE_RATE rather than asked for.
+		self.sampled = sampled
+		self.written = False
+		self.started = time.perf_counter()
+		self.started_at = datetime.datetime.now(datetime.timezone.utc)
+		if mode == "sampler":
+			self.profiler: Any = StackSampler(threading.get_ident())
+		else:
+			self.profiler = cProfile.Profile()
+
+	def enable(self) -> None:
+		self.profiler.enable()
+
+	def disable(self) -> None:
+		self.profiler.disable()
+
+	def expired(self) -> bool:
+		return time.perf_counter() - self.started > PROFILE_MAX_SECONDS
+
+
+class RequestProfiler:
+	"""Opt-in per-request profiling for the Flask app.
+
+	A request is profiled when it carries ``X-Profile-Token`` matching
+	``PROFILE_TOKEN``, when it sets ``?_profile=1`` from an address in
+	``PROFILE_ALLOWED_IPS``, or when it is picked by ``PROFILE_SAMPLE_RATE``
+	(event streams are never picked that way). Captures are written under
+	``data/profiles/``, at the latest after ``PROFILE_MAX_SECONDS`` of a
+	streamed response, and pruned to ``PROFILE_KEEP`` files.
+	"""
+
+	def __init__(self, config: Config):
+		self.config = config
+		self.profile_dir = get_profile_dir(config)
+		self._rng = random.Random()
+		self._lock = threading.Lock()
+
+	def address_allowed(self, remote_addr: Optional[str]) -> bool:
+		return bool(remote_addr) and remote_addr in self.config.profile_allowed_ips
+
+	def _should_profile(self, request: Any) -> Optional[Tuple[str, bool]]:
+		"""``(mode, sampled)`` when ``request`` should be profiled."""
+		token = self.config.profile_token
+		header = request.headers.get(PROFILE_HEADER)
+		requested_mode = request.headers.get("X-Profile-Mode") or request.args.get("_profile_mode")
+		mode = requested_mode if requested_mode in MODES else "cprofile"
+		if token and header and header == token:
+			return mode, False
+		if request.args.get(PROFILE_QUERY_FLAG) in {"1", "true", "yes"} and self.address_allowed(request.remote_addr):
+			return mode, False
+		rate = self.config.profile_sample_rate
+		if rate > 0 and self._rng.random() < rate:
+			return "sampler", True
+		return None
+
+	def _wrap_stream(self, capture: _Capture, body: Iterable[Any], status: int) -> Iterator[Any]:
+		iterator = iter(body)
+		try:
+			while True:
+				if capture.expired():
+					# Write what was captured and pass the rest through unprofiled.
+					self._write(capture, status)
+					yield from iterator
+					return
+				capture.enable()
+				try:
+					chunk = next(iterator)
+				except StopIteration:
+					return
+				finally:
+					capture.disable()
+				yield chunk
+		finally:
+			close = getattr(body, "close", None)
+			if close is not None:
+				close()
+
+	def _write(self, capture: _Capture, status: int) -> None:
+		if capture.written:
+			return
+		capture.written = True
+		elapsed_ms = (time.perf_counter() - capture.started) * 1000
+		if capture.mode == "sampler":
+			capture.profiler.stop()
+		stamp = capture.started_at.strftime("%Y%m%dT%H%M%S%fZ")
+		slug = re.sub(r"[^A-Za-z0-9_.]+", "_", capture.endpoint)[:60]
+		suffix = "collapsed" if capture.mode == "sampler" else "pstats"
+		name = f"{stamp}-{slug}-{status}-{int(elapsed_ms)}ms.{suffix}"
+		try:
+			self.profile_dir.mkdir(parents=True, exist_ok=True)
+			if capture.mode == "sampler":
+				capture.profiler.dump(self.profile_dir / name)
+			else:
+				capture.profiler.dump_stats(str(self.profile_dir / name))
+			self._prune()
+		except Exception:
+			logging.getLogger(__name__).exception("Failed to write profile for %s", capture.path)
+
+	def _prune(self) -> None:
+		with self._lock:
+			files = sorted(self.profile_dir.glob("*.*"), key=lambda p: p.stat().st_mtime)
+			for stale in files[: max(0, len(files) - self.config.profile_keep)]:
+				try:
+					stale.unlink()
+				except OSError:
+					pass
+
+	def list_captures(self, limit: int = 100) -> List[Dict[str, Any]]:
+		if not self.profile_dir.exists():
+			return []
+		items: List[Dict[str, Any]] = []
+		for path in self.profile_dir.iterdir():
+			if path.suffix not in {".pstats", ".collapsed"}:
+				continue
+			try:
+				stat = path.stat()
+			except OSError:
+				continue
+			parts = path.stem.split("-")
+			items.append(
+				{
+					"name": path.name,
+					"format": path.suffix.lstrip("."),
+					"size": stat.st_size,
+					"created": datetime.datetime.fromtimestamp(stat.st_mtime, tz=datetime.timezone.utc).isoformat(),
+					"endpoint": "-".join(parts[1:-2]) if len(parts) >= 4 else None,
+					"status": parts[-2] if len(parts) >= 4 else None,
+					"duration_ms": int(parts[-1][:-2]) if len(parts) >= 4 and parts[-1].endswith("ms") and parts[-1][:-2].isdigit() else None,
+				}
+			)
+		items.sort(key=lambda x: x["created"], reverse=True)
+		return items[:limit]
+
+	def init_app(self, app: Any) -> None:
+		from flask import g, request
+
+		@app.before_request
+		def _start_profile():
+			picked = self._should_profile(request)
+			if not picked:
+				return
+			capture = _Capture(picked[0], request.endpoint or "unmatched", request.path, sampled=picked[1])
+			try:
+				capture.enable()
+			except ValueError:
+				# Another profiler already owns this thread.
+				return
+			g._profile_capture = capture
+
+		@app.after_request
+		def _stop_profile(response):
+			capture = g.pop("_profile_capture", None)
+			if capture is None:
+				return response
+			capture.disable()
+			status = response.status_code
+			if capture.sampled and response.mimetype in STREAM_MIMETYPES:
+				# A sampled SSE connection would only profile its idle waits.
+				if capture.mode == "sampler":
+					capture.profiler.stop()
+				return response
+			if response.is_streamed:
+				response.response = self._wrap_stream(capture, response.response, status)
+			response.call_on_close(lambda: self._write(capture, status))
+			response.headers["X-Profile-Capture"] = capture.mode
+			return response
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Hashable, Iterable, Iterator, Optional
+
+from services import instrumentation
+
+
+REPLAY_CACHE_REQUESTS = instrumentation.counter(
+	"sentinel_replay_cache_total", "Rendered session replays by cache outcome.", ("outcome",)
+)
+# A fill's temp file is rewritten as the stream advances; one untouched this
+# long was left behind by a killed worker.
+STALE_TMP_SECONDS = 3600
+
+
+class ReplayCache:
+	"""Gzipped renderings of session replays on disk, bounded by total size.
+
+	Entries are named by a hash of what they were rendered from (session,
+	tty file size/mtime, variant), so a changed recording simply misses.
+	Hits bump the file mtime; eviction removes the oldest mtimes first.
+	"""
+
+	def __init__(self, root: Path, max_bytes: int):
+		# Absolute, since send_file resolves relative paths against the app root.
+		self.root = root.resolve()
+		self.max_bytes = max_bytes
+		self._evict_lock = threading.Lock()
+
+	@property
+	def enabled(self) -> bool:
+		return self.max_bytes > 0
+
+	@staticmethod
+	def key(session_id: str, version: Hashable, variant: str) -> str:
+		return hashlib.sha256(f"{session_id}|{version!r}|{variant}".encode()).hexdigest()
+
+	def lookup(self, key: str) -> Optional[Path]:
+		path = self.root / f"{key}.gz"
+		try:
+			os.utime(path)
+		except OSError:
+			REPLAY_CACHE_REQUESTS.inc(1, ("miss",))
+			return None
+		REPLAY_CACHE_REQUESTS.inc(1, ("hit",))
+		return path
+
+	def fill(self, key: str, chunks: Iterable[str]) -> Iterator[str]:
+		"""Pass ``chunks`` through while writing them to the cache.
+
+		The entry only appears once the stream completes; a client that goes
+		away mid-replay leaves nothing behind.
+		"""
+		self.root.mkdir(parents=True, exist_ok=True)
+		final = self.root / f"{key}.gz"
+		tmp = self.root / f".{key}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+		complete = False
+		try:
+			with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as out:
+				for chunk in chunks:
+					out.write(chunk)
+					yield chunk
+			try:
+				os.replace(tmp, final)
+			except FileNotFoundError:
+				pass  # swept by evict() after stalling past STALE_TMP_SECONDS
+			complete = True
+		finally:
+			if not complete:
+				tmp.unlink(missing_ok=True)
+		self.evict()
+
+	def evict(self) -> int:
+		"""Delete least recently used entries until under ``max_bytes``.
+
+		Temp files from fills that never finished are removed once older than
+		``STALE_TMP_SECONDS``.
+		"""
+		if not self._evict_lock.acquire(blocking=False):
+			return 0
+		try:
+			entries = []
+			stale = []
+			total = 0
+			stale_before = time.time() - STALE_TMP_SECONDS
+			with os.scandir(self.root) as it:
+				for entry in it:
+					if entry.name.endswith(".gz"):
+						stat = entry.stat()
+						entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+						total += stat.st_size
+					elif entry.name.startswith(".") and entry.name.endswith(".tmp"):
+						if entry.stat().st_mtime < stale_before:
+							stale.append(entry.path)
+			for path in stale:
+				try:
+					os.remove(path)
+				except OSError:
+					continue
+			removed = 0
+			entries.sort()
+			for _, size, path in entries:
+				if total <= self.max_bytes:
+					break
+				try:
+					os.remove(path)
+				except OSError:
+					continue
+				total -= size
+				removed += 1
+			if removed:
+				REPLAY_CACHE_REQUESTS.inc(removed, ("evicted",))
+			return removed
+		except OSError:
+			logging.getLogger(__name__).exception("Replay cache eviction failed")
+			return 0
+		finally:
+			self._evict_lock.release()
+
+
+def send_cached(path: Path, mimetype: str, etag: str) -> Optional[Any]:
+	"""Serve a cache entry: the gzip file as-is when the client accepts it
+	(``send_file`` with conditional and range handling), else decompressed.
+
+	Returns None when eviction removed the entry after ``lookup``; the file
+	is opened before returning, so a later eviction cannot cut a response.
+	"""
+	from flask import Response, request, send_file
+
+	try:
+		if "gzip" in request.accept_encodings:
+			response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=0)
+			response.headers["Content-Encoding"] = "gzip"
+			response.headers["Vary"] = "Accept-Encoding"
+			return response
+		handle = gzip.open(path, "rb")
+	except FileNotFoundError:
+		REPLAY_CACHE_REQUESTS.inc(1, ("miss",))
+		return None
+
+	def _inflate() -> Iterator[bytes]:
+		with handle:
+			while True:
+				block = handle.read(64 * 1024)
+				if not block:
+					return
+				yield block
+
+	response = Response(_inflate(), mimetype=mimetype)
+	response.headers["Vary"] = "Accept-Encoding"
+	return response
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from services import instrumentation, timing
+
+
+CACHE_REQUESTS = instrumentation.counter(
+	"sentinel_response_cache_total", "Read API responses by cache outcome.", ("outcome",)
+)
+
+_LOCK_STRIPES = 32
+
+
+def file_version(path: Path) -> Optional[Tuple[int, int]]:
+	"""Cheap change marker for a file or directory: ``(size, mtime_ns)``."""
+	try:
+		stat = path.stat()
+	except OSError:
+		return None
+	return (stat.st_size, stat.st_mtime_ns)
+
+
+def etag_for(key: str, version: Hashable) -> str:
+	return hashlib.sha1(f"{key}|{version!r}".encode()).hexdigest()[:20]
+
+
+class ResponseCache:
+	"""Small TTL/LRU cache of serialized JSON bodies keyed by route and version.
+
+	An entry is reused only while its version matches and it is younger than
+	``ttl``; the TTL bounds staleness for state the version does not capture.
+	Concurrent misses for the same key wait on one computation instead of
+	each running the query.
+	"""
+
+	def __init__(self, maxsize: int = 256, ttl: float = 5.0):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self._entries: "OrderedDict[str, Tuple[Hashable, float, bytes]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self._stripes = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+	def _lookup(self, key: str, version: Hashable) -> Optional[bytes]:
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				return None
+			cached_version, stored_at, body = entry
+			if cached_version != version or time.monotonic() - stored_at > self.ttl:
+				return None
+			self._entries.move_to_end(key)
+			return body
+
+	def _store(self, key: str, version: Hashable, body: bytes) -> None:
+		with self._lock:
+			self._entries[key] = (version, time.monotonic(), body)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.maxsize:
+				self._entries.popitem(last=False)
+
+	def get_or_compute(self, key: str, version: Hashable, compute: Callable[[], bytes]) -> bytes:
+		if self.ttl <= 0 or self.maxsize <= 0:
+			CACHE_REQUESTS.inc(1, ("bypass",))
+			return compute()
+		body = self._lookup(key, version)
+		if body is not None:
+			CACHE_REQUESTS.inc(1, ("hit",))
+			return body
+		with self._stripes[hash(key) % _LOCK_STRIPES]:
+			# Another request may have filled the entry while we waited.
+			body = self._lookup(key, version)
+			if body is not None:
+				CACHE_REQUESTS.inc(1, ("hit",))
+				return body
+			body = compute()
+			self._store(key, version, body)
+		CACHE_REQUESTS.inc(1, ("miss",))
+		return body
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			return {"entries": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl}
+
+
+def cached_json(cache: ResponseCache, key: str, version: Hashable, compute: Callable[[], Dict[str, Any]]) -> Any:
+	"""Serve ``compute()`` as JSON with a version ETag and ``304`` revalidation.
+
+	``version`` must change whenever the payload would; it is derived from
+	cheap state (max row ids, file size/mtime) so a matching ``If-None-Match``
+	is answered without running ``compute`` at all.
+	"""
+	from flask import current_app, request
+
+	if request.args.get(timing.TIMING_QUERY_FLAG) in {"1", "true", "yes"}:
+		# Per-request timing breakdowns are never shared.
+		return timing.jsonify_timed(compute())
+	tag = etag_for(key, version)
+	if request.if_none_match.contains_weak(tag):
+		CACHE_REQUESTS.inc(1, ("not_modified",))
+		response = current_app.response_class(status=304)
+	else:
+
+		def _render() -> bytes:
+			payload = compute()
+			with timing.stage("jsonify"):
+				return f"{current_app.json.dumps(payload)}\n".encode()
+
+		body = cache.get_or_compute(key, version, _render)
+		response = current_app.response_class(body, mimetype="application/json")
+	response.set_etag(tag, weak=True)
+	response.headers["Cache-Control"] = "no-cache"
+	return response
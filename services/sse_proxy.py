@@ -8,6 +8,7 @@ from typing import Callable, Generator, Optional
 import requests
 
 from config import Config
+from services import instrumentation
 
 
 def stream_exporter_sse(config: Config, enqueue_fn: Callable[[str], None]) -> Generator[str, None, None]:
@@ -33,6 +34,7 @@ def stream_exporter_sse(config: Config, enqueue_fn: Callable[[str], None]) -> Ge
 	t.start()
 
 	last_send = time.time()
+	instrumentation.SSE_CLIENTS.inc(1, ("ssh_proxy",))
 	try:
 		while True:
 			try:
@@ -47,6 +49,7 @@ def stream_exporter_sse(config: Config, enqueue_fn: Callable[[str], None]) -> Ge
 					break
 			else:
 				enqueue_fn(item)
+				instrumentation.SSE_MESSAGES.inc(1, ("ssh_proxy",))
 				yield f"data: {item}\n\n"
 				last_send = now
 
@@ -54,4 +57,5 @@ def stream_exporter_sse(config: Config, enqueue_fn: Callable[[str], None]) -> Ge
 				yield ": keepalive\n\n"
 				last_send = time.time()
 	finally:
+		instrumentation.SSE_CLIENTS.dec(1, ("ssh_proxy",))
 		resp.close()
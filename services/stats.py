@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import datetime
+import threading
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional, Set
 import logging
 from urllib.parse import urlparse
@@ -104,3 +106,30 @@ def compute_dashboard_stats(config: Config, http_events: List[Dict[str, Any]], s
 	metrics = db.get_metrics()
 	logger.info("Computed metrics: %s", metrics)
 	return metrics
+
+
+class StatsSnapshots:
+	"""Remembers recent stats payloads by event-id cursor to build field deltas.
+
+	A client that last saw cursor ``N`` only needs the stats fields that changed
+	since the payload served at ``N``. Unknown cursors fall back to full stats.
+	"""
+
+	def __init__(self, maxsize: int = 256):
+		self.maxsize = maxsize
+		self._snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def remember(self, cursor: int, values: Dict[str, Any]) -> None:
+		with self._lock:
+			self._snapshots[cursor] = dict(values)
+			self._snapshots.move_to_end(cursor)
+			while len(self._snapshots) > self.maxsize:
+				self._snapshots.popitem(last=False)
+
+	def delta(self, cursor: int, current: Dict[str, Any]) -> Dict[str, Any]:
+		with self._lock:
+			previous = self._snapshots.get(cursor)
+		if previous is None:
+			return dict(current)
+		return {k: v for k, v in current.items() if previous.get(k) != v}
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from services import instrumentation
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+TIMING_QUERY_FLAG = "_timing"
+
+STAGE_SECONDS = instrumentation.histogram(
+	"sentinel_stage_seconds", "Time spent per request stage.", ("stage",)
+)
+
+
+class StageTimer:
+	"""Accumulates wall time per named stage for one request."""
+
+	def __init__(self) -> None:
+		self.started = time.perf_counter()
+		self.stages: Dict[str, List[float]] = {}
+
+	def add(self, name: str, seconds: float) -> None:
+		entry = self.stages.get(name)
+		if entry is None:
+			self.stages[name] = [seconds, 1]
+		else:
+			entry[0] += seconds
+			entry[1] += 1
+
+	def snapshot(self) -> Dict[str, Any]:
+		stages = {name: {"ms": round(total * 1000, 3), "count": int(count)} for name, (total, count) in self.stages.items()}
+		return {"total_ms": round((time.perf_counter() - self.started) * 1000, 3), "stages": stages}
+
+	def server_timing(self) -> str:
+		parts = [f"{name};dur={total * 1000:.2f}" for name, (total, _) in self.stages.items()]
+		parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+		return ", ".join(parts)
+
+
+_current: contextvars.ContextVar[Optional[StageTimer]] = contextvars.ContextVar("sentinel_stage_timer", default=None)
+
+
+def current() -> Optional[StageTimer]:
+	return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+	"""Time a block as ``name``; nested stages are recorded independently."""
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		elapsed = time.perf_counter() - start
+		STAGE_SECONDS.observe(elapsed, (name,))
+		timer = _current.get()
+		if timer is not None:
+			timer.add(name, elapsed)
+
+
+def timed(name: str) -> Callable[[F], F]:
+	"""Decorator form of :func:`stage`."""
+
+	def decorator(fn: F) -> F:
+		@functools.wraps(fn)
+		def wrapper(*args: Any, **kwargs: Any) -> Any:
+			with stage(name):
+				return fn(*args, **kwargs)
+
+		return wrapper  # type: ignore[return-value]
+
+	return decorator
+
+
+def jsonify_timed(payload: Dict[str, Any]) -> Any:
+	"""``jsonify`` as a timed stage, adding ``_timing`` when ``?_timing=1``."""
+	from flask import jsonify, request
+
+	timer = _current.get()
+	if timer is not None and request.args.get(TIMING_QUERY_FLAG) in {"1", "true", "yes"}:
+		payload["_timing"] = timer.snapshot()
+	with stage("jsonify"):
+		return jsonify(payload)
+
+
+def init_app(app: Any) -> None:
+	"""Attach a stage timer to every API request and emit ``Server-Timing``."""
+	from flask import g, request
+
+	@app.before_request
+	def _start_stage_timer():
+		if not request.path.startswith("/api/"):
+			return
+		g._stage_timer_token = _current.set(StageTimer())
+
+	@app.after_request
+	def _emit_server_timing(response):
+		token = g.pop("_stage_timer_token", None)
+		if token is None:
+			return response
+		timer = _current.get()
+		_current.reset(token)
+		if timer is not None and not response.is_streamed:
+			response.headers["Server-Timing"] = timer.server_timing()
+		return response
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import codecs
+import json
+import mmap
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from services import timing
+
+
+# Cowrie's ttylog record header: op, tty, length, direction, sec, usec.
+RECORD = struct.Struct("<iLiiLL")
+OP_OPEN, OP_CLOSE, OP_WRITE, OP_EXEC = 1, 2, 3, 4
+TYPE_INPUT, TYPE_OUTPUT, TYPE_INTERACT = 1, 2, 3
+DEFAULT_MAX_DELAY = 3.0
+_CACHE_SIZE = 32
+
+
+class TtyLogError(ValueError):
+	"""Raised for files that are not Cowrie ttylogs."""
+
+
+@dataclass(frozen=True)
+class Frame:
+	at: float
+	direction: int
+	data: bytes
+
+
+class TtyLog:
+	"""Memory-mapped ttylog with a time index of its write records.
+
+	Opening walks the record headers once (payloads are skipped, not copied)
+	into parallel arrays of relative times and file offsets, so seeking to a
+	timestamp is a ``bisect`` and frames are sliced out of the map on demand.
+	"""
+
+	def __init__(self, path: Path):
+		self.path = path
+		self.times = array("d")
+		self.offsets = array("Q")
+		self.started: Optional[float] = None
+		self._map: Optional[mmap.mmap] = None
+		with path.open("rb") as handle:
+			if path.stat().st_size:
+				self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+		if self._map is not None:
+			self._index(self._map)
+
+	def _index(self, buf: mmap.mmap) -> None:
+		pos, size = 0, len(buf)
+		while pos + RECORD.size <= size:
+			op, _, length, _, sec, usec = RECORD.unpack_from(buf, pos)
+			if op not in (OP_OPEN, OP_CLOSE, OP_WRITE, OP_EXEC) or length < 0:
+				if pos == 0:
+					raise TtyLogError(f"not a ttylog: {self.path.name}")
+				break
+			stamp = sec + usec / 1e6
+			if self.started is None:
+				self.started = stamp
+			if op == OP_WRITE:
+				if pos + RECORD.size + length > size:
+					break  # still being written
+				self.times.append(stamp - self.started)
+				self.offsets.append(pos)
+			pos += RECORD.size + (length if op == OP_WRITE else 0)
+
+	@property
+	def duration(self) -> float:
+		return self.times[-1] if self.times else 0.0
+
+	def frames(self, start: float = 0.0, directions: Sequence[int] = (TYPE_OUTPUT,)) -> Iterator[Frame]:
+		"""Write records at or after ``start`` seconds, in file order."""
+		if self._map is None:
+			return
+		for i in range(bisect_left(self.times, start), len(self.times)):
+			_, _, length, direction, _, _ = RECORD.unpack_from(self._map, self.offsets[i])
+			if direction in directions:
+				begin = self.offsets[i] + RECORD.size
+				yield Frame(self.times[i], direction, self._map[begin:begin + length])
+
+
+# path -> ((size, mtime_ns), TtyLog): concurrent viewers of one session share the index.
+_LOGS: "OrderedDict[str, Tuple[Tuple[int, int], TtyLog]]" = OrderedDict()
+_LOGS_LOCK = threading.Lock()
+
+
+def open_ttylog(path: Path) -> TtyLog:
+	stat = path.stat()
+	version = (stat.st_size, stat.st_mtime_ns)
+	key = str(path)
+	with _LOGS_LOCK:
+		entry = _LOGS.get(key)
+		if entry is not None and entry[0] == version:
+			_LOGS.move_to_end(key)
+			return entry[1]
+	with timing.stage("ttylog_index"):
+		log = TtyLog(path)
+	with _LOGS_LOCK:
+		_LOGS[key] = (version, log)
+		_LOGS.move_to_end(key)
+		while len(_LOGS) > _CACHE_SIZE:
+			_LOGS.popitem(last=False)
+	return log
+
+
+def play_text(
+	log: TtyLog, start: float = 0.0, speed: float = 1.0, max_delay: float = DEFAULT_MAX_DELAY
+) -> Iterator[str]:
+	"""Terminal output paced by the recorded gaps, like Cowrie's ``playlog``.
+
+	Gaps are divided by ``speed`` and capped at ``max_delay``; ``speed <= 0``
+	emits everything immediately.
+	"""
+	decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+	previous = None
+	for frame in log.frames(start):
+		if previous is not None and speed > 0:
+			time.sleep(min((frame.at - previous) / speed, max_delay))
+		previous = frame.at
+		text = decoder.decode(frame.data)
+		if text:
+			yield text
+	tail = decoder.decode(b"", final=True)
+	if tail:
+		yield tail
+
+
+def asciicast(
+	log: TtyLog, start: float = 0.0, width: int = 80, height: int = 24, include_input: bool = False
+) -> Iterator[str]:
+	"""asciicast v2: a header line, then ``[time, "o"|"i", text]`` per frame."""
+	header: Dict[str, object] = {"version": 2, "width": width, "height": height}
+	if log.started is not None:
+		header["timestamp"] = int(log.started + start)
+	yield json.dumps(header) + "\n"
+	directions = (TYPE_OUTPUT, TYPE_INPUT) if include_input else (TYPE_OUTPUT,)
+	decoders = {d: codecs.getincrementaldecoder("utf-8")(errors="replace") for d in directions}
+	for frame in log.frames(start, directions):
+		text = decoders[frame.direction].decode(frame.data)
+		if text:
+			kind = "i" if frame.direction == TYPE_INPUT else "o"
+			yield json.dumps([round(frame.at - start, 6), kind, text]) + "\n"
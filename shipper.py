@@ -18,6 +18,13 @@ from typing import Dict, Any, List
 import requests
 import logging
 
+try:
+    # Only importable when running next to the dashboard (e.g. load tests);
+    # on the VM the shipper runs standalone without metrics.
+    from services import instrumentation
+except ImportError:
+    instrumentation = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -84,14 +91,20 @@ class LogShipper:
     def ship_events(self, events: List[Dict[str, Any]]):
         if not events:
             return
+        outcome = "failed"
+        start = time.perf_counter()
         try:
             resp = requests.post(f"{self.dashboard_url}/api/ingest", json=events, timeout=10)
             if resp.status_code == 200:
                 logger.info(f"Shipped {len(events)} events")
+                outcome = "shipped"
             else:
                 logger.error(f"Failed to ship: {resp.status_code} {resp.text}")
         except Exception as e:
             logger.error(f"Error shipping events: {e}")
+        if instrumentation is not None:
+            instrumentation.SHIPPER_POST.observe(time.perf_counter() - start)
+            instrumentation.SHIPPER_EVENTS.inc(len(events), (outcome,))
 
     def run(self):
         logger.info(f"Starting shipper: HTTP={self.http_log}, SSH={self.ssh_log}, Dashboard={self.dashboard_url}")
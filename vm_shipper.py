@@ -18,6 +18,13 @@ from typing import Dict, Any, List
 import requests
 import logging
 
+try:
+    # Only importable when running next to the dashboard (e.g. load tests);
+    # on the VM the shipper runs standalone without metrics.
+    from services import instrumentation
+except ImportError:
+    instrumentation = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -103,42 +110,60 @@ class LogShipper:
             return
         max_retries = 3
         for attempt in range(max_retries):
+            start = time.perf_counter()
             try:
                 resp = requests.post(f"{self.dashboard_url}/api/ingest", json=events, timeout=10)
+                self._record("post", time.perf_counter() - start)
                 if resp.status_code == 200:
                     logger.info(f"Shipped {len(events)} events")
+                    self._record("shipped", len(events))
                     return
                 else:
                     logger.error(f"Failed to ship (attempt {attempt+1}): {resp.status_code} {resp.text}")
             except Exception as e:
                 logger.error(f"Error shipping events (attempt {attempt+1}): {e}")
             if attempt < max_retries - 1:
+                self._record("retry", len(events))
                 sleep_time = 2 ** attempt  # exponential backoff
                 logger.info(f"Retrying in {sleep_time} seconds...")
                 time.sleep(sleep_time)
         logger.error("Failed to ship events after all retries")
+        self._record("failed", len(events))
+
+    def _record(self, outcome: str, value: float):
+        if instrumentation is None:
+            return
+        if outcome == "post":
+            instrumentation.SHIPPER_POST.observe(value)
+        else:
+            instrumentation.SHIPPER_EVENTS.inc(value, (outcome,))
+
+    def poll_once(self) -> int:
+        """Read, ship and checkpoint one batch of new lines; returns events shipped."""
+        events = []
+
+        # HTTP
+        lines = self.read_new_lines(self.http_log)
+        for line in lines:
+            event = self.parse_http_line(line)
+            if event:
+                events.append(event)
+
+        # SSH
+        lines = self.read_new_lines(self.ssh_log)
+        for line in lines:
+            event = self.parse_ssh_line(line)
+            if event:
+                events.append(event)
+
+        self.ship_events(events)
+        self._save_offsets()
+        return len(events)
 
     def run(self):
         logger.info(f"Starting shipper: HTTP={self.http_log}, SSH={self.ssh_log}, Dashboard={self.dashboard_url}")
         while True:
-            events = []
-
-            # HTTP
-            lines = self.read_new_lines(self.http_log)
-            for line in lines:
-                event = self.parse_http_line(line)
-                if event:
-                    events.append(event)
-
-            # SSH
-            lines = self.read_new_lines(self.ssh_log)
-            for line in lines:
-                event = self.parse_ssh_line(line)
-                if event:
-                    events.append(event)
-
-            self.ship_events(events)
-            self._save_offsets()
+            self.poll_once()
             time.sleep(5)  # poll every 5 seconds
 
 if __name__ == "__main__":